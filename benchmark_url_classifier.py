@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+URL klassifikatori micro-benchmark (terminaldan ishga tushirish).
+Eski regex sikli (har bir pattern ketma-ket re.search) bilan utils.url_classifier solishtiriladi.
+Ishlatish: python benchmark_url_classifier.py [takrorlar soni]
+"""
+import re
+import sys
+import timeit
+from pathlib import Path
+
+# Project root dan import qilish uchun
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from utils.url_classifier import classify_url, detect_platform
+
+# Oldingi detect_platform ishlatgan pattern'lar (solishtirish uchun)
+LEGACY_PLATFORM_PATTERNS = {
+    'youtube': [
+        r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]{11})',
+        r'(?:https?://)?(?:www\.)?youtube\.com/watch\?.*&v=([a-zA-Z0-9_-]{11})',
+        r'(?:https?://)?(?:www\.)?youtu\.be/([a-zA-Z0-9_-]{11})',
+        r'(?:https?://)?(?:www\.)?youtube\.com/shorts/([a-zA-Z0-9_-]{11})',
+        r'(?:https?://)?(?:m\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]{11})',
+        r'(?:https?://)?(?:m\.)?youtube\.com/watch\?.*&v=([a-zA-Z0-9_-]{11})',
+    ],
+    'instagram': [
+        r'(?:https?://)?(?:www\.)?instagram\.com/(?:p|reel|tv)/([a-zA-Z0-9_-]+)',
+        r'(?:https?://)?(?:www\.)?instagram\.com/([a-zA-Z0-9_.]+)/',
+        r'(?:https?://)?(?:www\.)?instagram\.com/stories/([a-zA-Z0-9_.]+)/(\d+)',
+    ],
+    'tiktok': [
+        r'(?:https?://)?(?:www\.)?(?:vm\.|vt\.)?tiktok\.com/([a-zA-Z0-9]+)',
+        r'(?:https?://)?(?:www\.)?tiktok\.com/@[^/]+/video/(\d+)',
+    ],
+    'twitter': [
+        r'(?:https?://)?(?:www\.)?(?:twitter\.com|x\.com)/[^/]+/status/(\d+)',
+    ],
+    'facebook': [
+        r'(?:https?://)?(?:www\.)?facebook\.com/[^/]+/videos/(\d+)',
+        r'(?:https?://)?(?:www\.)?fb\.watch/([a-zA-Z0-9_-]+)',
+    ],
+}
+
+SAMPLE_URLS = [
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "https://m.youtube.com/watch?feature=share&v=dQw4w9WgXcQ",
+    "https://youtu.be/dQw4w9WgXcQ",
+    "https://www.youtube.com/shorts/aqz-KE-bpKQ",
+    "https://www.instagram.com/p/C1a2b3c4d5e/",
+    "https://www.instagram.com/reel/C1a2b3c4d5e/?igsh=abc",
+    "https://www.instagram.com/stories/some.user/3141592653589793238/",
+    "https://vm.tiktok.com/ZSNYW7Dd2/",
+    "https://www.tiktok.com/@user.name/video/7301234567890123456",
+    "https://x.com/someone/status/1734567890123456789",
+    "https://twitter.com/someone/status/1734567890123456789",
+    "https://www.facebook.com/page/videos/1234567890/",
+    "https://fb.watch/abcDEF123/",
+    "https://example.com/some/page",
+    "https://vimeo.com/123456",
+]
+
+
+def legacy_detect_platform(url: str):
+    """Oldingi implementatsiya: har bir pattern ketma-ket re.search bilan"""
+    url = url.strip()
+    for platform, patterns in LEGACY_PLATFORM_PATTERNS.items():
+        for pattern in patterns:
+            if re.search(pattern, url, re.IGNORECASE):
+                return platform
+    return None
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    mismatches = 0
+    for url in SAMPLE_URLS:
+        legacy, info = legacy_detect_platform(url), classify_url(url)
+        if legacy != detect_platform(url):
+            mismatches += 1
+            print(f"FARQ: {url} - eski: {legacy}, yangi: {info}")
+        else:
+            print(f"  {url}\n    -> {info}")
+
+    def run_legacy():
+        for url in SAMPLE_URLS:
+            legacy_detect_platform(url)
+
+    def run_classifier():
+        for url in SAMPLE_URLS:
+            classify_url(url)
+
+    calls = number * len(SAMPLE_URLS)
+    legacy_time = min(timeit.repeat(run_legacy, number=number, repeat=3))
+    new_time = min(timeit.repeat(run_classifier, number=number, repeat=3))
+    print(f"\n{calls} ta URL (eng yaxshi 3 ta o'lchovdan):")
+    print(f"  Eski regex sikli:  {legacy_time * 1e6 / calls:.2f} µs/URL")
+    print(f"  classify_url:      {new_time * 1e6 / calls:.2f} µs/URL")
+    print(f"  Tezlanish:         {legacy_time / new_time:.1f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
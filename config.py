@@ -3,7 +3,7 @@ Bot konfiguratsiyasi
 """
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
 from pathlib import Path
 from dotenv import load_dotenv
@@ -49,6 +49,43 @@ class BotConfig:
     broadcast_batch_delay: float = 0.5  # Har batch uchun delay
     # Instagram cookies (optional) - Instagram story'lar uchun
     instagram_cookies_file: Optional[str] = None  # Cookies fayl yo'li (Netscape format)
+    # Yuklab olish navbati sozlamalari
+    download_max_concurrent: int = 4  # Bir vaqtda ishlaydigan yuklab olishlar (oddiy navbat)
+    download_fast_lane_slots: int = 2  # Tezkor navbat uchun qo'shimcha joylar (qisqa kliplar)
+    download_platform_limits: dict[str, int] = field(default_factory=dict)  # Platforma bo'yicha limitlar
+    # Parallel ulanishlar (HLS/DASH fragmentlari, aria2c orqali progressive fayl qismlari)
+    download_connections_per_job: int = 4  # Bitta ish uchun (1 - o'chirilgan)
+    download_connections_total: int = 16  # Barcha ishlar uchun umumiy limit
+    # yt-dlp worker jarayonlari (0 - o'chirilgan, yuklab olish thread'da ishlaydi)
+    ytdlp_worker_processes: int = 0
+    ytdlp_worker_memory_mb: int = 1024  # Har bir ish uchun xotira limiti (RLIMIT_AS)
+    ytdlp_worker_cpu_seconds: int = 300  # Har bir ish uchun CPU vaqti limiti (RLIMIT_CPU)
+    ytdlp_worker_job_timeout: float = 600.0  # Shu vaqtdan keyin worker majburan o'chiriladi (sekund)
+    # Self-hosted telegram-bot-api server (None - rasmiy api.telegram.org)
+    telegram_api_url: Optional[str] = None
+    telegram_api_local: bool = True  # Server --local rejimida (yo'l orqali upload, 2 GB gacha)
+    telegram_api_server_dir: Optional[str] = None  # Server ichidagi ishchi papka (umumiy volume)
+    telegram_api_local_dir: Optional[str] = None  # Shu papka bot tomonida ulangan yo'l
+    # Yuklab olishdan oldingi tekshiruv (metadata bo'yicha)
+    media_upload_limit_mb: int = 50  # Telegram'ga yuboriladigan fayl hajmi limiti (Bot API: 50 MB, lokal: 2000 MB)
+    media_max_duration: int = 3600  # Maksimal media davomiyligi (sekund, 0 - cheklanmagan)
+    # Circuit breaker (platforma bloklaganda so'rovlarni darhol rad etish)
+    circuit_failure_threshold: int = 3  # Ketma-ket bloklash xatoliklari soni (0 - o'chirilgan)
+    circuit_open_seconds: float = 300.0  # Ochiq holat davomiyligi, keyin probe so'rov (sekund)
+    circuit_max_open_seconds: float = 1800.0  # Probe muvaffaqiyatsiz bo'lganda maksimal davomiylik (sekund)
+    # Ishchi papkalar (har bir yuklab olish / aniqlash ishi uchun)
+    workspace_dir: Optional[str] = None  # Asosiy papka (default: /tmp/vkm_bot_jobs)
+    workspace_ram_dir: Optional[str] = None  # tmpfs papka kichik ishlar uchun (masalan /dev/shm/vkm_bot_jobs)
+    workspace_ram_max_mb: int = 20  # Shu hajmgacha bo'lgan ishlar tmpfs'da bajariladi
+    workspace_quota_mb: int = 0  # Har bir ish papkasi limiti (0 - yuborish limiti * 2 + 64)
+    workspace_max_age: float = 3600.0  # Joriy jarayonning shu vaqtdan eski faol bo'lmagan papkalari o'chiriladi (sekund)
+    workspace_janitor_interval: float = 600.0  # Janitor tekshiruvlari orasidagi vaqt (sekund)
+    # Qisqa linklar (vm.tiktok.com, fb.watch) aniqlangan URL'lari cache muddati (sekund)
+    short_link_ttl: float = 604800.0
+    # Muvaffaqiyatsiz URL'lar cache muddati, xatolik turi bo'yicha (standart qiymatlarni almashtiradi)
+    negative_cache_ttls: dict[str, int] = field(default_factory=dict)
+    media_links_per_message: int = 10  # Bitta xabardan qayta ishlanadigan maksimal linklar soni
+    direct_url_max_mb: int = 20  # TikTok/Instagram kliplari shu hajmgacha URL orqali yuboriladi (0 - o'chirilgan, audio_only bundan mustasno)
 
 
 @dataclass
@@ -82,6 +119,71 @@ class Config:
         # Instagram cookies (optional)
         instagram_cookies_file = os.getenv("INSTAGRAM_COOKIES_FILE")
         
+        # Yuklab olish navbati sozlamalari
+        download_max_concurrent = int(os.getenv("DOWNLOAD_MAX_CONCURRENT", "4"))
+        download_fast_lane_slots = int(os.getenv("DOWNLOAD_FAST_LANE_SLOTS", "2"))
+        # Format: "youtube=2,instagram=3,tiktok=3"
+        download_platform_limits_str = os.getenv("DOWNLOAD_PLATFORM_LIMITS", "youtube=2,instagram=3,tiktok=3")
+        download_platform_limits = {}
+        for item in download_platform_limits_str.split(","):
+            if "=" not in item:
+                continue
+            name, limit = item.split("=", 1)
+            if name.strip() and limit.strip():
+                download_platform_limits[name.strip().lower()] = int(limit.strip())
+        download_connections_per_job = int(os.getenv("DOWNLOAD_CONNECTIONS_PER_JOB", "4"))
+        download_connections_total = int(os.getenv("DOWNLOAD_CONNECTIONS_TOTAL", "16"))
+        
+        # yt-dlp worker jarayonlari
+        ytdlp_worker_processes = int(os.getenv("YTDLP_WORKER_PROCESSES", "0"))
+        ytdlp_worker_memory_mb = int(os.getenv("YTDLP_WORKER_MEMORY_MB", "1024"))
+        ytdlp_worker_cpu_seconds = int(os.getenv("YTDLP_WORKER_CPU_SECONDS", "300"))
+        ytdlp_worker_job_timeout = float(os.getenv("YTDLP_WORKER_JOB_TIMEOUT", "600"))
+        
+        # Self-hosted Bot API server (ixtiyoriy)
+        telegram_api_url = os.getenv("TELEGRAM_API_URL") or None
+        telegram_api_local = os.getenv("TELEGRAM_API_LOCAL", "True").lower() == "true"
+        telegram_api_server_dir = os.getenv("TELEGRAM_API_SERVER_DIR") or None
+        telegram_api_local_dir = os.getenv("TELEGRAM_API_LOCAL_DIR") or None
+        
+        # Yuklab olishdan oldingi tekshiruv (hajm va davomiylik limitlari)
+        # Lokal Bot API server 2000 MB gacha fayl qabul qiladi
+        default_upload_limit = "2000" if telegram_api_url and telegram_api_local else "50"
+        media_upload_limit_mb = int(os.getenv("MEDIA_UPLOAD_LIMIT_MB", default_upload_limit))
+        media_max_duration = int(os.getenv("MEDIA_MAX_DURATION", "3600"))
+        
+        # Circuit breaker
+        circuit_failure_threshold = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+        circuit_open_seconds = float(os.getenv("CIRCUIT_OPEN_SECONDS", "300"))
+        circuit_max_open_seconds = float(os.getenv("CIRCUIT_MAX_OPEN_SECONDS", "1800"))
+        
+        # Ishchi papkalar
+        workspace_dir = os.getenv("WORKSPACE_DIR") or None
+        workspace_ram_dir = os.getenv("WORKSPACE_RAM_DIR") or None
+        workspace_ram_max_mb = int(os.getenv("WORKSPACE_RAM_MAX_MB", "20"))
+        workspace_quota_mb = int(os.getenv("WORKSPACE_QUOTA_MB", "0"))
+        workspace_max_age = float(os.getenv("WORKSPACE_MAX_AGE", "3600"))
+        workspace_janitor_interval = float(os.getenv("WORKSPACE_JANITOR_INTERVAL", "600"))
+        
+        # Qisqa linklar cache muddati
+        short_link_ttl = float(os.getenv("SHORT_LINK_TTL", "604800"))
+        
+        # Negative cache muddatlari (sekund). Format: "unavailable=43200,rate_limited=60"
+        negative_cache_ttls_str = os.getenv("NEGATIVE_CACHE_TTLS", "")
+        negative_cache_ttls = {}
+        for item in negative_cache_ttls_str.split(","):
+            if "=" not in item:
+                continue
+            name, ttl = item.split("=", 1)
+            if name.strip() and ttl.strip():
+                negative_cache_ttls[name.strip().lower()] = int(ttl.strip())
+        
+        # Bitta xabardagi linklar limiti
+        media_links_per_message = int(os.getenv("MEDIA_LINKS_PER_MESSAGE", "10"))
+        
+        # Kichik kliplarni to'g'ridan-to'g'ri URL orqali yuborish (Bot API URL'dan 20 MB gacha yuklaydi)
+        direct_url_max_mb = int(os.getenv("DIRECT_URL_MAX_MB", "20"))
+        
         # Database sozlamalari
         db_host = os.getenv("DB_HOST", "localhost")
         db_port = int(os.getenv("DB_PORT", "5432"))
@@ -102,6 +204,34 @@ class Config:
                 broadcast_rate_limit=broadcast_rate_limit,
                 broadcast_batch_delay=broadcast_batch_delay,
                 instagram_cookies_file=instagram_cookies_file,
+                download_max_concurrent=download_max_concurrent,
+                download_fast_lane_slots=download_fast_lane_slots,
+                download_platform_limits=download_platform_limits,
+                download_connections_per_job=download_connections_per_job,
+                download_connections_total=download_connections_total,
+                ytdlp_worker_processes=ytdlp_worker_processes,
+                ytdlp_worker_memory_mb=ytdlp_worker_memory_mb,
+                ytdlp_worker_cpu_seconds=ytdlp_worker_cpu_seconds,
+                ytdlp_worker_job_timeout=ytdlp_worker_job_timeout,
+                telegram_api_url=telegram_api_url,
+                telegram_api_local=telegram_api_local,
+                telegram_api_server_dir=telegram_api_server_dir,
+                telegram_api_local_dir=telegram_api_local_dir,
+                media_upload_limit_mb=media_upload_limit_mb,
+                media_max_duration=media_max_duration,
+                circuit_failure_threshold=circuit_failure_threshold,
+                circuit_open_seconds=circuit_open_seconds,
+                circuit_max_open_seconds=circuit_max_open_seconds,
+                workspace_dir=workspace_dir,
+                workspace_ram_dir=workspace_ram_dir,
+                workspace_ram_max_mb=workspace_ram_max_mb,
+                workspace_quota_mb=workspace_quota_mb,
+                workspace_max_age=workspace_max_age,
+                workspace_janitor_interval=workspace_janitor_interval,
+                short_link_ttl=short_link_ttl,
+                negative_cache_ttls=negative_cache_ttls,
+                media_links_per_message=media_links_per_message,
+                direct_url_max_mb=direct_url_max_mb,
             ),
             database=DatabaseConfig(
                 host=db_host,
@@ -3,6 +3,7 @@ PostgreSQL database connection va session management
 """
 
 from typing import AsyncGenerator
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from config import config
@@ -37,6 +38,19 @@ async_session_maker = async_sessionmaker(
 # Base model
 Base = declarative_base()
 
+# Mavjud jadvallarga qo'shilgan ustunlar (create_all faqat yangi jadvallarni yaratadi)
+SCHEMA_UPGRADES = (
+    "ALTER TABLE media_links ADD COLUMN IF NOT EXISTS media_key BIGINT",
+    "CREATE INDEX IF NOT EXISTS ix_media_links_media_key ON media_links (media_key)",
+    "ALTER TABLE media_links ADD COLUMN IF NOT EXISTS parent_id INTEGER REFERENCES media_links (id) ON DELETE CASCADE",
+    "ALTER TABLE media_links ADD COLUMN IF NOT EXISTS position INTEGER",
+    "CREATE INDEX IF NOT EXISTS ix_media_links_parent_id ON media_links (parent_id)",
+    "ALTER TABLE media_links ADD COLUMN IF NOT EXISTS variant VARCHAR NOT NULL DEFAULT 'default'",
+    "ALTER TABLE media_links ADD COLUMN IF NOT EXISTS invalidated_at TIMESTAMP WITH TIME ZONE",
+    "ALTER TABLE media_links ADD COLUMN IF NOT EXISTS content_fingerprint VARCHAR",
+    "CREATE INDEX IF NOT EXISTS ix_media_links_content_fingerprint ON media_links (content_fingerprint)",
+)
+
 
 async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
     """
@@ -63,6 +77,8 @@ async def init_db():
     
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        for statement in SCHEMA_UPGRADES:
+            await conn.execute(text(statement))
 
 
 async def close_db():
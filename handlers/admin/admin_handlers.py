@@ -152,12 +152,17 @@ async def detailed_stats(callback: CallbackQuery):
     """Batafsil statistika"""
     from aiogram.exceptions import TelegramBadRequest
     
+    from utils.metrics import metrics
+    
     await callback.answer()
     
+    counters = metrics.snapshot()
+    details = "\n".join(f"• {name}: {value}" for name, value in counters.items()) or "Hozircha ma'lumot yo'q"
+    
     try:
         await callback.message.edit_text(
             "📈 Batafsil statistika:\n\n"
-            "Bu yerda batafsil statistika ko'rsatiladi...",
+            f"{details}",
             reply_markup=get_inline_keyboard([
                 [("🔙 Orqaga", "admin_stats")],
             ])
@@ -165,7 +170,7 @@ async def detailed_stats(callback: CallbackQuery):
     except TelegramBadRequest:
         await callback.message.answer(
             "📈 Batafsil statistika:\n\n"
-            "Bu yerda batafsil statistika ko'rsatiladi...",
+            f"{details}",
             reply_markup=get_inline_keyboard([
                 [("🔙 Orqaga", "admin_stats")],
             ])
@@ -4,16 +4,30 @@ Media handlerlari - YouTube, Instagram, TikTok va boshqa platformalardan media y
 
 import logging
 import asyncio
-import tempfile
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional, Union
 from aiogram import Router, F
-from aiogram.types import Message, FSInputFile, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
-from aiogram.exceptions import TelegramBadRequest, TelegramAPIError
-from utils.media_downloader import detect_platform, is_valid_url, download_media, cleanup_temp_files
-from utils.media_cache import get_cached_media, save_media_cache
+from aiogram.enums import MessageEntityType
+from aiogram.types import Message, FSInputFile, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, InputMediaPhoto, InputMediaVideo
+from aiogram.exceptions import TelegramBadRequest, TelegramAPIError, TelegramNetworkError
+from utils.media_downloader import (
+    detect_platform, is_valid_url, download_media, cleanup_temp_files, resolve_direct_media, record_direct_delivery,
+)
+from utils.media_cache import (
+    get_cached_media, get_cached_variants, save_media_cache, save_album_cache, get_album_items, invalidate_cached_media,
+    compute_content_fingerprint, find_media_by_fingerprint,
+)
+from utils.url_classifier import AUDIO_VARIANT, canonical_media_key, preference_variant
+from utils.short_links import resolve_short_link
 from utils.shazam_recognizer import recognize_music_from_voice
 from utils.user_utils import get_user_by_telegram_id
+from utils.single_flight import media_flight
+from utils.telegram_api import fetch_telegram_file, telegram_input_file
+from utils.workspace import workspace_manager
+from utils.progress import StatusMessage, MultiLinkStatus, LinkStatus
+from utils.ordered_delivery import OrderedDelivery, wait_delivery_turn
+from utils.metrics import metrics
+from config import config
 
 logger = logging.getLogger(__name__)
 
@@ -145,19 +159,19 @@ async def handle_video_note(message: Message):
         bot = message.bot
         video_file = await bot.get_file(message.video_note.file_id)
         
-        # Temporary fayl yaratish
-        temp_dir = tempfile.mkdtemp()
-        video_path = Path(temp_dir) / f"video_{message.video_note.file_id}.mp4"
+        # Har bir ish uchun alohida ishchi papka (kichik fayllar tmpfs'da bo'lishi mumkin)
+        workspace = workspace_manager.create("video_note", expected_bytes=message.video_note.file_size)
+        video_path = workspace.path / f"video_{message.video_note.file_id}.mp4"
         
         # Video note faylni yuklab olish
         try:
-            await bot.download_file(video_file.file_path, str(video_path))
+            source_path = await fetch_telegram_file(bot, video_file.file_path, video_path)
             
             # Fayl mavjudligini tekshirish
-            if not video_path.exists():
-                raise FileNotFoundError(f"Video note fayl yuklanmadi: {video_path}")
+            if not source_path.exists():
+                raise FileNotFoundError(f"Video note fayl yuklanmadi: {source_path}")
             
-            logger.info(f"Video note yuklandi: {video_path}, hajmi: {video_path.stat().st_size} bytes")
+            logger.info(f"Video note yuklandi: {source_path}, hajmi: {source_path.stat().st_size} bytes")
         except Exception as e:
             logger.error(f"Video note yuklab olishda xatolik: {e}")
             await loading_msg.edit_text(
@@ -165,30 +179,20 @@ async def handle_video_note(message: Message):
                 "Iltimos, qayta urinib ko'ring."
             )
             # Temporary directory'ni tozalash
-            try:
-                if video_path.exists():
-                    video_path.unlink()
-                Path(temp_dir).rmdir()
-            except:
-                pass
+            workspace.release()
             return
         
         # Shazam orqali musiqani aniqlash
         await loading_msg.edit_text("🎵 Musiqa aniqlanmoqda...\n\n🔍 Shazam orqali tahlil qilinmoqda...")
         
         try:
-            music_info = await recognize_music_from_voice(str(video_path))
+            music_info = await recognize_music_from_voice(str(source_path))
         except Exception as e:
             logger.error(f"Musiqa aniqlashda xatolik: {e}")
             music_info = None
         finally:
-            # Temporary faylni o'chirish
-            try:
-                if video_path.exists():
-                    video_path.unlink()
-                Path(temp_dir).rmdir()
-            except Exception as e:
-                logger.warning(f"Temporary fayllarni o'chirishda xatolik: {e}")
+            # Ishchi papkani o'chirish
+            workspace.release()
         
         if not music_info:
             await loading_msg.edit_text(
@@ -268,19 +272,19 @@ async def handle_voice_message(message: Message):
         bot = message.bot
         voice_file = await bot.get_file(message.voice.file_id)
         
-        # Temporary fayl yaratish
-        temp_dir = tempfile.mkdtemp()
-        voice_path = Path(temp_dir) / f"voice_{message.voice.file_id}.ogg"
+        # Har bir ish uchun alohida ishchi papka (kichik fayllar tmpfs'da bo'lishi mumkin)
+        workspace = workspace_manager.create("voice", expected_bytes=message.voice.file_size)
+        voice_path = workspace.path / f"voice_{message.voice.file_id}.ogg"
         
         # Voice faylni yuklab olish
         try:
-            await bot.download_file(voice_file.file_path, str(voice_path))
+            source_path = await fetch_telegram_file(bot, voice_file.file_path, voice_path)
             
             # Fayl mavjudligini tekshirish
-            if not voice_path.exists():
-                raise FileNotFoundError(f"Voice fayl yuklanmadi: {voice_path}")
+            if not source_path.exists():
+                raise FileNotFoundError(f"Voice fayl yuklanmadi: {source_path}")
             
-            logger.info(f"Voice fayl yuklandi: {voice_path}, hajmi: {voice_path.stat().st_size} bytes")
+            logger.info(f"Voice fayl yuklandi: {source_path}, hajmi: {source_path.stat().st_size} bytes")
         except Exception as e:
             logger.error(f"Voice fayl yuklab olishda xatolik: {e}")
             await loading_msg.edit_text(
@@ -288,30 +292,20 @@ async def handle_voice_message(message: Message):
                 "Iltimos, qayta urinib ko'ring."
             )
             # Temporary directory'ni tozalash
-            try:
-                if voice_path.exists():
-                    voice_path.unlink()
-                Path(temp_dir).rmdir()
-            except:
-                pass
+            workspace.release()
             return
         
         # Shazam orqali musiqani aniqlash
         await loading_msg.edit_text("🎵 Musiqa aniqlanmoqda...\n\n🔍 Shazam orqali tahlil qilinmoqda...")
         
         try:
-            music_info = await recognize_music_from_voice(str(voice_path))
+            music_info = await recognize_music_from_voice(str(source_path))
         except Exception as e:
             logger.error(f"Musiqa aniqlashda xatolik: {e}")
             music_info = None
         finally:
-            # Temporary faylni o'chirish
-            try:
-                if voice_path.exists():
-                    voice_path.unlink()
-                Path(temp_dir).rmdir()
-            except Exception as e:
-                logger.warning(f"Temporary fayllarni o'chirishda xatolik: {e}")
+            # Ishchi papkani o'chirish
+            workspace.release()
         
         if not music_info:
             await loading_msg.edit_text(
@@ -442,7 +436,10 @@ def create_search_keyboard(videos: list[Dict], page: int = 0, search_query: str
     return InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
 
 
-@router.message(F.text & ~F.text.startswith('http://') & ~F.text.startswith('https://') & ~F.text.startswith('/'))
+@router.message(
+    F.text & ~F.text.startswith('http://') & ~F.text.startswith('https://') & ~F.text.startswith('/')
+    & ~F.entities[...].type.in_({MessageEntityType.URL, MessageEntityType.TEXT_LINK})
+)
 async def handle_music_search(message: Message):
     """
     Text message'dan qo'shiq nomi yoki ijrochi ismini qidirish (YouTube) - pagination bilan
@@ -588,17 +585,18 @@ async def handle_video_selection(callback: CallbackQuery):
             return
         
         video_url = selected_video['url']
+        media_preference = await get_media_preference(callback.from_user.id)
         
         # Cache'dan tekshirish - agar avval yuklangan bo'lsa, cache'dan yuborish
-        cached_media = await get_cached_media(video_url)
+        cached_items = await get_cached_variants(video_url, media_preference)
         
-        if cached_media:
+        if cached_items:
             # Cache'dan topildi - file_id bilan jo'natish
             logger.info(f"Cache'dan topildi: {video_url}")
             await callback.answer("✅ Cache'dan yuborilmoqda...")
             
             try:
-                await send_cached_media(callback.message, cached_media)
+                await send_cached_variants(callback.message, cached_items)
                 return
             except Exception as e:
                 logger.error(f"Cached media yuborishda xatolik: {e}")
@@ -611,7 +609,7 @@ async def handle_video_selection(callback: CallbackQuery):
         # Video yuklab olish va yuborish
         platform = detect_platform(video_url)
         if platform:
-            await download_and_send_media(callback.message, video_url, platform, loading_msg)
+            await download_and_send_media(callback.message, video_url, platform, loading_msg, media_preference)
         else:
             await loading_msg.edit_text(
                 f"❌ Video avtomatik yuklab olinmadi.\n\n"
@@ -643,19 +641,19 @@ async def handle_video_file(message: Message):
         bot = message.bot
         video_file = await bot.get_file(message.video.file_id)
         
-        # Temporary fayl yaratish
-        temp_dir = tempfile.mkdtemp()
-        video_path = Path(temp_dir) / f"video_{message.video.file_id}.mp4"
+        # Har bir ish uchun alohida ishchi papka (kichik fayllar tmpfs'da bo'lishi mumkin)
+        workspace = workspace_manager.create("video", expected_bytes=message.video.file_size)
+        video_path = workspace.path / f"video_{message.video.file_id}.mp4"
         
         # Video faylni yuklab olish
         try:
-            await bot.download_file(video_file.file_path, str(video_path))
+            source_path = await fetch_telegram_file(bot, video_file.file_path, video_path)
             
             # Fayl mavjudligini tekshirish
-            if not video_path.exists():
-                raise FileNotFoundError(f"Video fayl yuklanmadi: {video_path}")
+            if not source_path.exists():
+                raise FileNotFoundError(f"Video fayl yuklanmadi: {source_path}")
             
-            logger.info(f"Video fayl yuklandi: {video_path}, hajmi: {video_path.stat().st_size} bytes")
+            logger.info(f"Video fayl yuklandi: {source_path}, hajmi: {source_path.stat().st_size} bytes")
         except Exception as e:
             logger.error(f"Video fayl yuklab olishda xatolik: {e}")
             await loading_msg.edit_text(
@@ -663,30 +661,20 @@ async def handle_video_file(message: Message):
                 "Iltimos, qayta urinib ko'ring."
             )
             # Temporary directory'ni tozalash
-            try:
-                if video_path.exists():
-                    video_path.unlink()
-                Path(temp_dir).rmdir()
-            except:
-                pass
+            workspace.release()
             return
         
         # Shazam orqali musiqani aniqlash
         await loading_msg.edit_text("🎵 Musiqa aniqlanmoqda...\n\n🔍 Shazam orqali tahlil qilinmoqda...")
         
         try:
-            music_info = await recognize_music_from_voice(str(video_path))
+            music_info = await recognize_music_from_voice(str(source_path))
         except Exception as e:
             logger.error(f"Musiqa aniqlashda xatolik: {e}")
             music_info = None
         finally:
-            # Temporary faylni o'chirish
-            try:
-                if video_path.exists():
-                    video_path.unlink()
-                Path(temp_dir).rmdir()
-            except Exception as e:
-                logger.warning(f"Temporary fayllarni o'chirishda xatolik: {e}")
+            # Ishchi papkani o'chirish
+            workspace.release()
         
         if not music_info:
             await loading_msg.edit_text(
@@ -766,21 +754,21 @@ async def handle_audio_file(message: Message):
         bot = message.bot
         audio_file = await bot.get_file(message.audio.file_id)
         
-        # Temporary fayl yaratish
-        temp_dir = tempfile.mkdtemp()
+        # Har bir ish uchun alohida ishchi papka (kichik fayllar tmpfs'da bo'lishi mumkin)
+        workspace = workspace_manager.create("audio", expected_bytes=message.audio.file_size)
         # Audio fayl extension'ini aniqlash
         audio_ext = message.audio.mime_type.split('/')[-1] if message.audio.mime_type else 'mp3'
-        audio_path = Path(temp_dir) / f"audio_{message.audio.file_id}.{audio_ext}"
+        audio_path = workspace.path / f"audio_{message.audio.file_id}.{audio_ext}"
         
         # Audio faylni yuklab olish
         try:
-            await bot.download_file(audio_file.file_path, str(audio_path))
+            source_path = await fetch_telegram_file(bot, audio_file.file_path, audio_path)
             
             # Fayl mavjudligini tekshirish
-            if not audio_path.exists():
-                raise FileNotFoundError(f"Audio fayl yuklanmadi: {audio_path}")
+            if not source_path.exists():
+                raise FileNotFoundError(f"Audio fayl yuklanmadi: {source_path}")
             
-            logger.info(f"Audio fayl yuklandi: {audio_path}, hajmi: {audio_path.stat().st_size} bytes")
+            logger.info(f"Audio fayl yuklandi: {source_path}, hajmi: {source_path.stat().st_size} bytes")
         except Exception as e:
             logger.error(f"Audio fayl yuklab olishda xatolik: {e}")
             await loading_msg.edit_text(
@@ -788,12 +776,7 @@ async def handle_audio_file(message: Message):
                 "Iltimos, qayta urinib ko'ring."
             )
             # Temporary directory'ni tozalash
-            try:
-                if audio_path.exists():
-                    audio_path.unlink()
-                Path(temp_dir).rmdir()
-            except:
-                pass
+            workspace.release()
             return
         
         # FFmpeg mavjudligini tekshirish (ShazamIO uchun kerak)
@@ -835,30 +818,20 @@ async def handle_audio_file(message: Message):
                 "• Mac: brew install ffmpeg"
             )
             # Temporary faylni o'chirish
-            try:
-                if audio_path.exists():
-                    audio_path.unlink()
-                Path(temp_dir).rmdir()
-            except:
-                pass
+            workspace.release()
             return
         
         # Shazam orqali musiqani aniqlash
         await loading_msg.edit_text("🎵 Musiqa aniqlanmoqda...\n\n🔍 Shazam orqali tahlil qilinmoqda...")
         
         try:
-            music_info = await recognize_music_from_voice(str(audio_path))
+            music_info = await recognize_music_from_voice(str(source_path))
         except Exception as e:
             logger.error(f"Musiqa aniqlashda xatolik: {e}")
             music_info = None
         finally:
-            # Temporary faylni o'chirish
-            try:
-                if audio_path.exists():
-                    audio_path.unlink()
-                Path(temp_dir).rmdir()
-            except Exception as e:
-                logger.warning(f"Temporary fayllarni o'chirishda xatolik: {e}")
+            # Ishchi papkani o'chirish
+            workspace.release()
         
         if not music_info:
             await loading_msg.edit_text(
@@ -918,60 +891,165 @@ async def handle_audio_file(message: Message):
             pass
 
 
-@router.message(F.text.startswith('http://') | F.text.startswith('https://'))
-async def handle_media_link(message: Message):
+def extract_message_urls(message: Message) -> list[str]:
+    """
+    Xabardagi barcha linklar (url va text_link entity'lari), tartib saqlanadi
+
+    Bir xil media'ga olib boruvchi takroriy linklar bitta deb hisoblanadi (qisqa linklar
+    bo'yicha to'liq dedup - resolve_message_urls'da). Entity bo'lmasa (masalan forward
+    qilingan matn) - butun matn bitta link.
+    """
+    text = message.text or ""
+    urls = []
+    for entity in message.entities or []:
+        if entity.type == MessageEntityType.URL:
+            urls.append(entity.extract_from(text))
+        elif entity.type == MessageEntityType.TEXT_LINK and entity.url:
+            urls.append(entity.url)
+    if not urls and text.strip().startswith(('http://', 'https://')):
+        urls.append(text.strip())
+    
+    unique, seen = [], set()
+    for url in urls:
+        url = url.strip()
+        if not url.lower().startswith(('http://', 'https://')):
+            url = f"https://{url}"
+        key = canonical_media_key(url)
+        if key not in seen:
+            seen.add(key)
+            unique.append(url)
+    return unique
+
+
+async def resolve_message_urls(urls: list[str]) -> list[str]:
+    """
+    Qisqa linklarni to'liq URL'ga aylantirish va takrorlarni olib tashlash (tartib saqlanadi)
+
+    Dedup resolve'dan keyin qilinadi - bitta media'ga olib boruvchi qisqa va to'liq link
+    ikki alohida ish bo'lib, bitta single-flight kalitida uchrashmasligi uchun.
+    """
+    resolved = await asyncio.gather(*(resolve_short_link(url) for url in urls))
+    unique, seen = [], set()
+    for url in resolved:
+        key = canonical_media_key(url)
+        if key not in seen:
+            seen.add(key)
+            unique.append(url)
+    return unique
+
+
+def has_media_links(message: Message) -> Union[bool, Dict[str, list[str]]]:
+    """
+    Router filtri - xabarda qo'llab-quvvatlanadigan platforma linklari bo'lsa, ular handler'ga beriladi
+
+    Boshqa linkli (yoki linksiz) xabarlar bu yerda ushlanmaydi - keyingi router'lar ko'radi.
+    """
+    urls = [url for url in extract_message_urls(message) if is_valid_url(url) and detect_platform(url)]
+    return {'urls': urls} if urls else False
+
+
+@router.message(
+    F.text.startswith('http://') | F.text.startswith('https://')
+    | F.entities[...].type.in_({MessageEntityType.URL, MessageEntityType.TEXT_LINK}),
+    has_media_links,
+)
+async def handle_media_link(message: Message, urls: list[str]):
     """
     Media link'ni qayta ishlash
     YouTube, Instagram, TikTok va boshqa platformalardan media yuklab berish
+    Xabarda bir nechta link bo'lsa - parallel yuklab olinadi va tartib bilan yuboriladi
+
+    Args:
+        urls: has_media_links filtri topgan qo'llab-quvvatlanadigan linklar
     """
-    url = message.text.strip()
-    
-    logger.info(f"Media link qabul qilindi: {url}")
+    urls = await resolve_message_urls(urls)
     
-    if not is_valid_url(url):
-        logger.warning(f"Noto'g'ri URL format: {url}")
-        await message.answer("❌ Noto'g'ri URL format!")
+    if len(urls) > 1:
+        limit = config.bot.media_links_per_message
+        if len(urls) > limit:
+            # Ortiqcha linklar qayta ishlanmaydi - foydalanuvchi bilishi kerak (holat xabari oxirida o'chadi)
+            logger.info(f"Ko'p linkli xabar: {len(urls) - limit} ta link limitdan ortiq, o'tkazib yuborildi")
+            await message.answer(
+                f"⚠️ Xabarda {len(urls)} ta link bor - faqat birinchi {limit} tasi yuklab olinadi, "
+                f"qolgan {len(urls) - limit} tasi o'tkazib yuborildi.\n\n"
+                "Ularni alohida xabarda yuboring."
+            )
+        await handle_media_links(message, urls[:limit])
         return
     
-    # Platformani aniqlash
+    url = urls[0]
     platform = detect_platform(url)
-    logger.info(f"Platform aniqlandi: {platform} (URL: {url})")
-    
-    if not platform:
-        # Qo'llab-quvvatlanmaydigan platforma
-        await message.answer(
-            "❌ Bu platforma hozircha qo'llab-quvvatlanmaydi.\n\n"
-            "Qo'llab-quvvatlanadigan platformalar:\n"
-            "• YouTube\n"
-            "• Instagram\n"
-            "• TikTok\n"
-            "• Twitter/X\n"
-            "• Facebook"
-        )
-        return
+    logger.info(f"Media link qabul qilindi: {url} (platform: {platform})")
     
     # Loading xabari
     loading_msg = await message.answer("⏳ Media yuklanmoqda...")
+    await process_media_link(message, url, platform, loading_msg)
+
+
+async def handle_media_links(message: Message, urls: list[str]):
+    """
+    Bir xabardagi bir nechta linkni parallel qayta ishlash
+
+    Har bir link alohida cache tekshiruvi va yuklab olish navbatidan o'tadi (umumiy limitlar
+    download_scheduler'da), holat bitta umumiy xabarda ko'rsatiladi, natijalar esa
+    xabardagi tartibda yuboriladi.
+    """
+    logger.info(f"Ko'p linkli xabar qabul qilindi: {len(urls)} ta link")
+    
+    loading_msg = await message.answer(f"⏳ {len(urls)} ta link qayta ishlanmoqda...")
+    status = MultiLinkStatus(loading_msg, len(urls))
+    delivery = OrderedDelivery(len(urls))
     
+    async def _process(index: int, url: str):
+        link_status = status.link(index)
+        async with delivery.job(index):
+            if not is_valid_url(url):
+                await link_status.edit_text("❌ Noto'g'ri URL format!")
+                return
+            platform = detect_platform(url)
+            if not platform:
+                await link_status.edit_text(f"❌ Platforma qo'llab-quvvatlanmaydi: {url[:60]}")
+                return
+            await process_media_link(message, url, platform, link_status)
+    
+    try:
+        await asyncio.gather(*(_process(i, url) for i, url in enumerate(urls)))
+    finally:
+        await status.finish()
+
+
+async def process_media_link(
+    message: Message,
+    url: str,
+    platform: str,
+    loading_msg: Union[Message, LinkStatus],
+):
+    """
+    Bitta linkni qayta ishlash: qisqa linkni aniqlash, cache tekshiruvi, yuklab olish va yuborish
+    """
     try:
-        # Cache'dan tekshirish
-        cached_media = await get_cached_media(url)
+        # Qisqa linklar (vm.tiktok.com, fb.watch) to'liq URL'ga - cache kaliti va yt-dlp uchun
+        url = await resolve_short_link(url)
+        media_preference = await get_media_preference(message.from_user.id)
         
-        if cached_media:
+        # Cache'dan tekshirish - sozlamaga mos barcha variantlar (video, audio)
+        cached_items = await get_cached_variants(url, media_preference)
+        
+        if cached_items:
             # Cache'dan topildi - file_id bilan jo'natish
-            logger.info(f"Cache'dan topildi: {url}")
-            await loading_msg.delete()
+            logger.info(f"Cache'dan topildi: {url} ({len(cached_items)} ta variant)")
             
             try:
-                await send_cached_media(message, cached_media)
+                await send_cached_variants(message, cached_items)
+                await loading_msg.delete()
                 # Qo'shimcha xabar yuborilmaydi - faqat media
             except Exception as e:
                 logger.error(f"Cached media yuborishda xatolik: {e}")
                 # Agar cached media ishlamasa, qayta yuklab olish
-                await download_and_send_media(message, url, platform, loading_msg)
+                await download_and_send_media(message, url, platform, loading_msg, media_preference)
         else:
             # Cache'da yo'q - yuklab olish
-            await download_and_send_media(message, url, platform, loading_msg)
+            await download_and_send_media(message, url, platform, loading_msg, media_preference)
     
     except Exception as e:
         logger.error(f"Media link qayta ishlashda xatolik: {e}")
@@ -987,266 +1065,473 @@ async def handle_media_link(message: Message):
             )
 
 
-async def download_and_send_media(message: Message, url: str, platform: str, loading_msg: Message):
+async def get_media_preference(telegram_id: int) -> str:
+    """Foydalanuvchining media sozlamasi (video_audio, video_only, audio_only)"""
+    user = await get_user_by_telegram_id(telegram_id)
+    return user.media_preference if user else 'video_audio'  # Default: video_audio
+
+
+class PreparedMedia:
     """
-    Media'ni yuklab olish va yuborish
+    Single-flight natijasi - direct URL yoki yuklab olingan fayllar (hali yuborilmagan)
+
+    Natijani olgan har bir so'rov uni o'z navbatida yuboradi va release() qiladi - fayllar
+    oxirgi so'rov tugaganda o'chiriladi. Yuborish lock ostida: birinchi so'rov Telegram'ga
+    yuklaydi, keyingilari uning file_id'si bilan yuboradi.
     """
-    try:
-        # Foydalanuvchi sozlamalarini olish
-        user = await get_user_by_telegram_id(message.from_user.id)
-        media_preference = user.media_preference if user else 'video_audio'  # Default: video_audio
-        
-        # Media yuklab olish
-        await loading_msg.edit_text("⏳ Media yuklanmoqda...\n\n📥 Platformadan yuklab olinmoqda...")
-        
-        media_data = await download_media(url, platform)
-        
-        # Xatolik ma'lumotlarini tekshirish
-        if not media_data or (isinstance(media_data, dict) and 'error_type' in media_data and 'file_path' not in media_data):
-            # Xatolik bo'lganda
-            error_type = None
-            if isinstance(media_data, dict):
-                error_type = media_data.get('error_type')
-            
-            logger.error(f"Media yuklab olinmadi: {url}, xatolik turi: {error_type}")
-            
-            # TikTok uchun maxsus xabar
-            if platform == 'tiktok':
-                error_details = ""
-                
-                if error_type == 'ip_blocked':
-                    error_details = (
-                        "⚠️ IP manzil bloklangan:\n"
-                        "TikTok server IP manzilni vaqtinchalik bloklagan.\n\n"
-                        "🔧 Yechimlar:\n"
-                        "1. Bir necha daqiqadan keyin qayta urinib ko'ring\n"
-                        "2. VPN yoki proxy ishlatishni tavsiya qilamiz\n"
-                        "3. Boshqa TikTok linkini yuborib ko'ring\n\n"
-                    )
-                else:
-                    error_details = (
-                        "⚠️ Muammo sabablari:\n"
-                        "• Link to'g'ri emas yoki video o'chirilgan\n"
-                        "• Redirect muammosi\n"
-                        "• TikTok server muammosi\n\n"
-                        "🔧 Yechimlar:\n"
-                        "1. Link to'g'ri ekanligini tekshiring\n"
-                        "2. Video mavjudligini tekshiring\n"
-                        "3. To'g'ri TikTok video linkini yuboring:\n"
-                        "   • https://www.tiktok.com/@username/video/1234567890\n"
-                        "   • https://vm.tiktok.com/ZSNYW7Dd2\n\n"
-                    )
-                
-                await loading_msg.edit_text(
-                    f"❌ TikTok video yuklab olinmadi.\n\n"
-                    f"{error_details}"
-                    f"💡 Maslahat: Ba'zi TikTok linklar redirect muammosi tufayli "
-                    f"yuklab bo'lmaydi. To'liq video linkini yuborishni tavsiya qilamiz.\n\n"
-                    f"🔄 Qayta urinib ko'ring yoki boshqa link yuboring."
-                )
-            elif platform == 'instagram' and error_type in ('auth_required', 'story_unavailable'):
-                if error_type == 'auth_required':
-                    await loading_msg.edit_text(
-                        "❌ Instagram media yuklab olinmadi.\n\n"
-                        "⚠️ Sabab: Instagram login yoki cookies talab qilyapti (yoki rate-limit).\n\n"
-                        "🔧 Yechimlar:\n"
-                        "1. Serverda `INSTAGRAM_COOKIES_FILE` ni sozlang\n"
-                        "2. Cookies faylini yangilang (Netscape format)\n"
-                        "3. 5-10 daqiqadan keyin qayta urinib ko'ring\n\n"
-                        "💡 Misol: `INSTAGRAM_COOKIES_FILE=/app/cookies.txt`"
-                    )
-                else:
-                    await loading_msg.edit_text(
-                        "❌ Instagram Story yuklab olinmadi.\n\n"
-                        "⚠️ Story vaqtincha mavjud emas yoki muddati tugagan bo'lishi mumkin.\n\n"
-                        "🔧 Yechimlar:\n"
-                        "1. Yangi story link yuboring\n"
-                        "2. Cookies faylini yangilang\n"
-                        "3. Post yoki Reel link bilan urinib ko'ring"
-                    )
-            elif platform == 'youtube' and error_type in ('auth_required', 'format_unavailable'):
-                if error_type == 'auth_required':
-                    await loading_msg.edit_text(
-                        "❌ YouTube media yuklab olinmadi.\n\n"
-                        "⚠️ Sabab: YouTube qo'shimcha tekshiruv (anti-bot) so'radi.\n\n"
-                        "🔧 Yechimlar:\n"
-                        "1. YouTube cookies faylini yangilang (Netscape format)\n"
-                        "2. Serverda `YOUTUBE_COOKIES_FILE=/app/cookies.txt` ni sozlang\n"
-                        "3. 5-10 daqiqadan keyin qayta urinib ko'ring\n\n"
-                        "💡 Eslatma: cookies ichida `.youtube.com` yoki `.google.com` sessiya cookie'lari bo'lishi kerak."
-                    )
-                else:
-                    await loading_msg.edit_text(
-                        "❌ YouTube media formatlari topilmadi.\n\n"
-                        "⚠️ Bu video uchun mos streamlar vaqtincha olinmadi.\n\n"
-                        "🔧 Yechimlar:\n"
-                        "1. Linkni qayta yuborib ko'ring\n"
-                        "2. Boshqa videoni sinab ko'ring\n"
-                        "3. 2-3 daqiqadan keyin qayta urinib ko'ring"
-                    )
-            else:
-                # Boshqa platformalar uchun umumiy xabar
-                await loading_msg.edit_text(
-                    "❌ Media yuklab olinmadi.\n\n"
-                    "Iltimos, link to'g'ri ekanligini tekshiring yoki qayta urinib ko'ring.\n\n"
-                    "⚠️ Eslatma: yt-dlp kutubxonasi o'rnatilganligini tekshiring:\n"
-                    "pip install yt-dlp"
-                )
+
+    def __init__(self, media_data: Optional[Dict] = None, direct: Optional[Dict] = None):
+        self.media_data = media_data
+        self.direct = direct
+        self.cached_media = None
+        self.lock = asyncio.Lock()
+        self._refs = 1
+
+    def retain(self, count: int) -> None:
+        """Natijani kutayotgan so'rovlarni hisobga olish"""
+        self._refs += count
+
+    async def release(self) -> None:
+        """So'rov natijadan foydalanib bo'ldi - oxirgisi temporary fayllarni o'chiradi"""
+        self._refs -= 1
+        if self._refs > 0 or not self.media_data or 'file_path' not in self.media_data:
             return
+        await cleanup_temp_files(self.media_data['file_path'])
+        if self.media_data.get('thumbnail_path'):
+            await cleanup_temp_files(self.media_data['thumbnail_path'])
+
+
+async def download_and_send_media(
+    message: Message,
+    url: str,
+    platform: str,
+    loading_msg: Union[Message, StatusMessage, LinkStatus],
+    media_preference: str = None,
+):
+    """
+    Media'ni yuklab olish va yuborish (single-flight orqali)
+    Bir xil URL parallel so'ralsa, faqat birinchi so'rov yuklab oladi. Har bir so'rov natijani
+    o'z navbatida yuboradi: birinchisi Telegram'ga yuklaydi, qolganlari tayyor file_id bilan.
+    
+    Args:
+        media_preference: Foydalanuvchi sozlamasi (berilmasa database'dan olinadi)
+    
+    Returns:
+        Cache'ga saqlangan MediaLink yoki None
+    """
+    if media_preference is None:
+        media_preference = await get_media_preference(message.from_user.id)
+    # Bir xil media'ning turli URL ko'rinishlari (youtu.be / watch?v=) ham birlashtiriladi,
+    # audio_only so'rovlari alohida (boshqa format yuklanadi)
+    key = canonical_media_key(url, preference_variant(media_preference))
+    # Holat xabari tahrirlari throttled - progress va ketma-ket edit_text'lar birlashtiriladi
+    # (ko'p linkli xabarda umumiy holat xabarining link qatori beriladi)
+    status = StatusMessage(loading_msg) if isinstance(loading_msg, Message) else loading_msg
+    
+    try:
+        if media_flight.in_flight(key):
+            await status.edit_text("⏳ Media yuklanmoqda...\n\n👥 Bu link hozir boshqa so'rov uchun yuklanmoqda, kuting...")
+        
+        # Flight faqat media'ni tayyorlaydi, navbat kutish va yuborish - undan tashqarida: flight ichida
+        # kutilsa, linklari teskari tartibda bo'lgan ikki xabar bir-birini kutib qolishi mumkin
+        prepared, _ = await media_flight.do(
+            key,
+            lambda: _prepare_media(message, url, platform, status, media_preference),
+            on_result=lambda result, waiters: result.retain(waiters),
+            on_abandon=lambda result: result.release(),
+        )
+        if prepared is None:
+            await status.edit_text(
+                "❌ Media yuklab olinmadi.\n\n"
+                "Iltimos, link to'g'ri ekanligini tekshiring yoki qayta urinib ko'ring."
+            )
+            return None
+        try:
+            return await _deliver_prepared_media(message, url, platform, status, media_preference, prepared)
+        finally:
+            await prepared.release()
+    finally:
+        # Oxirgi holat (masalan xatolik xabari) kutib qolmasligi uchun
+        await status.flush()
+
+
+async def _prepare_media(
+    message: Message,
+    url: str,
+    platform: str,
+    loading_msg: Union[StatusMessage, LinkStatus],
+    media_preference: str,
+) -> PreparedMedia:
+    """
+    Media'ni yuborishga tayyorlash (single-flight ichida) - hech narsa yuborilmaydi, navbat kutilmaydi
+    
+    Returns:
+        PreparedMedia - direct URL yoki download_media natijasi (xatolikda error_type bilan)
+    """
+    # Kichik klip - to'g'ridan-to'g'ri URL orqali yuboriladi (fayl serverimizdan o'tmaydi).
+    # URL orqali faqat video yuboriladi - video_audio'da audio keyin alohida yuboriladi
+    if media_preference != 'audio_only':
+        try:
+            direct = await resolve_direct_media(url, platform)
+        except Exception as e:
+            logger.error(f"Direct URL aniqlashda xatolik: {e}")
+            direct = None
+        if direct:
+            return PreparedMedia(direct=direct)
+    
+    return PreparedMedia(media_data=await _download_for_delivery(message, url, platform, loading_msg, media_preference))
+
+
+async def _download_for_delivery(
+    message: Message,
+    url: str,
+    platform: str,
+    loading_msg: Union[StatusMessage, LinkStatus],
+    media_preference: str,
+) -> Optional[Dict]:
+    """
+    Media'ni platformadan yuklab olish (holat xabarida navbat va progress ko'rsatiladi)
+    
+    Returns:
+        download_media natijasi (xatolikda error_type bilan) yoki None
+    """
+    await loading_msg.edit_text("⏳ Media yuklanmoqda...\n\n📥 Platformadan yuklab olinmoqda...")
+    
+    async def _show_queue_position(position: int):
+        if position:
+            await loading_msg.edit_text(f"⏳ Media yuklanmoqda...\n\n🕒 Navbatdasiz: {position}-o'rin")
+        else:
+            await loading_msg.edit_text("⏳ Media yuklanmoqda...\n\n📥 Platformadan yuklab olinmoqda...")
+    
+    try:
+        return await download_media(
+            url,
+            platform,
+            user_id=message.from_user.id,
+            on_queue_position=_show_queue_position,
+            on_progress=loading_msg.report_download,
+            media_preference=media_preference,
+        )
+    except Exception as e:
+        logger.error(f"Media yuklab olishda xatolik: {e}")
+        return None
+
+
+def _is_download_error(media_data: Optional[Dict]) -> bool:
+    """download_media natijasida fayl yo'q (None yoki faqat error_type)"""
+    return not media_data or 'file_path' not in media_data
+
+
+async def _deliver_prepared_media(
+    message: Message,
+    url: str,
+    platform: str,
+    loading_msg: Union[StatusMessage, LinkStatus],
+    media_preference: str,
+    prepared: PreparedMedia,
+):
+    """
+    Tayyorlangan media'ni so'rovning o'z navbatida yuborish
+    
+    Returns:
+        Cache'ga saqlangan MediaLink yoki None
+    """
+    if not prepared.direct and _is_download_error(prepared.media_data):
+        await _show_download_error(loading_msg, url, platform, prepared.media_data)
+        return None
+    
+    # Ko'p linkli xabarda - oldingi linklar yuborilishini kutish (tartib saqlanadi)
+    await wait_delivery_turn()
+    
+    async with prepared.lock:
+        if prepared.cached_media:
+            # Natijani boshqa so'rov allaqachon yuborgan - file_id bilan (u saqlagan audio varianti bilan)
+            try:
+                await send_cached_variants(message, await get_cached_variants(url, media_preference) or [prepared.cached_media])
+                await loading_msg.delete()
+                return prepared.cached_media
+            except Exception as e:
+                logger.error(f"Single-flight natijasini yuborishda xatolik: {e}")
+        
+        if prepared.direct:
+            delivered, cached_media = await _send_direct_media(message, url, platform, loading_msg, prepared.direct)
+            if delivered:
+                if media_preference == 'video_audio':
+                    await _send_direct_audio(message, url, platform, loading_msg, prepared.direct)
+                await loading_msg.delete()
+                prepared.cached_media = cached_media
+                return cached_media
+            # Telegram URL'ni yuklay olmadi - lokal yuklab olinadi (keyingi so'rovlar ham shu fayldan)
+            prepared.direct = None
+            prepared.media_data = await _download_for_delivery(message, url, platform, loading_msg, media_preference)
+            if _is_download_error(prepared.media_data):
+                await _show_download_error(loading_msg, url, platform, prepared.media_data)
+                return None
+        
+        cached_media = await _send_downloaded_media(message, url, platform, loading_msg, media_preference, prepared.media_data)
+        if cached_media:
+            prepared.cached_media = cached_media
+        return cached_media
+
+
+async def _show_download_error(
+    loading_msg: Union[StatusMessage, LinkStatus],
+    url: str,
+    platform: str,
+    media_data: Optional[Dict],
+):
+    """Yuklab olish xatoligini turi va platformasiga mos xabar bilan ko'rsatish"""
+    # Xatolik bo'lganda
+    error_type = None
+    if isinstance(media_data, dict):
+        error_type = media_data.get('error_type')
+    
+    logger.error(f"Media yuklab olinmadi: {url}, xatolik turi: {error_type}")
+    
+    # Metadata tekshiruvi rad etgan media (barcha platformalar uchun)
+    if error_type in ('too_large', 'too_long', 'is_live'):
+        if error_type == 'too_large':
+            reason = f"Fayl hajmi Telegram limitidan ({config.bot.media_upload_limit_mb} MB) katta."
+        elif error_type == 'too_long':
+            reason = f"Media juda uzun (limit: {format_duration(config.bot.media_max_duration)})."
+        else:
+            reason = "Jonli efirni yuklab bo'lmaydi."
+        await loading_msg.edit_text(
+            "❌ Media yuklab olinmadi.\n\n"
+            f"⚠️ Sabab: {reason}\n\n"
+            "💡 Qisqaroq video linkini yuborib ko'ring."
+        )
+    elif error_type == 'unavailable':
+        await loading_msg.edit_text(
+            "❌ Media yuklab olinmadi.\n\n"
+            "⚠️ Sabab: Media o'chirilgan, yopiq yoki mavjud emas.\n\n"
+            "💡 Boshqa link yuborib ko'ring."
+        )
+    elif error_type == 'auth_required':
+        await loading_msg.edit_text(
+            "❌ Media yuklab olinmadi.\n\n"
+            "⚠️ Sabab: Media yopiq (private), yosh cheklovli yoki faqat login bilan ko'rinadi.\n\n"
+            "💡 Ochiq (public) media linkini yuborib ko'ring."
+        )
+    elif error_type == 'rate_limited':
+        await loading_msg.edit_text(
+            "❌ Media yuklab olinmadi.\n\n"
+            "⚠️ Sabab: Platforma so'rovlar sonini vaqtincha chekladi.\n\n"
+            "🔄 1-2 daqiqadan keyin qayta urinib ko'ring."
+        )
+    # TikTok uchun maxsus xabar
+    elif platform == 'tiktok':
+        error_details = ""
+        
+        if error_type == 'ip_blocked':
+            error_details = (
+                "⚠️ IP manzil bloklangan:\n"
+                "TikTok server IP manzilni vaqtinchalik bloklagan.\n\n"
+                "🔧 Yechimlar:\n"
+                "1. Bir necha daqiqadan keyin qayta urinib ko'ring\n"
+                "2. VPN yoki proxy ishlatishni tavsiya qilamiz\n"
+                "3. Boshqa TikTok linkini yuborib ko'ring\n\n"
+            )
+        else:
+            error_details = (
+                "⚠️ Muammo sabablari:\n"
+                "• Link to'g'ri emas yoki video o'chirilgan\n"
+                "• Redirect muammosi\n"
+                "• TikTok server muammosi\n\n"
+                "🔧 Yechimlar:\n"
+                "1. Link to'g'ri ekanligini tekshiring\n"
+                "2. Video mavjudligini tekshiring\n"
+                "3. To'g'ri TikTok video linkini yuboring:\n"
+                "   • https://www.tiktok.com/@username/video/1234567890\n"
+                "   • https://vm.tiktok.com/ZSNYW7Dd2\n\n"
+            )
         
-        if not media_data:
-            logger.error(f"Media yuklab olinmadi: {url}")
-            
-            # TikTok uchun maxsus xabar
-            if platform == 'tiktok':
-                error_details = (
-                    "⚠️ Muammo sabablari:\n"
-                    "• Link to'g'ri emas yoki video o'chirilgan\n"
-                    "• Redirect muammosi\n"
-                    "• TikTok server muammosi\n\n"
-                    "🔧 Yechimlar:\n"
-                    "1. Link to'g'ri ekanligini tekshiring\n"
-                    "2. Video mavjudligini tekshiring\n"
-                    "3. To'g'ri TikTok video linkini yuboring:\n"
-                    "   • https://www.tiktok.com/@username/video/1234567890\n"
-                    "   • https://vm.tiktok.com/ZSNYW7Dd2\n\n"
-                )
-                
-                await loading_msg.edit_text(
-                    f"❌ TikTok video yuklab olinmadi.\n\n"
-                    f"{error_details}"
-                    f"💡 Maslahat: Ba'zi TikTok linklar redirect muammosi tufayli "
-                    f"yuklab bo'lmaydi. To'liq video linkini yuborishni tavsiya qilamiz.\n\n"
-                    f"🔄 Qayta urinib ko'ring yoki boshqa link yuboring."
-                )
-                error_details = ""
-                
-                if error_type == 'ip_blocked':
-                    error_details = (
-                        "⚠️ IP manzil bloklangan:\n"
-                        "TikTok server IP manzilni vaqtinchalik bloklagan.\n\n"
-                        "🔧 Yechimlar:\n"
-                        "1. Bir necha daqiqadan keyin qayta urinib ko'ring\n"
-                        "2. VPN yoki proxy ishlatishni tavsiya qilamiz\n"
-                        "3. Boshqa TikTok linkini yuborib ko'ring\n\n"
-                    )
-                else:
-                    error_details = (
-                        "⚠️ Muammo sabablari:\n"
-                        "• Link to'g'ri emas yoki video o'chirilgan\n"
-                        "• Redirect muammosi\n"
-                        "• TikTok server muammosi\n\n"
-                        "🔧 Yechimlar:\n"
-                        "1. Link to'g'ri ekanligini tekshiring\n"
-                        "2. Video mavjudligini tekshiring\n"
-                        "3. To'g'ri TikTok video linkini yuboring:\n"
-                        "   • https://www.tiktok.com/@username/video/1234567890\n"
-                        "   • https://vm.tiktok.com/ZSNYW7Dd2\n\n"
-                    )
-                
-                await loading_msg.edit_text(
-                    f"❌ TikTok video yuklab olinmadi.\n\n"
-                    f"{error_details}"
-                    f"💡 Maslahat: Ba'zi TikTok linklar redirect muammosi tufayli "
-                    f"yuklab bo'lmaydi. To'liq video linkini yuborishni tavsiya qilamiz.\n\n"
-                    f"🔄 Qayta urinib ko'ring yoki boshqa link yuboring."
-                )
-            # Instagram story uchun maxsus xabar
-            elif platform == 'instagram' and ('/stories/' in url or '/story/' in url):
-                await loading_msg.edit_text(
-                    "❌ Instagram Story yuklab olinmadi.\n\n"
-                    "⚠️ Instagram Story'lar ba'zida yuklab olinmaydi:\n\n"
-                    "🔧 Yechimlar:\n"
-                    "1. Cookies'ni yangilang (yangi cookies oling)\n"
-                    "2. Bir necha daqiqadan keyin qayta urinib ko'ring\n"
-                    "3. Instagram Post yoki Reel linkini yuboring\n\n"
-                    "💡 Maslahat: Instagram Story'lar qisqa muddatli kontent, "
-                    "vaqti o'tgach yuklab bo'lmaydi.\n\n"
-                    "📖 Cookies qo'shish: INSTAGRAM_COOKIES_GUIDE.md faylini ko'ring."
-                )
-            else:
-                await loading_msg.edit_text(
-                    "❌ Media yuklab olinmadi.\n\n"
-                    "Iltimos, link to'g'ri ekanligini tekshiring yoki qayta urinib ko'ring.\n\n"
-                    "⚠️ Eslatma: yt-dlp kutubxonasi o'rnatilganligini tekshiring:\n"
-                    "pip install yt-dlp"
-                )
-            return
+        await loading_msg.edit_text(
+            f"❌ TikTok video yuklab olinmadi.\n\n"
+            f"{error_details}"
+            f"💡 Maslahat: Ba'zi TikTok linklar redirect muammosi tufayli "
+            f"yuklab bo'lmaydi. To'liq video linkini yuborishni tavsiya qilamiz.\n\n"
+            f"🔄 Qayta urinib ko'ring yoki boshqa link yuboring."
+        )
+    elif platform == 'instagram' and error_type in ('blocked', 'story_unavailable'):
+        if error_type == 'blocked':
+            await loading_msg.edit_text(
+                "❌ Instagram media yuklab olinmadi.\n\n"
+                "⚠️ Sabab: Instagram login yoki cookies talab qilyapti (yoki rate-limit).\n\n"
+                "🔧 Yechimlar:\n"
+                "1. Serverda `INSTAGRAM_COOKIES_FILE` ni sozlang\n"
+                "2. Cookies faylini yangilang (Netscape format)\n"
+                "3. 5-10 daqiqadan keyin qayta urinib ko'ring\n\n"
+                "💡 Misol: `INSTAGRAM_COOKIES_FILE=/app/cookies.txt`"
+            )
+        else:
+            await loading_msg.edit_text(
+                "❌ Instagram Story yuklab olinmadi.\n\n"
+                "⚠️ Story vaqtincha mavjud emas yoki muddati tugagan bo'lishi mumkin.\n\n"
+                "🔧 Yechimlar:\n"
+                "1. Yangi story link yuboring\n"
+                "2. Cookies faylini yangilang\n"
+                "3. Post yoki Reel link bilan urinib ko'ring"
+            )
+    elif platform == 'youtube' and error_type in ('blocked', 'format_unavailable'):
+        if error_type == 'blocked':
+            await loading_msg.edit_text(
+                "❌ YouTube media yuklab olinmadi.\n\n"
+                "⚠️ Sabab: YouTube qo'shimcha tekshiruv (anti-bot) so'radi.\n\n"
+                "🔧 Yechimlar:\n"
+                "1. YouTube cookies faylini yangilang (Netscape format)\n"
+                "2. Serverda `YOUTUBE_COOKIES_FILE=/app/cookies.txt` ni sozlang\n"
+                "3. 5-10 daqiqadan keyin qayta urinib ko'ring\n\n"
+                "💡 Eslatma: cookies ichida `.youtube.com` yoki `.google.com` sessiya cookie'lari bo'lishi kerak."
+            )
+        else:
+            await loading_msg.edit_text(
+                "❌ YouTube media formatlari topilmadi.\n\n"
+                "⚠️ Bu video uchun mos streamlar vaqtincha olinmadi.\n\n"
+                "🔧 Yechimlar:\n"
+                "1. Linkni qayta yuborib ko'ring\n"
+                "2. Boshqa videoni sinab ko'ring\n"
+                "3. 2-3 daqiqadan keyin qayta urinib ko'ring"
+            )
+    else:
+        # Boshqa platformalar uchun umumiy xabar
+        await loading_msg.edit_text(
+            "❌ Media yuklab olinmadi.\n\n"
+            "Iltimos, link to'g'ri ekanligini tekshiring yoki qayta urinib ko'ring.\n\n"
+            "⚠️ Eslatma: yt-dlp kutubxonasi o'rnatilganligini tekshiring:\n"
+            "pip install yt-dlp"
+        )
+
+
+async def _send_downloaded_media(
+    message: Message,
+    url: str,
+    platform: str,
+    loading_msg: Union[StatusMessage, LinkStatus],
+    media_preference: str,
+    media_data: Dict,
+):
+    """
+    Yuklab olingan media'ni yuborish va cache'ga saqlash (fayllarni PreparedMedia o'chiradi)
+    
+    Returns:
+        Cache'ga saqlangan MediaLink yoki None
+    """
+    cached_media = None
+    try:
+        # Albom (karusel, story to'plami) - send_media_group orqali
+        if media_data.get('album'):
+            return await _send_album(message, url, platform, media_data, loading_msg)
         
         # Media'ni Telegram'ga yuborish
         await loading_msg.edit_text("⏳ Media yuborilmoqda...")
         
         file_path = media_data['file_path']
-        file = FSInputFile(file_path)
         
         # Fayl turini aniqlash
         file_ext = Path(file_path).suffix.lower()
         is_video = file_ext in ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv')
         is_audio = file_ext in ('.mp3', '.m4a', '.ogg', '.wav', '.flac')
         is_photo = file_ext in ('.jpg', '.jpeg', '.png', '.webp')
+        file_type = 'video' if is_video else 'audio' if is_audio else 'photo' if is_photo else 'document'
+        
+        # Tarkibi bir xil media (boshqa URL'dagi repost) avval yuborilgan bo'lsa - upload o'rniga mavjud file_id.
+        # audio_only'da video yuborilmaydi - tekshiruv kerak emas
+        fingerprint, duplicate = None, None
+        if not (is_video and media_preference == 'audio_only'):
+            fingerprint = await asyncio.to_thread(compute_content_fingerprint, file_path)
+            if fingerprint:
+                duplicate = await find_media_by_fingerprint(fingerprint, file_type)
+        if duplicate:
+            logger.info(f"Takroriy media, upload o'tkazib yuborildi: {url} -> {duplicate.url}")
+            metrics.increment('dedup.upload_skipped')
+            metrics.increment('dedup.bytes_saved', Path(file_path).stat().st_size)
+            file = duplicate.file_id
+        else:
+            file = telegram_input_file(file_path, on_progress=loading_msg.report_upload)
         
         sent_message = None
         
-        try:
-            # Duration'ni integer'ga aylantirish (Telegram API integer kutmoqda)
-            duration = None
-            if media_data.get('duration') is not None:
-                duration = int(media_data['duration'])
-            
-            # Caption va keyboard yaratish
-            caption = format_media_caption(
-                title=media_data.get('title'),
-                platform=platform,
-                duration=duration,
-                file_size=Path(file_path).stat().st_size if Path(file_path).exists() else None
-            )
-            keyboard = await get_bot_link_keyboard(message.bot)
-            
-            if is_video:
-                # Foydalanuvchi sozlamalariga qarab video/audio yuborish
-                if media_preference == 'video_only':
-                    # Faqat video yuborish
-                    if media_data.get('thumbnail_path'):
-                        thumb = FSInputFile(media_data['thumbnail_path'])
-                        sent_message = await message.answer_video(
-                            video=file,
-                            caption=caption,
-                            thumbnail=thumb,
-                            duration=duration,
-                            reply_markup=keyboard,
-                        )
-                    else:
-                        sent_message = await message.answer_video(
-                            video=file,
-                            caption=caption,
-                            duration=duration,
-                            reply_markup=keyboard,
-                        )
-                    
-                elif media_preference == 'audio_only':
-                    # Faqat audio yuborish (agar audio_path mavjud bo'lsa)
-                    if media_data.get('audio_path'):
-                        try:
-                            await loading_msg.edit_text("⏳ Audio yuborilmoqda...")
-                            
-                            audio_file = FSInputFile(media_data['audio_path'])
-                            audio_caption = format_media_caption(
-                                title=media_data.get('title'),
-                                platform=platform,
+        # Takroriy media file_id'si eskirgan bo'lsa - ikkinchi urinishda lokal fayl yuklanadi
+        for _ in range(2):
+            try:
+                # Duration'ni integer'ga aylantirish (Telegram API integer kutmoqda)
+                duration = None
+                if media_data.get('duration') is not None:
+                    duration = int(media_data['duration'])
+                
+                # Caption va keyboard yaratish
+                caption = format_media_caption(
+                    title=media_data.get('title'),
+                    platform=platform,
+                    duration=duration,
+                    file_size=Path(file_path).stat().st_size if Path(file_path).exists() else None
+                )
+                keyboard = await get_bot_link_keyboard(message.bot)
+                
+                if is_video:
+                    # Foydalanuvchi sozlamalariga qarab video/audio yuborish
+                    if media_preference == 'video_only':
+                        # Faqat video yuborish
+                        if media_data.get('thumbnail_path'):
+                            thumb = FSInputFile(media_data['thumbnail_path'])
+                            sent_message = await message.answer_video(
+                                video=file,
+                                caption=caption,
+                                thumbnail=thumb,
                                 duration=duration,
-                                file_size=Path(media_data['audio_path']).stat().st_size if Path(media_data['audio_path']).exists() else None
+                                reply_markup=keyboard,
                             )
-                            
-                            sent_message = await message.answer_audio(
-                                audio=audio_file,
-                                caption=audio_caption,
+                        else:
+                            sent_message = await message.answer_video(
+                                video=file,
+                                caption=caption,
                                 duration=duration,
                                 reply_markup=keyboard,
                             )
-                            logger.info(f"Audio yuborildi: {media_data.get('title')}")
-                        except Exception as e:
-                            logger.error(f"Audio yuborishda xatolik: {e}")
-                            # Audio yuborishda xatolik bo'lsa, video yuborish
+                        
+                    elif media_preference == 'audio_only':
+                        # Faqat audio yuborish (agar audio_path mavjud bo'lsa)
+                        if media_data.get('audio_path'):
+                            try:
+                                await loading_msg.edit_text("⏳ Audio yuborilmoqda...")
+                                
+                                audio_file = telegram_input_file(media_data['audio_path'], on_progress=loading_msg.report_upload)
+                                audio_caption = format_media_caption(
+                                    title=media_data.get('title'),
+                                    platform=platform,
+                                    duration=duration,
+                                    file_size=Path(media_data['audio_path']).stat().st_size if Path(media_data['audio_path']).exists() else None
+                                )
+                                
+                                sent_message = await message.answer_audio(
+                                    audio=audio_file,
+                                    caption=audio_caption,
+                                    duration=duration,
+                                    reply_markup=keyboard,
+                                )
+                                logger.info(f"Audio yuborildi: {media_data.get('title')}")
+                            except Exception as e:
+                                logger.error(f"Audio yuborishda xatolik: {e}")
+                                # Audio yuborishda xatolik bo'lsa, video yuborish
+                                if media_data.get('thumbnail_path'):
+                                    thumb = FSInputFile(media_data['thumbnail_path'])
+                                    sent_message = await message.answer_video(
+                                        video=file,
+                                        caption=caption,
+                                        thumbnail=thumb,
+                                        duration=duration,
+                                        reply_markup=keyboard,
+                                    )
+                                else:
+                                    sent_message = await message.answer_video(
+                                        video=file,
+                                        caption=caption,
+                                        duration=duration,
+                                        reply_markup=keyboard,
+                                    )
+                        else:
+                            # Audio yo'q bo'lsa, video yuborish
                             if media_data.get('thumbnail_path'):
                                 thumb = FSInputFile(media_data['thumbnail_path'])
                                 sent_message = await message.answer_video(
@@ -1263,8 +1548,9 @@ async def download_and_send_media(message: Message, url: str, platform: str, loa
                                     duration=duration,
                                     reply_markup=keyboard,
                                 )
-                    else:
-                        # Audio yo'q bo'lsa, video yuborish
+                    
+                    else:  # video_audio (default)
+                        # Video + Audio yuborish
                         if media_data.get('thumbnail_path'):
                             thumb = FSInputFile(media_data['thumbnail_path'])
                             sent_message = await message.answer_video(
@@ -1281,147 +1567,134 @@ async def download_and_send_media(message: Message, url: str, platform: str, loa
                                 duration=duration,
                                 reply_markup=keyboard,
                             )
-                
-                else:  # video_audio (default)
-                    # Video + Audio yuborish
-                    if media_data.get('thumbnail_path'):
-                        thumb = FSInputFile(media_data['thumbnail_path'])
-                        sent_message = await message.answer_video(
-                            video=file,
-                            caption=caption,
-                            thumbnail=thumb,
-                            duration=duration,
-                            reply_markup=keyboard,
+                        
+                        # Agar video bo'lsa va audio_path mavjud bo'lsa, audio ham yuborish
+                        if media_data.get('audio_path'):
+                            try:
+                                await _send_audio_file(
+                                    message, url, platform, loading_msg,
+                                    media_data['audio_path'], media_data.get('title'), duration, keyboard,
+                                )
+                            except Exception as e:
+                                logger.error(f"Audio yuborishda xatolik: {e}")
+                                # Audio yuborishda xatolik bo'lsa ham, video yuborilgan bo'ladi
+                    
+                    # Cache'ga saqlash - barcha videolar saqlanadi (audio_only'da yuborilgan audio - audio varianti)
+                    if sent_message.audio:
+                        cached_media = await save_media_cache(
+                            url=url,
+                            platform=platform,
+                            file_id=sent_message.audio.file_id,
+                            file_type='audio',
+                            file_unique_id=sent_message.audio.file_unique_id,
+                            title=media_data.get('title'),
+                            file_size=sent_message.audio.file_size,
+                            duration=sent_message.audio.duration,
+                            variant=AUDIO_VARIANT,
                         )
-                    else:
-                        sent_message = await message.answer_video(
-                            video=file,
-                            caption=caption,
-                            duration=duration,
-                            reply_markup=keyboard,
+                    elif sent_message.video:
+                        # Thumbnail file_id'ni olish (agar mavjud bo'lsa)
+                        thumbnail_file_id = None
+                        if sent_message.video.thumbnail:
+                            thumbnail_file_id = sent_message.video.thumbnail.file_id
+                        
+                        cached_media = await save_media_cache(
+                            url=url,
+                            platform=platform,
+                            file_id=sent_message.video.file_id,
+                            file_type='video',
+                            file_unique_id=sent_message.video.file_unique_id,
+                            title=media_data.get('title'),
+                            thumbnail_file_id=thumbnail_file_id,
+                            file_size=sent_message.video.file_size,
+                            duration=sent_message.video.duration,
+                            content_fingerprint=fingerprint,
                         )
-                    
-                    # Agar video bo'lsa va audio_path mavjud bo'lsa, audio ham yuborish
-                    if media_data.get('audio_path'):
-                        try:
-                            await loading_msg.edit_text("⏳ Audio yuborilmoqda...")
-                            
-                            audio_file = FSInputFile(media_data['audio_path'])
-                            audio_caption = format_media_caption(
-                                title=media_data.get('title'),
-                                platform=platform,
-                                duration=duration,
-                                file_size=Path(media_data['audio_path']).stat().st_size if Path(media_data['audio_path']).exists() else None
-                            )
-                            
-                            # Audio yuborish
-                            await message.answer_audio(
-                                audio=audio_file,
-                                caption=audio_caption,
-                                duration=duration,
-                                reply_markup=keyboard,
-                            )
-                            logger.info(f"Audio yuborildi: {media_data.get('title')}")
-                        except Exception as e:
-                            logger.error(f"Audio yuborishda xatolik: {e}")
-                            # Audio yuborishda xatolik bo'lsa ham, video yuborilgan bo'ladi
+                        logger.info(f"Video cache'ga saqlandi: {url} (file_id: {sent_message.video.file_id})")
                 
-                # Cache'ga saqlash - barcha videolar saqlanadi
-                if sent_message.video:
-                    # Thumbnail file_id'ni olish (agar mavjud bo'lsa)
-                    thumbnail_file_id = None
-                    if sent_message.video.thumbnail:
-                        thumbnail_file_id = sent_message.video.thumbnail.file_id
-                    
-                    await save_media_cache(
-                        url=url,
-                        platform=platform,
-                        file_id=sent_message.video.file_id,
-                        file_type='video',
-                        file_unique_id=sent_message.video.file_unique_id,
-                        title=media_data.get('title'),
-                        thumbnail_file_id=thumbnail_file_id,
-                        file_size=sent_message.video.file_size,
-                        duration=sent_message.video.duration,
+                elif is_audio:
+                    # Audio yuborish
+                    sent_message = await message.answer_audio(
+                        audio=file,
+                        caption=caption,
+                        duration=duration,
+                        reply_markup=keyboard,
                     )
-                    logger.info(f"Video cache'ga saqlandi: {url} (file_id: {sent_message.video.file_id})")
-            
-            elif is_audio:
-                # Audio yuborish
-                sent_message = await message.answer_audio(
-                    audio=file,
-                    caption=caption,
-                    duration=duration,
-                    reply_markup=keyboard,
-                )
-                
-                # Cache'ga saqlash
-                if sent_message.audio:
-                    await save_media_cache(
-                        url=url,
-                        platform=platform,
-                        file_id=sent_message.audio.file_id,
-                        file_type='audio',
-                        file_unique_id=sent_message.audio.file_unique_id,
-                        title=media_data.get('title'),
-                        file_size=sent_message.audio.file_size,
-                        duration=sent_message.audio.duration,
+                    
+                    # Cache'ga saqlash (audio_only so'rovi - audio varianti)
+                    if sent_message.audio:
+                        cached_media = await save_media_cache(
+                            url=url,
+                            platform=platform,
+                            file_id=sent_message.audio.file_id,
+                            file_type='audio',
+                            file_unique_id=sent_message.audio.file_unique_id,
+                            title=media_data.get('title'),
+                            file_size=sent_message.audio.file_size,
+                            duration=sent_message.audio.duration,
+                            variant=preference_variant(media_preference),
+                            content_fingerprint=fingerprint,
+                        )
+                elif is_photo:
+                    sent_message = await message.answer_photo(
+                        photo=file,
+                        caption=caption,
+                        reply_markup=keyboard,
                     )
-            elif is_photo:
-                sent_message = await message.answer_photo(
-                    photo=file,
-                    caption=caption,
-                    reply_markup=keyboard,
-                )
 
-                if sent_message.photo:
-                    largest_photo = sent_message.photo[-1]
-                    await save_media_cache(
-                        url=url,
-                        platform=platform,
-                        file_id=largest_photo.file_id,
-                        file_type='photo',
-                        file_unique_id=largest_photo.file_unique_id,
-                        title=media_data.get('title'),
-                        file_size=largest_photo.file_size,
-                    )
-            
-            else:
-                # Document sifatida yuborish
-                sent_message = await message.answer_document(
-                    document=file,
-                    caption=caption,
-                    reply_markup=keyboard,
-                )
+                    if sent_message.photo:
+                        largest_photo = sent_message.photo[-1]
+                        cached_media = await save_media_cache(
+                            url=url,
+                            platform=platform,
+                            file_id=largest_photo.file_id,
+                            file_type='photo',
+                            file_unique_id=largest_photo.file_unique_id,
+                            title=media_data.get('title'),
+                            file_size=largest_photo.file_size,
+                            content_fingerprint=fingerprint,
+                        )
                 
-                # Cache'ga saqlash
-                if sent_message.document:
-                    await save_media_cache(
-                        url=url,
-                        platform=platform,
-                        file_id=sent_message.document.file_id,
-                        file_type='document',
-                        file_unique_id=sent_message.document.file_unique_id,
-                        title=media_data.get('title'),
-                        file_size=sent_message.document.file_size,
+                else:
+                    # Document sifatida yuborish
+                    sent_message = await message.answer_document(
+                        document=file,
+                        caption=caption,
+                        reply_markup=keyboard,
                     )
+                    
+                    # Cache'ga saqlash
+                    if sent_message.document:
+                        cached_media = await save_media_cache(
+                            url=url,
+                            platform=platform,
+                            file_id=sent_message.document.file_id,
+                            file_type='document',
+                            file_unique_id=sent_message.document.file_unique_id,
+                            title=media_data.get('title'),
+                            file_size=sent_message.document.file_size,
+                            content_fingerprint=fingerprint,
+                        )
+                
+                # Loading xabarini o'chirish
+                await loading_msg.delete()
+                
+                # Qo'shimcha xabar yuborilmaydi - faqat media
             
-            # Loading xabarini o'chirish
-            await loading_msg.delete()
-            
-            # Qo'shimcha xabar yuborilmaydi - faqat media
-        
-        except TelegramAPIError as e:
-            logger.error(f"Telegram API xatosi: {e}")
-            await loading_msg.edit_text(
-                f"❌ Media yuborishda xatolik: {str(e)}\n\n"
-                "Iltimos, qayta urinib ko'ring."
-            )
-        finally:
-            # Temporary fayllarni o'chirish
-            await cleanup_temp_files(file_path)
-            if media_data.get('thumbnail_path'):
-                await cleanup_temp_files(media_data['thumbnail_path'])
+            except TelegramAPIError as e:
+                logger.error(f"Telegram API xatosi: {e}")
+                if duplicate and isinstance(e, TelegramBadRequest) and is_stale_file_error(e):
+                    # Yozuv belgilanadi va fingerprint'i hisoblangan lokal fayl yuklanadi -
+                    # yangi file_id shu fingerprint bilan saqlanadi (keyingi repostlar uchun)
+                    await invalidate_cached_media(duplicate)
+                    duplicate = None
+                    file = telegram_input_file(file_path, on_progress=loading_msg.report_upload)
+                    continue
+                await loading_msg.edit_text(
+                    f"❌ Media yuborishda xatolik: {str(e)}\n\n"
+                    "Iltimos, qayta urinib ko'ring."
+                )
+            break
     
     except Exception as e:
         logger.error(f"Media yuklab olish va yuborishda xatolik: {e}")
@@ -1432,12 +1705,288 @@ async def download_and_send_media(message: Message, url: str, platform: str, loa
             )
         except:
             pass
+    
+    return cached_media
+
+
+async def _send_direct_media(
+    message: Message,
+    url: str,
+    platform: str,
+    loading_msg: Union[StatusMessage, LinkStatus],
+    direct: Dict,
+):
+    """
+    Media'ni to'g'ridan-to'g'ri CDN URL orqali yuborish (Telegram faylni o'zi yuklab oladi)
+    
+    Args:
+        direct: resolve_direct_media natijasi
+    
+    Returns:
+        (yuborildimi, cache'ga saqlangan MediaLink yoki None). Yuborilmasa oddiy yuklab olish ishlatiladi.
+    """
+    delivered = None
+    try:
+        duration = int(direct['duration']) if direct.get('duration') is not None else None
+        caption = format_media_caption(
+            title=direct['title'],
+            platform=platform,
+            duration=duration,
+            file_size=direct.get('file_size'),
+        )
+        keyboard = await get_bot_link_keyboard(message.bot)
+        
+        await loading_msg.edit_text("⏳ Media yuborilmoqda...")
+        try:
+            sent_message = await message.answer_video(
+                video=direct['url'],
+                caption=caption,
+                duration=duration,
+                reply_markup=keyboard,
+            )
+        except (TelegramBadRequest, TelegramNetworkError, asyncio.TimeoutError) as e:
+            # URL'ni Telegram yuklay olmadi (CDN rad etdi, hajm limiti, tarmoq yoki timeout) - lokal yuklab olishga o'tish.
+            # RetryAfter, Forbidden va boshqalar - URL bilan bog'liq emas, yuklab olish ham yordam bermaydi
+            delivered = False
+            logger.info(f"Direct URL rad etildi, lokal yuklab olinadi: {url} ({e})")
+            return False, None
+        delivered = True
+        logger.info(f"Direct URL orqali yuborildi: {url}")
+        
+        cached_media = None
+        if sent_message.video:
+            cached_media = await save_media_cache(
+                url=url,
+                platform=platform,
+                file_id=sent_message.video.file_id,
+                file_type='video',
+                file_unique_id=sent_message.video.file_unique_id,
+                title=direct['title'],
+                thumbnail_file_id=sent_message.video.thumbnail.file_id if sent_message.video.thumbnail else None,
+                file_size=sent_message.video.file_size,
+                duration=sent_message.video.duration,
+            )
+        return True, cached_media
+    finally:
+        record_direct_delivery(platform, delivered)
+
+
+async def _send_audio_file(
+    message: Message,
+    url: str,
+    platform: str,
+    loading_msg: Union[StatusMessage, LinkStatus],
+    audio_path: str,
+    title: Optional[str],
+    duration: Optional[int],
+    keyboard,
+) -> Message:
+    """
+    Video'dan keyin alohida audio faylni yuborish (video_audio) va uni audio varianti sifatida cache'ga saqlash
+    
+    Returns:
+        Yuborilgan audio xabar
+    """
+    await loading_msg.edit_text("⏳ Audio yuborilmoqda...")
+    
+    audio_file = telegram_input_file(audio_path, on_progress=loading_msg.report_upload)
+    audio_caption = format_media_caption(
+        title=title,
+        platform=platform,
+        duration=duration,
+        file_size=Path(audio_path).stat().st_size if Path(audio_path).exists() else None
+    )
+    
+    # Audio yuborish
+    audio_message = await message.answer_audio(
+        audio=audio_file,
+        caption=audio_caption,
+        duration=duration,
+        reply_markup=keyboard,
+    )
+    logger.info(f"Audio yuborildi: {title}")
+    
+    # Audio varianti ham cache'ga - keyingi so'rovlar (audio_only ham) yuklab olishsiz
+    if audio_message.audio:
+        await save_media_cache(
+            url=url,
+            platform=platform,
+            file_id=audio_message.audio.file_id,
+            file_type='audio',
+            file_unique_id=audio_message.audio.file_unique_id,
+            title=title,
+            file_size=audio_message.audio.file_size,
+            duration=audio_message.audio.duration,
+            variant=AUDIO_VARIANT,
+        )
+    return audio_message
+
+
+async def _send_direct_audio(
+    message: Message,
+    url: str,
+    platform: str,
+    loading_msg: Union[StatusMessage, LinkStatus],
+    direct: Dict,
+):
+    """
+    Video direct URL orqali yuborilgandan keyin audio'ni yuborish (video_audio sozlamasi) -
+    cache'dagi audio varianti bo'lsa file_id bilan, bo'lmasa faqat audio yuklab olinadi.
+    Xatolik faqat log qilinadi - video allaqachon yuborilgan.
+    """
+    cached_audio = await get_cached_media(url, AUDIO_VARIANT)
+    if cached_audio:
+        try:
+            await send_cached_media(message, cached_audio)
+            return
+        except Exception as e:
+            logger.error(f"Cache'dagi audio'ni yuborishda xatolik: {e}")
+    
+    audio_data = None
+    try:
+        audio_data = await _download_for_delivery(message, url, platform, loading_msg, 'audio_only')
+        if _is_download_error(audio_data):
+            logger.warning(f"Direct video uchun audio yuklab olinmadi: {url}")
+            return
+        
+        # Faqat audio formati bo'lmasa - videodan ajratilgan audio (video ikkinchi marta yuborilmaydi)
+        audio_path = audio_data.get('audio_path')
+        if not audio_path and Path(audio_data['file_path']).suffix.lower() in ('.mp3', '.m4a', '.ogg', '.wav', '.aac'):
+            audio_path = audio_data['file_path']
+        if not audio_path:
+            logger.warning(f"Direct video uchun audio fayl topilmadi: {url}")
+            return
+        
+        duration = int(direct['duration']) if direct.get('duration') is not None else None
+        keyboard = await get_bot_link_keyboard(message.bot)
+        await _send_audio_file(message, url, platform, loading_msg, audio_path, direct['title'], duration, keyboard)
+    except Exception as e:
+        logger.error(f"Audio yuborishda xatolik: {e}")
+    finally:
+        if isinstance(audio_data, dict) and audio_data.get('file_path'):
+            await cleanup_temp_files(audio_data['file_path'])
+
+
+# Telegram bitta media group'da ko'pi bilan 10 ta element qabul qiladi
+MEDIA_GROUP_LIMIT = 10
+
+
+async def send_media_group_chunks(message: Message, media: list[tuple[str, object]], caption: str = None) -> list[Message]:
+    """
+    Media'larni 10 tadan guruhlab yuborish (caption - birinchi elementda)
+
+    Args:
+        message: Javob beriladigan xabar
+        media: [(turi 'photo'/'video', file_id yoki InputFile), ...]
+        caption: Albom izohi
+
+    Returns:
+        Yuborilgan xabarlar (media tartibida)
+    """
+    sent = []
+    for start in range(0, len(media), MEDIA_GROUP_LIMIT):
+        chunk = media[start:start + MEDIA_GROUP_LIMIT]
+        chunk_caption = caption if start == 0 else None
+        if len(chunk) == 1:
+            # Guruhda kamida 2 ta element bo'lishi kerak - qolgan bittasi alohida
+            media_type, item = chunk[0]
+            if media_type == 'photo':
+                sent.append(await message.answer_photo(photo=item, caption=chunk_caption))
+            else:
+                sent.append(await message.answer_video(video=item, caption=chunk_caption))
+            continue
+        group = [
+            InputMediaPhoto(media=item, caption=chunk_caption if i == 0 else None)
+            if media_type == 'photo'
+            else InputMediaVideo(media=item, caption=chunk_caption if i == 0 else None)
+            for i, (media_type, item) in enumerate(chunk)
+        ]
+        sent.extend(await message.answer_media_group(media=group))
+    return sent
+
+
+async def _send_album(message: Message, url: str, platform: str, media_data: Dict, loading_msg: Union[StatusMessage, LinkStatus]):
+    """
+    Yuklab olingan albomni yuborish va cache'ga saqlash
+
+    Returns:
+        Cache'ga saqlangan albom MediaLink yoki None
+    """
+    items = media_data['album']
+    await loading_msg.edit_text(f"⏳ Albom yuborilmoqda ({len(items)} ta)...")
+    
+    caption = format_media_caption(title=media_data.get('title'), platform=platform)
+    sent = await send_media_group_chunks(
+        message,
+        [(item['type'], telegram_input_file(item['file_path'])) for item in items],
+        caption,
+    )
+    
+    cache_items = []
+    for sent_message in sent:
+        if sent_message.photo:
+            media, file_type = sent_message.photo[-1], 'photo'
+        elif sent_message.video:
+            media, file_type = sent_message.video, 'video'
+        else:
+            continue
+        cache_items.append({
+            'file_id': media.file_id,
+            'file_type': file_type,
+            'file_unique_id': media.file_unique_id,
+            'file_size': media.file_size,
+            'duration': getattr(media, 'duration', None),
+        })
+    
+    cached_media = await save_album_cache(
+        url=url,
+        platform=platform,
+        items=cache_items,
+        title=media_data.get('title'),
+    )
+    logger.info(f"Albom yuborildi: {url} ({len(cache_items)} ta element)")
+    await loading_msg.delete()
+    return cached_media
+
+
+async def send_cached_variants(message: Message, items: list):
+    """
+    Cache'dagi variantlarni ketma-ket yuborish (masalan video, keyin audio)
+
+    Asosiy (birinchi) element yuborilmasa xatolik ko'tariladi - chaqiruvchi qayta yuklab oladi.
+    Qo'shimcha variant yuborilmasa faqat log yoziladi (asosiy media allaqachon yuborilgan).
+    """
+    primary, *extras = items
+    await send_cached_media(message, primary)
+    for extra in extras:
+        try:
+            await send_cached_media(message, extra)
+        except Exception as e:
+            logger.warning(f"Cache'dagi qo'shimcha variant ({extra.file_type}) yuborilmadi: {e}")
+
+
+# file_id endi ishlamasligini bildiradigan TelegramBadRequest xabarlari
+STALE_FILE_ID_MARKERS = (
+    'wrong file identifier',
+    'wrong remote file identifier',
+    'wrong file_id or the file is temporarily unavailable',
+    'file reference expired',
+    'file_reference_expired',
+    "can't use file of type",
+)
+
+
+def is_stale_file_error(error: TelegramBadRequest) -> bool:
+    """Xatolik file_id eskirganini (yoki boshqa turdagi faylga tegishliligini) bildiradimi"""
+    text = str(error).lower()
+    return any(marker in text for marker in STALE_FILE_ID_MARKERS)
 
 
 async def send_cached_media(message: Message, cached_media):
     """
     Cache'dan media'ni yuborish (file_id orqali)
     """
+    await wait_delivery_turn()
     try:
         # Caption va keyboard yaratish
         caption = format_media_caption(
@@ -1448,7 +1997,16 @@ async def send_cached_media(message: Message, cached_media):
         )
         keyboard = await get_bot_link_keyboard(message.bot)
         
-        if cached_media.file_type == 'video':
+        if cached_media.file_type == 'album':
+            # Albom - elementlar file_id'lari bilan, 10 tadan guruhlab
+            items = await get_album_items(cached_media)
+            if not items:
+                raise ValueError("Albom elementlari cache'da topilmadi")
+            await send_media_group_chunks(
+                message, [(item.file_type, item.file_id) for item in items], caption
+            )
+            logger.info(f"Cache'dan albom yuborildi: {cached_media.url} ({len(items)} ta element)")
+        elif cached_media.file_type == 'video':
             # Video file_id bilan yuborish
             # Eslatma: thumbnail file_id bilan yuborib bo'lmaydi, faqat InputFile bilan
             # Shuning uchun thumbnail o'tkazilmaydi, lekin video o'zi yuboriladi
@@ -1477,6 +2035,9 @@ async def send_cached_media(message: Message, cached_media):
                 reply_markup=keyboard,
             )
     except TelegramBadRequest as e:
-        # Agar file_id eskirgan bo'lsa, cache'dan o'chirish va qayta yuklab olish kerak
+        # file_id eskirgan - yozuv yaroqsiz deb belgilanadi (keyingi so'rovlar ham qayta urinmaydi),
+        # chaqiruvchi qayta yuklab oladi va yangi file_id shu yozuvga yoziladi
         logger.warning(f"File ID eskirgan: {cached_media.file_id}, xatolik: {e}")
+        if is_stale_file_error(e):
+            await invalidate_cached_media(cached_media)
         raise
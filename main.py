@@ -45,6 +45,12 @@ from handlers.group import group_router
 from handlers.media import media_router
 from middlewares import LoggingMiddleware, ErrorMiddleware
 from utils.broadcast_manager import broadcast_manager
+from utils.download_workers import download_workers
+from utils.ydl_pool import ydl_pool
+from utils.http_client import http_client
+from utils.telegram_api import create_bot_session
+from utils.workspace import workspace_manager
+from utils.media_cache import backfill_media_keys
 
 
 async def shutdown_handler(bot: Bot):
@@ -73,6 +79,21 @@ async def shutdown_handler(bot: Bot):
         # Kichik kutish - broadcast to'xtash uchun
         await asyncio.sleep(1)
     
+    # yt-dlp worker jarayonlarini to'xtatish
+    try:
+        await download_workers.shutdown()
+    except Exception as e:
+        logger.error(f"Worker'larni to'xtatishda xatolik: {e}")
+    
+    # Warm YoutubeDL instance'larini yopish (cookie'lar saqlanadi, ulanishlar yopiladi)
+    ydl_pool.clear()
+    
+    # Janitor'ni to'xtatish
+    await workspace_manager.stop_janitor()
+    
+    # Umumiy HTTP ulanishlar pool'ini yopish
+    await http_client.close()
+    
     # Bot session va database yopish
     try:
         # Bot session yopish (aiohttp session va connector'ni yopadi)
@@ -90,6 +111,7 @@ async def main():
     # Bot va Dispatcher yaratish
     bot = Bot(
         token=config.bot.token,
+        session=create_bot_session(),
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
     
@@ -119,6 +141,9 @@ async def main():
         logger.info("Database muvaffaqiyatli yaratildi")
     except Exception as e:
         logger.error(f"Database yaratishda xatolik: {e}")
+    
+    # Eski media_links yozuvlariga kanonik kalit qo'shish (fonda, partiyalab)
+    backfill_task = asyncio.create_task(backfill_media_keys())
 
     # YouTube cookie tekshiruvi (ishga tushganda bir marta)
     yt_cookies_path = _resolve_youtube_cookies_path()
@@ -131,6 +156,13 @@ async def main():
     else:
         logger.warning("YouTube cookies fayli topilmadi (YouTube yuklab olishda 'Sign in' xatosi bo'lishi mumkin).")
     
+    # yt-dlp worker jarayonlarini oldindan ishga tushirish (warm)
+    if download_workers.enabled:
+        await download_workers.start()
+    
+    # Tashlab ketilgan ishchi papkalarni tozalovchi janitor (birinchi tekshiruv darhol)
+    workspace_manager.start_janitor()
+    
     # Graceful shutdown uchun - polling to'xtatilganda shutdown_handler chaqiriladi
     # Aiogram o'zi signal handler'larni boshqaradi
     
@@ -162,6 +194,8 @@ async def main():
         # Har doim session yopish - webhook va polling rejimlarida ham
         # Webhook rejimida ham bot session yopilishi kerak, chunki webhook server alohida ishlayotgan bo'lsa,
         # u o'z bot instance'ini yaratadi
+        if not backfill_task.done():
+            backfill_task.cancel()
         await shutdown_handler(bot)
 
 
@@ -3,7 +3,7 @@ Database modellari
 Misol sifatida User modeli
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, BigInteger, TIMESTAMP
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, BigInteger, TIMESTAMP, ForeignKey
 from sqlalchemy.sql import func
 from database import Base
 
@@ -61,10 +61,15 @@ class MediaLink(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     url = Column(String, unique=True, index=True, nullable=False)  # Original URL
+    media_key = Column(BigInteger, nullable=True, index=True)  # Kanonik kalit (platform:media_id:variant) hash'i - indexed
+    variant = Column(String, nullable=False, default='default', server_default='default')  # Yuborilgan variant (default - video/rasm/albom, audio)
+    parent_id = Column(Integer, ForeignKey("media_links.id", ondelete="CASCADE"), nullable=True, index=True)  # Albom elementi bo'lsa - albom yozuvi
+    position = Column(Integer, nullable=True)  # Albomdagi tartib raqami
     platform = Column(String, nullable=False, index=True)  # youtube, instagram, tiktok, etc. - indexed for faster queries
     file_id = Column(String, nullable=False)  # Telegram file_id
-    file_type = Column(String, nullable=False, index=True)  # video, photo, audio, document - indexed
+    file_type = Column(String, nullable=False, index=True)  # video, photo, audio, document, album - indexed
     file_unique_id = Column(String, nullable=True, index=True)  # Telegram file_unique_id - indexed
+    content_fingerprint = Column(String, nullable=True, index=True)  # Fayl tarkibi: hajm + boshi va oxiri hash'i (takroriy upload'ni aniqlash)
     title = Column(String, nullable=True)  # Media title/description
     thumbnail_file_id = Column(String, nullable=True)  # Thumbnail file_id (video uchun)
     file_size = Column(BigInteger, nullable=True)  # File size in bytes
@@ -72,6 +77,21 @@ class MediaLink(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # indexed for sorting
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     access_count = Column(Integer, default=0, nullable=False, index=True)  # Necha marta ishlatilgan - indexed
+    invalidated_at = Column(DateTime(timezone=True), nullable=True)  # Telegram file_id'ni rad etgan vaqt (yangi upload bilan tozalanadi)
     
     def __repr__(self):
         return f"<MediaLink(url={self.url[:50]}..., platform={self.platform}, file_type={self.file_type})>"
+
+
+class ShortLink(Base):
+    """Qisqa link -> to'liq (canonical) URL mapping cache modeli"""
+    __tablename__ = "short_links"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    short_url = Column(String, unique=True, index=True, nullable=False)  # Normalize qilingan qisqa link
+    resolved_url = Column(String, nullable=False)  # Redirect'dan keyingi URL
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # TTL - shu vaqtdan keyin qayta aniqlanadi
+    
+    def __repr__(self):
+        return f"<ShortLink(short_url={self.short_url}, resolved_url={self.resolved_url[:50]}...)>"
@@ -0,0 +1,115 @@
+"""
+Circuit breaker - holat o'tishlari (closed -> open -> half-open) va registry
+"""
+
+import pytest
+
+from utils import circuit_breaker
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakerRegistry
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', clock)
+    return clock
+
+
+def test_opens_after_threshold(clock):
+    breaker = CircuitBreaker('tiktok:ip_blocked', failure_threshold=3, open_seconds=60, max_open_seconds=600)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker('tiktok:ip_blocked', failure_threshold=2, open_seconds=60, max_open_seconds=600)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CLOSED
+
+
+def test_half_open_allows_single_probe(clock):
+    breaker = CircuitBreaker('youtube:blocked', failure_threshold=1, open_seconds=60, max_open_seconds=600)
+    breaker.record_failure()
+
+    clock.now += 60
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Probe tugaguncha boshqa so'rovlar o'tmaydi
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_doubles_cooldown(clock):
+    breaker = CircuitBreaker('youtube:blocked', failure_threshold=1, open_seconds=60, max_open_seconds=100)
+    breaker.record_failure()
+
+    clock.now += 60
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now += 60
+    assert not breaker.allow()
+    # Ikki barobar (120s), lekin max_open_seconds bilan cheklangan
+    clock.now += 40
+    assert breaker.allow()
+
+
+def test_neutral_result_frees_probe(clock):
+    breaker = CircuitBreaker('youtube:blocked', failure_threshold=1, open_seconds=60, max_open_seconds=600)
+    breaker.record_failure()
+    clock.now += 60
+    assert breaker.allow()
+
+    breaker.record_neutral()
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+def test_registry_tracks_error_types_separately(clock):
+    registry = CircuitBreakerRegistry(failure_threshold=1, open_seconds=60, max_open_seconds=600)
+
+    registry.record('tiktok', {'error_type': 'ip_blocked'})
+
+    assert registry.check('tiktok') == 'ip_blocked'
+    assert registry.state('tiktok') == {'ip_blocked': OPEN, 'rate_limited': CLOSED}
+    assert registry.check('youtube') is None
+
+
+def test_registry_ignores_media_level_errors(clock):
+    registry = CircuitBreakerRegistry(failure_threshold=1, open_seconds=60, max_open_seconds=600)
+
+    registry.record('instagram', {'error_type': 'auth_required'})
+    registry.record('instagram', None)
+
+    assert registry.check('instagram') is None
+
+
+def test_registry_disabled_with_zero_threshold(clock):
+    registry = CircuitBreakerRegistry(failure_threshold=0)
+
+    registry.record('tiktok', {'error_type': 'ip_blocked'})
+
+    assert registry.check('tiktok') is None
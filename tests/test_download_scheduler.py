@@ -0,0 +1,134 @@
+"""
+DownloadScheduler - foydalanuvchilar o'rtasida adolatli navbat, tezkor navbat va platforma limitlari
+"""
+
+import asyncio
+
+from utils.media_downloader import DownloadScheduler
+
+
+async def _settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class _Jobs:
+    """Navbatga qo'yilgan ishlar - qachon boshlangani yoziladi, gate ochilguncha joyni band qiladi"""
+
+    def __init__(self, scheduler: DownloadScheduler):
+        self.scheduler = scheduler
+        self.started = []
+        self._gates = {}
+        self._tasks = {}
+
+    def add(self, name: str, user_id: int, platform: str = 'youtube', lane: str = 'normal'):
+        gate = self._gates[name] = asyncio.Event()
+
+        async def job():
+            async with self.scheduler.slot(platform, user_id=user_id, lane=lane):
+                self.started.append(name)
+                await gate.wait()
+
+        self._tasks[name] = asyncio.create_task(job())
+
+    async def finish(self, name: str):
+        self._gates[name].set()
+        await self._tasks[name]
+        await _settle()
+
+    async def cancel(self, name: str):
+        self._tasks[name].cancel()
+        await _settle()
+
+    async def finish_all(self):
+        for gate in self._gates.values():
+            gate.set()
+        await asyncio.gather(*self._tasks.values())
+
+
+def test_user_without_running_jobs_goes_first():
+    async def scenario():
+        jobs = _Jobs(DownloadScheduler(max_concurrent=2, fast_lane_slots=0))
+        for name, user_id in (('a1', 1), ('x', 2), ('a2', 1), ('b1', 3)):
+            jobs.add(name, user_id)
+        await _settle()
+        first = list(jobs.started)
+        # a2 oldinroq kelgan, lekin 1-foydalanuvchida allaqachon ish bor
+        await jobs.finish('x')
+        second = list(jobs.started)
+        await jobs.finish_all()
+        return first, second, jobs.started
+
+    first, second, everything = asyncio.run(scenario())
+
+    assert first == ['a1', 'x']
+    assert second == ['a1', 'x', 'b1']
+    assert everything == ['a1', 'x', 'b1', 'a2']
+
+
+def test_arrival_order_between_equal_users():
+    async def scenario():
+        jobs = _Jobs(DownloadScheduler(max_concurrent=1, fast_lane_slots=0))
+        for name, user_id in (('x', 1), ('b1', 2), ('c1', 3)):
+            jobs.add(name, user_id)
+        await _settle()
+        await jobs.finish('x')
+        await jobs.finish_all()
+        return jobs.started
+
+    assert asyncio.run(scenario()) == ['x', 'b1', 'c1']
+
+
+def test_fast_lane_skips_full_normal_queue():
+    async def scenario():
+        scheduler = DownloadScheduler(max_concurrent=1, fast_lane_slots=1)
+        jobs = _Jobs(scheduler)
+        jobs.add('long', 1)
+        jobs.add('queued', 2)
+        jobs.add('clip', 3, lane='fast')
+        await _settle()
+        started, waiting = list(jobs.started), scheduler.queue_size()
+        await jobs.finish_all()
+        return started, waiting
+
+    started, waiting = asyncio.run(scenario())
+
+    assert started == ['long', 'clip']
+    assert waiting == 1
+
+
+def test_platform_limit_lets_other_platforms_through():
+    async def scenario():
+        scheduler = DownloadScheduler(max_concurrent=3, fast_lane_slots=0, platform_limits={'youtube': 1})
+        jobs = _Jobs(scheduler)
+        jobs.add('yt1', 1)
+        jobs.add('yt2', 2)
+        jobs.add('tt1', 3, platform='tiktok')
+        await _settle()
+        started, running = list(jobs.started), scheduler.running()
+        await jobs.finish_all()
+        return started, running
+
+    started, running = asyncio.run(scenario())
+
+    assert started == ['yt1', 'tt1']
+    assert running == 2
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def scenario():
+        scheduler = DownloadScheduler(max_concurrent=1, fast_lane_slots=0)
+        jobs = _Jobs(scheduler)
+        jobs.add('x', 1)
+        jobs.add('gone', 2)
+        await _settle()
+        await jobs.cancel('gone')
+        waiting = scheduler.queue_size()
+        await jobs.finish('x')
+        return waiting, scheduler.running(), jobs.started
+
+    waiting, running, started = asyncio.run(scenario())
+
+    assert waiting == 0
+    assert running == 0
+    assert started == ['x']
@@ -0,0 +1,58 @@
+"""
+media_cache - variant yozuvlarini qidirish (kanonik kalit va eski, backfill qilinmagan yozuvlar)
+"""
+
+import asyncio
+
+from models import MediaLink
+from utils.media_cache import _find_media, media_key_hash
+from utils.url_classifier import AUDIO_VARIANT, DEFAULT_VARIANT, canonical_media_key
+
+URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+class _Result:
+    def __init__(self, row):
+        self._row = row
+
+    def scalar_one_or_none(self):
+        return self._row
+
+
+class _LegacySession:
+    """Faqat bitta eski (media_key'siz) video yozuvi bor database"""
+
+    def __init__(self, row: MediaLink):
+        self.row = row
+
+    async def execute(self, statement):
+        params = statement.compile().params
+        # Kanonik kalit bo'yicha qidiruv - hech narsa backfill qilinmagan
+        if 'media_key_1' in params:
+            return _Result(None)
+        return _Result(self.row if self.row.url in params.values() else None)
+
+
+def _legacy_video_row() -> MediaLink:
+    return MediaLink(url=URL, platform='youtube', file_id='video-file-id', file_type='video', media_key=None)
+
+
+def test_audio_lookup_skips_legacy_video_row():
+    row = _legacy_video_row()
+    key_hash = media_key_hash(canonical_media_key(URL, AUDIO_VARIANT))
+
+    media = asyncio.run(_find_media(_LegacySession(row), URL, key_hash, AUDIO_VARIANT))
+
+    assert media is None
+    # Video yozuviga audio kaliti yozilmaydi
+    assert row.media_key is None
+
+
+def test_default_lookup_backfills_legacy_row():
+    row = _legacy_video_row()
+    key_hash = media_key_hash(canonical_media_key(URL, DEFAULT_VARIANT))
+
+    media = asyncio.run(_find_media(_LegacySession(row), URL, key_hash))
+
+    assert media is row
+    assert row.media_key == key_hash
@@ -0,0 +1,99 @@
+"""
+Negative cache - xatolik turiga qarab TTL va variant kalitlari
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils import memory_cache
+from utils.negative_cache import NegativeCache
+from utils.url_classifier import AUDIO_VARIANT
+
+URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+SHORT_URL = "https://youtu.be/dQw4w9WgXcQ"
+
+
+class _Clock(datetime):
+    current = datetime(2026, 1, 1)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    _Clock.current = datetime(2026, 1, 1)
+    monkeypatch.setattr(memory_cache, 'datetime', _Clock)
+    return _Clock
+
+
+def _cache() -> NegativeCache:
+    return NegativeCache({'unavailable': 100, 'too_large': 50, 'rate_limited': 0})
+
+
+def test_entry_expires_after_error_ttl(clock):
+    async def scenario():
+        cache = _cache()
+        await cache.record(URL, {'error_type': 'unavailable', 'error_message': "o'chirilgan"})
+        fresh = await cache.get(SHORT_URL)
+        clock.current += timedelta(seconds=101)
+        return fresh, await cache.get(URL)
+
+    fresh, expired = asyncio.run(scenario())
+
+    assert fresh == {'error_type': 'unavailable', 'error_message': "o'chirilgan", 'negative_cached': True}
+    assert expired is None
+
+
+def test_errors_without_ttl_and_successes_are_not_stored(clock):
+    async def scenario():
+        cache = _cache()
+        await cache.record(URL, {'error_type': 'rate_limited'})
+        await cache.record(URL, {'error_type': 'unknown'})
+        await cache.record(URL, {'file_path': '/tmp/video.mp4', 'error_type': 'unavailable'})
+        await cache.record(URL, None)
+        return await cache.get(URL)
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_media_level_error_applies_to_every_variant(clock):
+    async def scenario():
+        cache = _cache()
+        await cache.record(URL, {'error_type': 'unavailable'}, variant=AUDIO_VARIANT)
+        return await cache.get(URL), await cache.get(URL, AUDIO_VARIANT)
+
+    default, audio = asyncio.run(scenario())
+
+    assert default['error_type'] == 'unavailable'
+    assert audio['error_type'] == 'unavailable'
+
+
+def test_variant_error_applies_only_to_its_variant(clock):
+    async def scenario():
+        cache = _cache()
+        # Video juda katta - audio varianti baribir yuklab olinishi mumkin
+        await cache.record(URL, {'error_type': 'too_large'})
+        await cache.record(SHORT_URL, {'error_type': 'too_large'}, variant=AUDIO_VARIANT)
+        before = await cache.get(URL), await cache.get(URL, AUDIO_VARIANT)
+        await cache.forget(URL)
+        await cache.forget(URL, AUDIO_VARIANT)
+        return before, (await cache.get(URL), await cache.get(URL, AUDIO_VARIANT))
+
+    (default, audio), (default_after, audio_after) = asyncio.run(scenario())
+
+    assert default['error_type'] == 'too_large'
+    assert audio['error_type'] == 'too_large'
+    assert default_after is None and audio_after is None
+
+
+def test_default_variant_error_does_not_block_audio(clock):
+    async def scenario():
+        cache = _cache()
+        await cache.record(URL, {'error_type': 'too_large'})
+        return await cache.get(URL, AUDIO_VARIANT)
+
+    assert asyncio.run(scenario()) is None
@@ -0,0 +1,115 @@
+"""
+SingleFlight - ishlarni birlashtirish va kutuvchilar ulushini hisoblash
+"""
+
+import asyncio
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_waiters_share_leader_result():
+    async def scenario():
+        flight = SingleFlight()
+        gate = asyncio.Event()
+        calls = []
+        retained = []
+
+        async def work():
+            calls.append(1)
+            await gate.wait()
+            return 'result'
+
+        tasks = [
+            asyncio.create_task(flight.do('key', work, on_result=lambda result, waiters: retained.append(waiters)))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        assert flight.in_flight('key')
+        gate.set()
+        results = await asyncio.gather(*tasks)
+        return flight, calls, retained, results
+
+    flight, calls, retained, results = asyncio.run(scenario())
+
+    assert calls == [1]
+    assert retained == [2]
+    assert results == [('result', False), ('result', True), ('result', True)]
+    assert flight.size() == 0
+
+
+def test_waiter_cancelled_before_result_is_not_counted():
+    async def scenario():
+        flight = SingleFlight()
+        gate = asyncio.Event()
+        retained = []
+
+        async def work():
+            await gate.wait()
+            return 'result'
+
+        leader = asyncio.create_task(flight.do('key', work, on_result=lambda result, waiters: retained.append(waiters)))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do('key', work))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        await leader
+        return waiter, retained
+
+    waiter, retained = asyncio.run(scenario())
+
+    assert waiter.cancelled()
+    assert retained == [0]
+
+
+def test_waiter_cancelled_after_result_releases_its_share():
+    async def scenario():
+        flight = SingleFlight()
+        gate = asyncio.Event()
+        refs = {'retained': 0, 'released': 0}
+        waiter = None
+
+        async def work():
+            await gate.wait()
+            return 'result'
+
+        def on_result(result, waiters):
+            refs['retained'] += waiters
+            # Natija hisobga olindi, lekin kutuvchi uni olishidan oldin bekor qilinadi
+            waiter.cancel()
+
+        async def on_abandon(result):
+            refs['released'] += 1
+
+        leader = asyncio.create_task(flight.do('key', work, on_result=on_result))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do('key', work, on_abandon=on_abandon))
+        await asyncio.sleep(0)
+        gate.set()
+        await leader
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return refs
+
+    refs = asyncio.run(scenario())
+
+    assert refs == {'retained': 1, 'released': 1}
+
+
+def test_none_result_skips_hooks():
+    async def scenario():
+        flight = SingleFlight()
+        retained = []
+
+        async def work():
+            return None
+
+        return await flight.do('key', work, on_result=lambda result, waiters: retained.append(waiters)), retained
+
+    result, retained = asyncio.run(scenario())
+
+    assert result == (None, False)
+    assert retained == []
@@ -0,0 +1,69 @@
+"""
+url_classifier - platforma/kontent turini aniqlash va kanonik media kaliti
+"""
+
+import pytest
+
+from utils.url_classifier import (
+    AUDIO_VARIANT, UrlInfo, canonical_media_key, classify_url, is_short_link, normalize_url, strip_tracking_params,
+)
+
+
+@pytest.mark.parametrize('url, expected', [
+    ("https://www.youtube.com/watch?v=dQw4w9WgXcQ", UrlInfo('youtube', 'video', 'dQw4w9WgXcQ')),
+    ("https://m.youtube.com/watch?feature=share&v=dQw4w9WgXcQ", UrlInfo('youtube', 'video', 'dQw4w9WgXcQ')),
+    ("https://music.youtube.com/watch?v=dQw4w9WgXcQ", UrlInfo('youtube', 'video', 'dQw4w9WgXcQ')),
+    ("youtu.be/dQw4w9WgXcQ?si=abc", UrlInfo('youtube', 'video', 'dQw4w9WgXcQ')),
+    ("https://youtube.com/shorts/dQw4w9WgXcQ", UrlInfo('youtube', 'short', 'dQw4w9WgXcQ')),
+    ("https://www.instagram.com/p/Cabc123/", UrlInfo('instagram', 'post', 'Cabc123')),
+    ("https://instagram.com/reels/Cabc123/", UrlInfo('instagram', 'reel', 'Cabc123')),
+    ("https://instagram.com/stories/some.user/3141592653/", UrlInfo('instagram', 'story', '3141592653')),
+    ("https://www.tiktok.com/@user/video/7234567890123456789", UrlInfo('tiktok', 'video', '7234567890123456789')),
+    ("https://vm.tiktok.com/ZMabc123/", UrlInfo('tiktok', 'share', 'ZMabc123')),
+    ("https://x.com/user/status/1234567890", UrlInfo('twitter', 'post', '1234567890')),
+    ("https://web.facebook.com/watch/?v=123456", UrlInfo('facebook', 'video', '123456')),
+    ("https://fb.watch/abcDEF/", UrlInfo('facebook', 'share', 'abcDEF')),
+])
+def test_classify_supported_urls(url, expected):
+    assert classify_url(url) == expected
+
+
+@pytest.mark.parametrize('url', [
+    "https://example.com/watch?v=dQw4w9WgXcQ",
+    "https://www.youtube.com/",
+    "https://notyoutube.com/watch?v=dQw4w9WgXcQ",
+    "not a url",
+])
+def test_classify_unsupported_urls(url):
+    assert classify_url(url) is None
+
+
+def test_youtube_forms_share_canonical_key():
+    keys = {
+        canonical_media_key(url) for url in (
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42",
+            "https://youtu.be/dQw4w9WgXcQ?si=tracking",
+            "https://m.youtube.com/shorts/dQw4w9WgXcQ",
+        )
+    }
+    assert keys == {"youtube:dQw4w9WgXcQ:default"}
+
+
+def test_variant_is_part_of_canonical_key():
+    url = "https://www.tiktok.com/@user/video/7234567890123456789"
+    assert canonical_media_key(url, AUDIO_VARIANT) == "tiktok:7234567890123456789:audio"
+    assert canonical_media_key(url) != canonical_media_key(url, AUDIO_VARIANT)
+
+
+def test_share_links_use_normalized_url():
+    # Qisqa linkda media ID yo'q - kalit normalize qilingan URL'dan (kuzatuv parametrlarisiz)
+    assert canonical_media_key("https://vm.tiktok.com/ZMabc123/?utm_source=x") == "url:vm.tiktok.com/ZMabc123:default"
+    assert is_short_link("https://vm.tiktok.com/ZMabc123/")
+    assert not is_short_link("https://www.tiktok.com/@user/video/7234567890123456789")
+
+
+def test_tracking_params_are_removed():
+    assert normalize_url("https://www.Example.com/a/?b=2&utm_medium=x&a=1&igshid=y") == "example.com/a?a=1&b=2"
+    assert strip_tracking_params("https://www.tiktok.com/@u/video/1?is_from_webapp=1&lang=en#top") == (
+        "https://www.tiktok.com/@u/video/1?lang=en"
+    )
@@ -0,0 +1,73 @@
+"""
+WorkspaceManager - janitor (sweep) va yuklab olish paytidagi hajm limiti
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from utils.workspace import WorkspaceManager, WorkspaceQuotaError
+
+
+def _folder(root, pid: int, age: float = 0.0):
+    path = root / f"job-{pid}-abc123"
+    path.mkdir(parents=True)
+    if age:
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+    return path
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_sweep_keeps_old_folder_of_live_process(tmp_path):
+    manager = WorkspaceManager(root=tmp_path, max_age=60)
+    folder = _folder(tmp_path, os.getppid(), age=3600)
+
+    assert manager.sweep() == 0
+    assert folder.exists()
+
+
+def test_sweep_removes_folder_of_dead_process(tmp_path):
+    manager = WorkspaceManager(root=tmp_path, max_age=60)
+    folder = _folder(tmp_path, _dead_pid())
+
+    assert manager.sweep() == 1
+    assert not folder.exists()
+
+
+def test_sweep_removes_only_old_inactive_own_folders(tmp_path):
+    manager = WorkspaceManager(root=tmp_path, max_age=60)
+    fresh = _folder(tmp_path, os.getpid())
+    old = tmp_path / f"job-{os.getpid()}-def456"
+    old.mkdir()
+    stamp = time.time() - 3600
+    os.utime(old, (stamp, stamp))
+    active = manager.create()
+    os.utime(active.path, (stamp, stamp))
+
+    assert manager.sweep() == 1
+    assert not old.exists()
+    assert fresh.exists()
+    assert active.path.exists()
+
+
+def test_quota_hook_checks_second_merge_file(tmp_path):
+    manager = WorkspaceManager(root=tmp_path, quota_bytes=1000)
+    workspace = manager.create()
+    video = workspace.path / "media.f137.mp4.part"
+    audio = workspace.path / "media.f140.m4a.part"
+    video.write_bytes(b"0" * 900)
+    manager.ydl_quota_hook({'status': 'downloading', 'tmpfilename': str(video), 'downloaded_bytes': 900})
+
+    # Ikkinchi format (audio) - downloaded_bytes 0 dan boshlanadi, papka esa limitdan oshdi
+    audio.write_bytes(b"0" * 300)
+    with pytest.raises(WorkspaceQuotaError):
+        manager.ydl_quota_hook({'status': 'downloading', 'tmpfilename': str(audio), 'downloaded_bytes': 300})
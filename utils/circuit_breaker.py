@@ -0,0 +1,169 @@
+"""
+Circuit breaker - platforma bloklagan holatlarda (IP blok, anti-bot/login talabi, rate limit) so'rovlarni darhol rad etish
+Platforma va xatolik turi bo'yicha alohida; tiklanish half-open probe so'rovlari orqali aniqlanadi
+"""
+
+import logging
+import time
+from typing import Dict, Optional, Tuple
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Platformaning o'zi bloklaganini bildiradigan xatolik turlari. Bitta media muammolari (yopiq post,
+# o'chirilgan video - auth_required, unavailable) bu yerga kirmaydi - ular negative cache'da URL bo'yicha
+BLOCKING_ERRORS: Dict[str, frozenset] = {
+    'tiktok': frozenset({'ip_blocked', 'rate_limited'}),
+    'youtube': frozenset({'blocked', 'rate_limited'}),
+    'instagram': frozenset({'blocked', 'rate_limited'}),
+}
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Bitta (platforma, xatolik turi) uchun circuit breaker"""
+
+    def __init__(self, name: str, failure_threshold: int, open_seconds: float, max_open_seconds: float):
+        """
+        Args:
+            name: Log uchun nom (platforma:xatolik turi)
+            failure_threshold: Ketma-ket shuncha xatolikdan keyin ochiladi
+            open_seconds: Ochiq holat davomiyligi (birinchi marta)
+            max_open_seconds: Probe muvaffaqiyatsiz bo'lganda davomiylik ikki barobar oshadi, shu limitgacha
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self._cooldown = open_seconds
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """
+        So'rovga ruxsat berish
+
+        Ochiq holatda cooldown tugagach bitta so'rov probe sifatida o'tkaziladi (half-open).
+        """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self._cooldown:
+            self.state = HALF_OPEN
+            logger.info(f"Circuit breaker half-open: {self.name} - probe so'rov yuborilmoqda")
+        if self.state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_failure(self) -> None:
+        """Bloklash xatoligi"""
+        self._probe_in_flight = False
+        if self.state == HALF_OPEN:
+            # Probe muvaffaqiyatsiz - qayta ochish, kutish vaqti oshadi
+            self._cooldown = min(self._cooldown * 2, self.max_open_seconds)
+            self._open()
+            return
+        self.failures += 1
+        if self.state == CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def record_success(self) -> None:
+        """Muvaffaqiyatli yuklab olish"""
+        if self.state != CLOSED:
+            logger.info(f"Circuit breaker yopildi: {self.name} - platforma tiklandi")
+        self.state = CLOSED
+        self.failures = 0
+        self._cooldown = self.open_seconds
+        self._probe_in_flight = False
+
+    def record_neutral(self) -> None:
+        """Boshqa sababli tugagan so'rov (probe joyi bo'shatiladi, holat o'zgarmaydi)"""
+        self._probe_in_flight = False
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        logger.warning(f"Circuit breaker ochildi: {self.name} ({self._cooldown:.0f}s)")
+
+
+class CircuitBreakerRegistry:
+    """Platforma va xatolik turi bo'yicha circuit breaker'lar"""
+
+    def __init__(self, failure_threshold: int = 3, open_seconds: float = 300.0, max_open_seconds: float = 1800.0):
+        """
+        Args:
+            failure_threshold: Ketma-ket xatoliklar soni (ochilish uchun)
+            open_seconds: Ochiq holat davomiyligi (sekund)
+            max_open_seconds: Maksimal ochiq holat davomiyligi (sekund)
+        """
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {
+            (platform, error_type): CircuitBreaker(
+                f"{platform}:{error_type}", failure_threshold, open_seconds, max_open_seconds
+            )
+            for platform, error_types in BLOCKING_ERRORS.items()
+            for error_type in error_types
+        }
+        self.enabled = failure_threshold > 0
+
+    def _for_platform(self, platform: str) -> list[Tuple[str, CircuitBreaker]]:
+        return [
+            (error_type, breaker)
+            for (name, error_type), breaker in self._breakers.items()
+            if name == platform
+        ]
+
+    def check(self, platform: str) -> Optional[str]:
+        """
+        So'rovni tekshirish
+
+        Returns:
+            Ochiq breaker'ning xatolik turi (so'rov darhol rad etiladi) yoki None
+        """
+        if not self.enabled:
+            return None
+        allowed = []
+        for error_type, breaker in self._for_platform(platform):
+            if not breaker.allow():
+                # So'rov o'tmaydi - boshqa breaker'lardan olingan probe joylarini qaytarish
+                for other in allowed:
+                    other.record_neutral()
+                return error_type
+            allowed.append(breaker)
+        return None
+
+    def record(self, platform: str, result: Optional[Dict]) -> None:
+        """
+        Yuklab olish natijasini qayd etish
+
+        Args:
+            platform: Platform nomi
+            result: download_media natijasi (None - xatolik yoki bekor qilingan)
+        """
+        if not self.enabled:
+            return
+        error_type = result.get('error_type') if isinstance(result, dict) else None
+        succeeded = isinstance(result, dict) and bool(result.get('file_path'))
+        for breaker_error, breaker in self._for_platform(platform):
+            if succeeded:
+                breaker.record_success()
+            elif error_type == breaker_error:
+                breaker.record_failure()
+            else:
+                breaker.record_neutral()
+
+    def state(self, platform: str) -> Dict[str, str]:
+        """Platforma breaker'lari holati (monitoring uchun)"""
+        return {error_type: breaker.state for error_type, breaker in self._for_platform(platform)}
+
+
+# Global circuit breaker registry
+circuit_breakers = CircuitBreakerRegistry(
+    failure_threshold=config.bot.circuit_failure_threshold,
+    open_seconds=config.bot.circuit_open_seconds,
+    max_open_seconds=config.bot.circuit_max_open_seconds,
+)
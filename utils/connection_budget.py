@@ -0,0 +1,56 @@
+"""
+Yuklab olish ulanishlari budjeti - bitta ish uchun parallel ulanishlar (HLS/DASH fragmentlari,
+progressive fayl qismlari) va barcha ishlar uchun umumiy limit
+"""
+
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionBudget:
+    """
+    Parallel ulanishlar budjeti
+
+    Ish kutmaydi: bo'sh ulanishlar qancha bo'lsa shuncha oladi (per_job gacha), lekin kamida bitta -
+    ishlar soni download_scheduler tomonidan cheklanadi, bu yerda faqat parallellik darajasi taqsimlanadi.
+    """
+
+    def __init__(self, total: int = 16, per_job: int = 4):
+        """
+        Args:
+            total: Barcha ishlar uchun maksimal ulanishlar soni
+            per_job: Bitta ish uchun maksimal ulanishlar soni (1 - parallel yuklab olish o'chirilgan)
+        """
+        self.total = max(1, total)
+        self.per_job = max(1, per_job)
+        self.in_use = 0
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[int]:
+        """
+        Ish uchun ulanishlar ajratish
+
+        Yields:
+            Ishga ajratilgan ulanishlar soni (1..per_job)
+        """
+        granted = max(1, min(self.per_job, self.total - self.in_use))
+        self.in_use += granted
+        try:
+            yield granted
+        finally:
+            self.in_use -= granted
+
+    def stats(self) -> dict:
+        """Budjet holati (monitoring uchun)"""
+        return {'total': self.total, 'per_job': self.per_job, 'in_use': self.in_use}
+
+
+# Global ulanishlar budjeti
+connection_budget = ConnectionBudget(
+    total=config.bot.download_connections_total,
+    per_job=config.bot.download_connections_per_job,
+)
@@ -0,0 +1,157 @@
+"""
+Cookie store - Netscape cookie fayllarini bir marta o'qish va keshlash
+Fayl o'zgarganda (mtime/hajm) avtomatik qayta o'qiladi
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ParsedCookies:
+    """Bitta cookie fayl versiyasining o'qilgan holati"""
+
+    def __init__(self, entries: list[Tuple[str, str, str]]):
+        """
+        Args:
+            entries: (domain, name, value) ro'yxati
+        """
+        self.entries = entries
+        # Domen bo'yicha tayyor Cookie header'lar va cookie sonlari (birinchi so'rovda hisoblanadi)
+        self._headers: Dict[str, str] = {}
+        self._counts: Dict[str, int] = {}
+
+    def _matching(self, domain: str) -> list[Tuple[str, str, str]]:
+        return [entry for entry in self.entries if domain in entry[0]]
+
+    def header(self, domain: str) -> str:
+        """Domen uchun Cookie header (name=value; ...)"""
+        if domain not in self._headers:
+            self._headers[domain] = "; ".join(
+                f"{name}={value}" for _, name, value in self._matching(domain) if name and value
+            )
+        return self._headers[domain]
+
+    def count(self, domain: str) -> int:
+        """Domen uchun cookie'lar soni"""
+        if domain not in self._counts:
+            self._counts[domain] = len(self._matching(domain))
+        return self._counts[domain]
+
+
+def _parse_netscape(text: str) -> list[Tuple[str, str, str]]:
+    """Netscape formatidagi cookie matnini (domain, name, value) ro'yxatiga aylantirish"""
+    entries = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.split("\t")
+        if len(parts) < 7:
+            continue
+        domain, _, _, _, _, name, value = parts[:7]
+        entries.append((domain.strip().lower(), name, value))
+    return entries
+
+
+class CookieStore:
+    """
+    Cookie fayllar keshi
+
+    - Har bir fayl (yo'l + mtime + hajm) bir marta o'qiladi
+    - Domen bo'yicha Cookie header'lar bir marta hisoblanadi
+    - yt-dlp uchun har bir fayl versiyasiga bitta yoziladigan nusxa
+    """
+
+    def __init__(self, copy_dir: Optional[Path] = None):
+        """
+        Args:
+            copy_dir: yt-dlp uchun nusxalar papkasi (default: temp ichida)
+        """
+        self.copy_dir = copy_dir or Path(tempfile.gettempdir()) / "vkm_bot_cookies"
+        self._cache: Dict[str, Tuple[Tuple[int, int], ParsedCookies]] = {}
+        self._copies: Dict[str, Tuple[Tuple[int, int], Path]] = {}
+        self._lock = threading.Lock()
+        # yt-dlp nusxani o'qishi (cookiejar yuklash) va yozishi (close) shu lock ostida bajariladi
+        self.file_lock = threading.Lock()
+
+    @staticmethod
+    def _version(path: Path) -> Tuple[int, int]:
+        stat = path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self, path: Path) -> ParsedCookies:
+        """
+        Cookie faylni o'qish (kesh orqali)
+
+        Raises:
+            OSError: Fayl o'qilmasa
+        """
+        key = str(path)
+        version = self._version(path)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[0] == version:
+                return cached[1]
+
+        parsed = ParsedCookies(_parse_netscape(path.read_text(encoding="utf-8", errors="ignore")))
+        with self._lock:
+            self._cache[key] = (version, parsed)
+        logger.debug(f"Cookie fayl o'qildi: {path} ({len(parsed.entries)} ta cookie)")
+        return parsed
+
+    def header(self, path: Optional[Path], domain: str) -> str:
+        """Domen uchun Cookie header (fayl yo'q yoki o'qilmasa bo'sh satr)"""
+        if not path:
+            return ""
+        try:
+            return self.load(path).header(domain)
+        except OSError as e:
+            logger.warning(f"Cookie header yaratishda xatolik: {e}")
+            return ""
+
+    def prepared_copy(self, path: Optional[Path], tag: str) -> Optional[Path]:
+        """
+        yt-dlp uchun yoziladigan nusxa (read-only cookiefile muammosini oldini olish).
+        Har bir fayl versiyasi uchun bitta nusxa - yo'l barqaror, barcha yt-dlp ishlari uni bo'lishadi.
+        """
+        if not path:
+            return None
+        key = str(path)
+        try:
+            version = self._version(path)
+            with self._lock:
+                cached = self._copies.get(key)
+                if cached and cached[0] == version and cached[1].exists():
+                    return cached[1]
+
+            path_hash = hashlib.sha1(key.encode("utf-8")).hexdigest()[:10]
+            dest = self.copy_dir / f"{tag}_{path_hash}_{version[0]}_cookies.txt"
+            if not dest.exists():
+                self.copy_dir.mkdir(parents=True, exist_ok=True)
+                # Atomik yozish - boshqa thread yarim faylni o'qimasligi uchun
+                # Binary rejimda nusxalanadi — tab va line-ending o'zgarishining oldini olish uchun
+                tmp = dest.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp.write_bytes(path.read_bytes())
+                os.replace(tmp, dest)
+
+            with self._lock:
+                old = self._copies.get(key)
+                self._copies[key] = (version, dest)
+            if old and old[1] != dest:
+                # Eski versiya nusxasini o'chirish
+                old[1].unlink(missing_ok=True)
+            return dest
+        except OSError as e:
+            logger.warning(f"Cookie faylni nusxalashda xatolik ({tag}): {e}")
+            return None
+
+
+# Global cookie store instance
+cookie_store = CookieStore()
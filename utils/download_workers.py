@@ -0,0 +1,316 @@
+"""
+yt-dlp worker jarayonlari - yuklab olishni alohida jarayonlarda bajarish
+Event loop GIL uchun yt-dlp bilan raqobatlashmaydi, xotira va CPU har bir ish uchun cheklanadi
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Callable, Optional, Dict
+from config import config
+from utils.workspace import workspace_manager
+
+logger = logging.getLogger(__name__)
+
+# IPC protokoli (Pipe orqali tuple'lar):
+#   parent -> worker: ('job', job_id, url, platform, connections, media_preference) yoki None (to'xtash)
+#   worker -> parent: ('progress', job_id, compact progress dict) - ish davomida, 0 yoki ko'p marta
+#                     ('result', job_id, dict | None) yoki ('error', job_id, xatolik matni) - oxirida
+
+# Worker'dan progress xabarlari orasidagi minimal vaqt (sekund)
+_PROGRESS_INTERVAL = 1.0
+
+# Worker ichida Pipe'ga yozish - progress bir nechta yt-dlp thread'idan (fragmentlar) keladi,
+# Connection.send thread-safe emas: parallel yozuvlar xabarlarni aralashtirib yuboradi
+_send_lock = threading.Lock()
+
+
+def _send(conn: Connection, message: tuple) -> None:
+    """Worker'dan parent'ga xabar yuborish (thread-safe)"""
+    with _send_lock:
+        conn.send(message)
+
+
+def _apply_job_rlimits(memory_mb: int, cpu_seconds: int) -> None:
+    """Joriy ish uchun xotira va CPU limitlarini o'rnatish (faqat soft limit)"""
+    try:
+        import resource
+    except ImportError:
+        # Windows - resource moduli yo'q
+        return
+
+    if memory_mb > 0:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        soft = memory_mb * 1024 * 1024
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+    if cpu_seconds > 0:
+        # RLIMIT_CPU jarayonning umumiy CPU vaqtini hisoblaydi - shu paytgacha sarflangan vaqtni qo'shamiz
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = int(usage.ru_utime + usage.ru_stime) + 1
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = used + cpu_seconds
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+async def _run_job(
+    url: str, platform: str, connections: int, media_preference: str, conn: Connection, job_id: int
+) -> Optional[Dict]:
+    """Bitta ishni bajarish - har bir ish o'z event loop'ida, shu sababli HTTP session ham yopiladi"""
+    from utils import media_downloader
+    from utils.http_client import http_client
+    from utils.progress import compact_ydl_progress
+    from utils.workspace import workspace_manager
+
+    last_sent = 0.0
+
+    def _forward_progress(status: Dict) -> None:
+        # yt-dlp thread'idan chaqiriladi - parent'ga siyrak (throttled) yuboriladi
+        nonlocal last_sent
+        if status.get('status') != 'downloading':
+            return
+        with _send_lock:
+            now = time.monotonic()
+            if now - last_sent < _PROGRESS_INTERVAL:
+                return
+            last_sent = now
+            conn.send(('progress', job_id, compact_ydl_progress(status)))
+
+    try:
+        result = await media_downloader._download_media(
+            url, platform, on_progress=_forward_progress, connections=connections, media_preference=media_preference
+        )
+        if result and result.get('file_path'):
+            # Ishchi papka endi parent jarayonga tegishli (yuborilgandan keyin o'chiradi)
+            workspace_manager.detach(Path(result['file_path']))
+        return result
+    finally:
+        await http_client.close()
+
+
+def _worker_main(conn: Connection, memory_mb: int, cpu_seconds: int) -> None:
+    """
+    Worker jarayoni asosiy sikli - ishlarni qabul qilib, natijani qaytaradi
+    """
+    # Warm interpreter - og'ir modullarni oldindan yuklash
+    import yt_dlp  # noqa: F401
+    from utils import media_downloader  # noqa: F401
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+
+        _, job_id, url, platform, connections, media_preference = message
+        try:
+            _apply_job_rlimits(memory_mb, cpu_seconds)
+            result = asyncio.run(_run_job(url, platform, connections, media_preference, conn, job_id))
+            _send(conn, ('result', job_id, result))
+        except MemoryError:
+            _send(conn, ('error', job_id, "Xotira limiti oshib ketdi"))
+        except Exception as e:
+            _send(conn, ('error', job_id, str(e)))
+
+    conn.close()
+
+
+class _Worker:
+    """Bitta worker jarayoni va uning Pipe ulanishi"""
+
+    def __init__(self, process: multiprocessing.Process, conn: Connection):
+        self.process = process
+        self.conn = conn
+
+    def kill(self) -> None:
+        """Worker'ni majburan o'chirish"""
+        try:
+            if self.process.is_alive():
+                self.process.kill()
+            self.process.join(timeout=5)
+        except Exception as e:
+            logger.warning(f"Worker'ni o'chirishda xatolik: {e}")
+        finally:
+            self.conn.close()
+
+
+class DownloadWorkerPool:
+    """
+    Warm yt-dlp worker jarayonlari pool'i
+
+    - Har bir worker bir vaqtda bitta ishni bajaradi
+    - Ish uchun xotira (RLIMIT_AS) va CPU (RLIMIT_CPU) limitlari
+    - Timeout bo'lsa worker majburan o'chiriladi va yangisi ishga tushiriladi
+    """
+
+    def __init__(self, size: int = 0, memory_mb: int = 1024, cpu_seconds: int = 300, job_timeout: float = 600.0):
+        """
+        Args:
+            size: Worker jarayonlari soni (0 - pool o'chirilgan)
+            memory_mb: Har bir ish uchun xotira limiti (MB)
+            cpu_seconds: Har bir ish uchun CPU vaqti limiti (sekund)
+            job_timeout: Ish uchun maksimal vaqt (sekund)
+        """
+        self.size = max(0, size)
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.job_timeout = job_timeout
+        # spawn - event loop va thread'lari bor jarayondan fork qilmaslik uchun
+        self._ctx = multiprocessing.get_context('spawn')
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: list[_Worker] = []
+        self._job_seq = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Pool yoqilganmi"""
+        return self.size > 0
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.memory_mb, self.cpu_seconds),
+            name="ytdlp-worker",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, parent_conn)
+        self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker: _Worker) -> None:
+        """Ishdan chiqqan worker o'rniga yangisini ishga tushirish"""
+        worker.kill()
+        if worker in self._workers:
+            self._workers.remove(worker)
+        self._idle.put_nowait(self._spawn())
+
+    async def start(self) -> None:
+        """Worker jarayonlarini ishga tushirish"""
+        async with self._lock:
+            if not self.enabled or self._idle is not None:
+                return
+            self._idle = asyncio.Queue()
+            for _ in range(self.size):
+                self._idle.put_nowait(self._spawn())
+            logger.info(f"yt-dlp worker pool ishga tushdi: {self.size} ta jarayon")
+
+    async def _receive_result(self, worker: _Worker, job_id: int, on_progress: Optional[Callable[[Dict], None]]):
+        """
+        Natija kelguncha worker xabarlarini o'qish (progress xabarlari callback'ga uzatiladi)
+
+        recv() alohida thread'da bloklanadi - bu coroutine bekor qilinsa ham thread to'xtamaydi,
+        shuning uchun timeout/bekor qilishda chaqiruvchi ulanishni yopadi va worker'ni o'chiradi - Pipe'ning
+        boshqa uchi yopilgach recv() EOFError bilan qaytadi va thread bo'shaydi.
+
+        Args:
+            worker: Ishni bajarayotgan worker
+            job_id: Joriy ish ID'si - boshqa (oldingi) ishga tegishli xabarlar tashlab yuboriladi
+            on_progress: Progress callback
+        """
+        while True:
+            kind, message_job_id, payload = await asyncio.to_thread(worker.conn.recv)
+            if message_job_id != job_id:
+                logger.warning(f"Eskirgan worker xabari tashlab yuborildi: {kind} (ish {message_job_id}, joriy {job_id})")
+                continue
+            if kind != 'progress':
+                return kind, payload
+            if on_progress:
+                try:
+                    on_progress(payload)
+                except Exception as e:
+                    logger.debug(f"Progress callback xatosi: {e}")
+
+    async def run(
+        self,
+        url: str,
+        platform: str,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        connections: int = 1,
+        media_preference: str = 'video_audio',
+    ) -> Optional[Dict]:
+        """
+        Yuklab olish ishini worker jarayonida bajarish
+
+        Args:
+            url: Media URL
+            platform: Platform nomi
+            on_progress: Worker'dan kelgan progress uchun callback
+            connections: Parallel ulanishlar soni
+            media_preference: Foydalanuvchi sozlamasi (video_audio, video_only, audio_only)
+
+        Returns:
+            download_media bilan bir xil natija dict yoki None
+        """
+        await self.start()
+        worker = await self._idle.get()
+        self._job_seq += 1
+        job_id = self._job_seq
+
+        try:
+            worker.conn.send(('job', job_id, url, platform, connections, media_preference))
+            kind, payload = await asyncio.wait_for(
+                self._receive_result(worker, job_id, on_progress),
+                timeout=self.job_timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"yt-dlp worker timeout ({self.job_timeout:.0f}s), jarayon o'chirilmoqda: {url}")
+            # Ulanish yopiladi va jarayon o'chiriladi - recv() bilan bloklangan thread EOFError bilan bo'shaydi
+            # (yopilgan ulanishdan keyingi o'qishlar ham xatolik bilan tugaydi, yangi worker xabarlarini olmaydi)
+            worker.conn.close()
+            self._replace(worker)
+            return None
+        except (EOFError, OSError, BrokenPipeError) as e:
+            # Worker limit tufayli o'ldirilgan yoki qulagan
+            logger.error(f"yt-dlp worker ishdan chiqdi ({worker.process.exitcode}): {url}, {e!r}")
+            self._replace(worker)
+            return None
+        except asyncio.CancelledError:
+            worker.conn.close()
+            self._replace(worker)
+            raise
+
+        self._idle.put_nowait(worker)
+        if kind == 'error':
+            logger.error(f"yt-dlp worker xatosi: {payload}")
+            return None
+        if payload and payload.get('file_path'):
+            # Ishchi papka endi parent'ga tegishli - worker keyin o'lsa ham janitor yuborilguncha o'chirmaydi
+            workspace_manager.adopt(Path(payload['file_path']))
+        return payload
+
+    async def shutdown(self) -> None:
+        """Barcha worker'larni to'xtatish"""
+        async with self._lock:
+            for worker in self._workers:
+                try:
+                    worker.conn.send(None)
+                except Exception:
+                    pass
+            for worker in self._workers:
+                await asyncio.to_thread(worker.process.join, 5)
+                worker.kill()
+            self._workers.clear()
+            self._idle = None
+
+
+# Global worker pool instance
+download_workers = DownloadWorkerPool(
+    size=config.bot.ytdlp_worker_processes,
+    memory_mb=config.bot.ytdlp_worker_memory_mb,
+    cpu_seconds=config.bot.ytdlp_worker_cpu_seconds,
+    job_timeout=config.bot.ytdlp_worker_job_timeout,
+)
@@ -0,0 +1,170 @@
+"""
+Async HTTP client - umumiy aiohttp ulanishlar pool'i
+Sahifa va media fayllarni oqim (stream) bilan yuklab olish
+"""
+
+import asyncio
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+class HttpClient:
+    """
+    Umumiy aiohttp session (keep-alive ulanishlar qayta ishlatiladi)
+
+    - HTML sahifani </head> gacha o'qish (og: meta teglar uchun yetarli)
+    - Media faylni bo'laklab diskka yozish (hajm limiti bilan)
+    """
+
+    def __init__(self, limit: int = 50, limit_per_host: int = 10, chunk_size: int = 64 * 1024):
+        """
+        Args:
+            limit: Umumiy ulanishlar limiti
+            limit_per_host: Bitta host uchun ulanishlar limiti
+            chunk_size: O'qish bo'lagi hajmi (bytes)
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.chunk_size = chunk_size
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"User-Agent": DEFAULT_USER_AGENT},
+            )
+            self._loop = loop
+        return self._session
+
+    async def fetch_html_head(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        max_bytes: int = 1024 * 1024,
+        timeout: float = 45.0,
+    ) -> str:
+        """
+        HTML sahifani </head> tegigacha o'qish
+
+        Args:
+            url: Sahifa URL
+            headers: Qo'shimcha header'lar
+            max_bytes: O'qiladigan maksimal hajm
+            timeout: Umumiy timeout (sekund)
+
+        Returns:
+            HTML matni (head qismi)
+        """
+        session = self._get_session()
+        buffer = bytearray()
+        async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            resp.raise_for_status()
+            async for chunk in resp.content.iter_chunked(self.chunk_size):
+                # Oldingi bo'lak chegarasida bo'lingan tegni ham topish uchun oxirgi 6 bayt bilan qidirish
+                search_from = max(0, len(buffer) - 6)
+                buffer.extend(chunk)
+                if buffer.lower().find(b"</head>", search_from) != -1 or len(buffer) >= max_bytes:
+                    break
+        return buffer.decode("utf-8", errors="ignore")
+
+    async def download_to_file(
+        self,
+        url: str,
+        output_path: Path,
+        headers: Optional[Dict[str, str]] = None,
+        max_bytes: Optional[int] = None,
+        timeout: float = 300.0,
+    ) -> bool:
+        """
+        Faylni bo'laklab diskka yuklab olish
+
+        Args:
+            url: Fayl URL
+            output_path: Saqlash yo'li
+            headers: Qo'shimcha header'lar
+            max_bytes: Maksimal fayl hajmi (oshsa yuklab olish to'xtatiladi)
+            timeout: Umumiy timeout (sekund)
+
+        Returns:
+            True agar fayl to'liq yuklangan bo'lsa
+        """
+        session = self._get_session()
+        written = 0
+        try:
+            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                resp.raise_for_status()
+                if max_bytes and resp.content_length and resp.content_length > max_bytes:
+                    logger.warning(f"Fayl juda katta ({resp.content_length} bytes): {url[:100]}")
+                    return False
+                with open(output_path, "wb") as f:
+                    async for chunk in resp.content.iter_chunked(self.chunk_size):
+                        written += len(chunk)
+                        if max_bytes and written > max_bytes:
+                            logger.warning(f"Fayl hajmi limitdan oshdi ({max_bytes} bytes): {url[:100]}")
+                            break
+                        f.write(chunk)
+            if max_bytes and written > max_bytes:
+                output_path.unlink(missing_ok=True)
+                return False
+        except BaseException:
+            output_path.unlink(missing_ok=True)
+            raise
+        return written > 0 and output_path.exists()
+
+    async def resolve_redirects(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        max_redirects: int = 10,
+        timeout: float = 15.0,
+    ) -> str:
+        """
+        Redirect'larni kuzatib yakuniy URL'ni olish (avval HEAD, server rad etsa GET - tana o'qilmaydi)
+
+        Args:
+            url: Boshlang'ich URL
+            headers: Qo'shimcha header'lar
+            max_redirects: Maksimal redirect'lar soni
+            timeout: Umumiy timeout (sekund)
+
+        Returns:
+            Yakuniy URL
+        """
+        session = self._get_session()
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        for method in ("HEAD", "GET"):
+            async with session.request(
+                method, url, headers=headers, allow_redirects=True,
+                max_redirects=max_redirects, timeout=client_timeout,
+            ) as resp:
+                # Ba'zi serverlar HEAD'ga 403/405 qaytaradi - GET bilan qayta urinish
+                if resp.status < 400 or method == "GET":
+                    resp.raise_for_status()
+                    return str(resp.url)
+        return url
+
+    async def close(self) -> None:
+        """Session'ni yopish"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+
+# Global HTTP client instance
+http_client = HttpClient()
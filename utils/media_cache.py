@@ -1,42 +1,136 @@
 """
 Media cache utility - link va file_id mapping
 Memory cache va database cache kombinatsiyasi
+Qidiruv kanonik kalit (platform:media_id:variant) bo'yicha - bir xil media'ning turli URL ko'rinishlari bitta yozuvga tushadi
+Har bir yuborilgan variant (video, audio) alohida yozuv - o'z file_id, hajm va davomiyligi bilan
 """
 
+import hashlib
 import logging
-from typing import Optional
-from sqlalchemy import select
+import os
+from typing import Dict, List, Optional
+from sqlalchemy import delete, func, select, update
 from sqlalchemy.exc import IntegrityError
 from database import async_session_maker
 from models import MediaLink
 from utils.memory_cache import media_cache
+from utils.metrics import metrics
+from utils.url_classifier import AUDIO_VARIANT, DEFAULT_VARIANT, canonical_media_key, preference_variant
 
 logger = logging.getLogger(__name__)
 
 
-async def get_cached_media(url: str) -> Optional[MediaLink]:
+def media_key_hash(key: str) -> int:
+    """
+    Kanonik kalitning ixcham hash'i (BIGINT ustun uchun, signed 64-bit)
+    
+    Args:
+        key: canonical_media_key natijasi
+    """
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def _variant_row_url(url: str, variant: str) -> str:
+    """Variant yozuvi URL'i (url ustuni unique - asosiy yozuv asl URL'ni egallaydi)"""
+    return url if variant == DEFAULT_VARIANT else f"{url}#{variant}"
+
+
+# Fingerprint uchun o'qiladigan blok (fayl boshi va oxiri)
+FINGERPRINT_BLOCK_SIZE = 64 * 1024
+
+
+def compute_content_fingerprint(file_path: str) -> Optional[str]:
+    """
+    Fayl tarkibining arzon fingerprint'i: hajm + boshi va oxiridagi bloklar hash'i
+    (sinxron - asyncio.to_thread orqali chaqiriladi; butun fayl o'qilmaydi)
+    
+    Args:
+        file_path: Fayl yo'li
+    
+    Returns:
+        "hajm:hash" yoki None (faylni o'qib bo'lmasa)
+    """
+    try:
+        size = os.path.getsize(file_path)
+        digest = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as f:
+            digest.update(f.read(FINGERPRINT_BLOCK_SIZE))
+            if size > 2 * FINGERPRINT_BLOCK_SIZE:
+                f.seek(-FINGERPRINT_BLOCK_SIZE, os.SEEK_END)
+                digest.update(f.read(FINGERPRINT_BLOCK_SIZE))
+            elif size > FINGERPRINT_BLOCK_SIZE:
+                digest.update(f.read())
+        return f"{size}:{digest.hexdigest()}"
+    except OSError as e:
+        logger.warning(f"Fingerprint hisoblanmadi ({file_path}): {e}")
+        return None
+
+
+async def _find_media(
+    session,
+    url: str,
+    key_hash: int,
+    variant: str = DEFAULT_VARIANT,
+    include_invalid: bool = False,
+) -> Optional[MediaLink]:
+    """
+    Kanonik kalit, so'ng (hali backfill qilinmagan yozuvlar uchun) variant yozuvi URL'i bo'yicha qidirish
+    
+    Args:
+        url: Asl media URL (variant qo'shimchasisiz)
+        key_hash: canonical_media_key(url, variant) hash'i
+        variant: Media varianti - eski yozuv ham shu variantniki bo'lishi kerak
+            (aks holda audio so'rovi video yozuvini olib, unga audio kalitini yozib qo'yadi)
+        include_invalid: Yaroqsiz deb belgilangan yozuvlar ham (yangi file_id bilan almashtirish uchun)
+    """
+    conditions = [MediaLink.parent_id.is_(None)]
+    if not include_invalid:
+        conditions.append(MediaLink.invalidated_at.is_(None))
+    result = await session.execute(
+        select(MediaLink)
+        .where(MediaLink.media_key == key_hash, *conditions)
+        .order_by(MediaLink.access_count.desc())
+        .limit(1)
+    )
+    media = result.scalar_one_or_none()
+    if media:
+        return media
+    
+    result = await session.execute(
+        select(MediaLink).where(
+            MediaLink.url == _variant_row_url(url, variant), MediaLink.media_key.is_(None), *conditions
+        )
+    )
+    media = result.scalar_one_or_none()
+    if media:
+        media.media_key = key_hash
+    return media
+
+
+async def get_cached_media(url: str, variant: str = DEFAULT_VARIANT) -> Optional[MediaLink]:
     """
     Cache'dan media olish - memory cache va database cache kombinatsiyasi
     
     Args:
         url: Media URL
+        variant: Media varianti
     
     Returns:
         MediaLink obyekti yoki None
     """
+    key = canonical_media_key(url, variant)
+    
     # 1. Memory cache'dan tekshirish (tez)
-    cached = await media_cache.get(url)
+    cached = await media_cache.get(key)
     if cached:
-        logger.debug(f"Memory cache'dan topildi: {url}")
+        logger.debug(f"Memory cache'dan topildi: {url} ({key})")
         return cached
     
     # 2. Database'dan olish
     async with async_session_maker() as session:
         try:
-            result = await session.execute(
-                select(MediaLink).where(MediaLink.url == url)
-            )
-            media = result.scalar_one_or_none()
+            media = await _find_media(session, url, media_key_hash(key), variant)
             
             if media:
                 # Access count oshirish (optimizatsiya: faqat commit, refresh kerak emas)
@@ -44,7 +138,7 @@ async def get_cached_media(url: str) -> Optional[MediaLink]:
                 await session.commit()
                 
                 # Memory cache'ga saqlash (keyingi marta tezroq)
-                await media_cache.set(url, media, ttl_seconds=7200)
+                await media_cache.set(key, media, ttl_seconds=7200)
             
             return media
         except Exception as e:
@@ -62,6 +156,8 @@ async def save_media_cache(
     thumbnail_file_id: Optional[str] = None,
     file_size: Optional[int] = None,
     duration: Optional[int] = None,
+    variant: str = DEFAULT_VARIANT,
+    content_fingerprint: Optional[str] = None,
 ) -> Optional[MediaLink]:
     """
     Media'ni cache'ga saqlash
@@ -76,20 +172,36 @@ async def save_media_cache(
         thumbnail_file_id: Thumbnail file_id
         file_size: Fayl hajmi (bytes)
         duration: Davomiyligi (sekund)
+        variant: Media varianti
+        content_fingerprint: Yuborilgan fayl fingerprint'i (takroriy upload'larni aniqlash uchun)
     
     Returns:
         MediaLink obyekti yoki None
     """
+    key = canonical_media_key(url, variant)
+    key_hash = media_key_hash(key)
+    row_url = _variant_row_url(url, variant)
+    
     async with async_session_maker() as session:
         try:
-            # Mavjud media'ni tekshirish
-            result = await session.execute(
-                select(MediaLink).where(MediaLink.url == url)
-            )
-            existing = result.scalar_one_or_none()
+            # Mavjud media'ni tekshirish (boshqa URL ko'rinishi bilan saqlangan bo'lishi mumkin).
+            # Yaroqsiz file_id'li yozuv ham topiladi - bitta tranzaksiyada yangi file_id bilan almashtiriladi
+            existing = await _find_media(session, url, key_hash, variant, include_invalid=True)
             
             if existing:
+                if existing.invalidated_at is not None:
+                    metrics.increment('cache.file_id_replaced')
+                    logger.info(f"Eskirgan file_id almashtirildi: {url} ({existing.file_id} -> {file_id})")
+                    existing.invalidated_at = None
+                
+
+                if existing.file_type == 'album':
+                    # Avval albom sifatida saqlangan - eski elementlarni o'chirish
+                    await session.execute(delete(MediaLink).where(MediaLink.parent_id == existing.id))
+                
                 # Yangilash
+                existing.media_key = key_hash
+                existing.variant = variant
                 existing.file_id = file_id
                 existing.file_type = file_type
                 existing.file_unique_id = file_unique_id
@@ -97,17 +209,21 @@ async def save_media_cache(
                 existing.thumbnail_file_id = thumbnail_file_id
                 existing.file_size = file_size
                 existing.duration = duration
+                if content_fingerprint:
+                    existing.content_fingerprint = content_fingerprint
                 await session.commit()
                 await session.refresh(existing)
                 
                 # Memory cache'ni yangilash
-                await media_cache.set(url, existing, ttl_seconds=7200)
+                await media_cache.set(key, existing, ttl_seconds=7200)
                 
                 return existing
             else:
                 # Yangi media qo'shish
                 new_media = MediaLink(
-                    url=url,
+                    url=row_url,
+                    media_key=key_hash,
+                    variant=variant,
                     platform=platform,
                     file_id=file_id,
                     file_type=file_type,
@@ -116,6 +232,7 @@ async def save_media_cache(
                     thumbnail_file_id=thumbnail_file_id,
                     file_size=file_size,
                     duration=duration,
+                    content_fingerprint=content_fingerprint,
                     access_count=1,
                 )
                 session.add(new_media)
@@ -123,14 +240,270 @@ async def save_media_cache(
                 await session.refresh(new_media)
                 
                 # Memory cache'ga saqlash
-                await media_cache.set(url, new_media, ttl_seconds=7200)
+                await media_cache.set(key, new_media, ttl_seconds=7200)
                 
                 return new_media
         except IntegrityError:
             await session.rollback()
             # Agar unique constraint xatosi bo'lsa, qayta urinib ko'rish
-            return await get_cached_media(url)
+            return await get_cached_media(url, variant)
         except Exception as e:
             await session.rollback()
             logger.error(f"Media cache'ga saqlashda xatolik: {e}")
             return None
+
+
+async def get_cached_variants(url: str, media_preference: Optional[str]) -> List[MediaLink]:
+    """
+    Foydalanuvchi sozlamasini yuklab olishsiz qondiradigan cache yozuvlari (yuborish tartibida)
+
+    - video_only: asosiy yozuv (video, rasm yoki albom)
+    - video_audio: asosiy yozuv va video bo'lsa audio varianti (saqlangan bo'lsa)
+    - audio_only: audio varianti; u yo'q bo'lsa asosiy yozuv faqat video bo'lmaganda (rasm, albom) -
+      videodan audio yangi yuklab olish orqali olinadi
+
+    Args:
+        url: Media URL
+        media_preference: video_audio, video_only yoki audio_only
+
+    Returns:
+        MediaLink'lar ro'yxati (bo'sh - cache'da yo'q)
+    """
+    if preference_variant(media_preference) == AUDIO_VARIANT:
+        audio = await get_cached_media(url, AUDIO_VARIANT)
+        if audio:
+            return [audio]
+        primary = await get_cached_media(url)
+        return [primary] if primary and primary.file_type != 'video' else []
+    
+    primary = await get_cached_media(url)
+    if not primary:
+        return []
+    if media_preference == 'video_only' or primary.file_type != 'video':
+        return [primary]
+    audio = await get_cached_media(url, AUDIO_VARIANT)
+    return [primary, audio] if audio else [primary]
+
+
+async def find_media_by_fingerprint(fingerprint: str, file_type: str) -> Optional[MediaLink]:
+    """
+    Tarkibi bir xil, avval yuborilgan media (boshqa URL yoki platformadan) - upload o'rniga file_id
+    
+    Args:
+        fingerprint: compute_content_fingerprint natijasi
+        file_type: Kutilgan fayl turi (video, audio, photo, document)
+    
+    Returns:
+        MediaLink obyekti yoki None
+    """
+    async with async_session_maker() as session:
+        try:
+            result = await session.execute(
+                select(MediaLink)
+                .where(
+                    MediaLink.content_fingerprint == fingerprint,
+                    MediaLink.file_type == file_type,
+                    MediaLink.invalidated_at.is_(None),
+                )
+                .order_by(MediaLink.access_count.desc())
+                .limit(1)
+            )
+            return result.scalar_one_or_none()
+        except Exception as e:
+            logger.error(f"Fingerprint bo'yicha qidirishda xatolik: {e}")
+            return None
+
+
+async def save_album_cache(
+    url: str,
+    platform: str,
+    items: List[Dict],
+    title: Optional[str] = None,
+    variant: str = DEFAULT_VARIANT,
+) -> Optional[MediaLink]:
+    """
+    Albomni cache'ga saqlash - albom yozuvi (file_type='album') va tartiblangan elementlar
+
+    Args:
+        url: Media URL
+        platform: Platform nomi
+        items: Elementlar [{file_id, file_type, file_unique_id, file_size, duration}, ...]
+        title: Albom sarlavhasi
+        variant: Media varianti
+
+    Returns:
+        Albom MediaLink obyekti yoki None
+    """
+    if not items:
+        return None
+    key = canonical_media_key(url, variant)
+    key_hash = media_key_hash(key)
+    
+    async with async_session_maker() as session:
+        try:
+            parent = await _find_media(session, url, key_hash, variant, include_invalid=True)
+            if parent:
+                # Eski elementlar (yoki bitta media) o'rniga yangi albom
+                await session.execute(delete(MediaLink).where(MediaLink.parent_id == parent.id))
+                if parent.invalidated_at is not None:
+                    metrics.increment('cache.file_id_replaced')
+                    parent.invalidated_at = None
+                parent.media_key = key_hash
+            else:
+                parent = MediaLink(url=url, media_key=key_hash, platform=platform, access_count=1)
+                session.add(parent)
+            
+            # Albom yozuvi - birinchi element file_id'si (ustun NOT NULL)
+            parent.file_id = items[0]['file_id']
+            parent.file_type = 'album'
+            parent.file_unique_id = None
+            parent.title = title
+            parent.thumbnail_file_id = None
+            parent.file_size = sum(item.get('file_size') or 0 for item in items) or None
+            parent.duration = None
+            await session.flush()
+            
+            children = [
+                MediaLink(
+                    url=f"{parent.url}#{position}",
+                    parent_id=parent.id,
+                    position=position,
+                    platform=platform,
+                    file_id=item['file_id'],
+                    file_type=item['file_type'],
+                    file_unique_id=item.get('file_unique_id'),
+                    file_size=item.get('file_size'),
+                    duration=item.get('duration'),
+                    access_count=0,
+                )
+                for position, item in enumerate(items)
+            ]
+            session.add_all(children)
+            await session.commit()
+            await session.refresh(parent)
+            
+            await media_cache.set(key, parent, ttl_seconds=7200)
+            await media_cache.set(f"album:{parent.id}", children, ttl_seconds=7200)
+            
+            return parent
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Albomni cache'ga saqlashda xatolik: {e}")
+            return None
+
+
+async def get_album_items(parent: MediaLink) -> List[MediaLink]:
+    """
+    Albom elementlari (tartib bo'yicha)
+
+    Args:
+        parent: file_type='album' bo'lgan MediaLink
+
+    Returns:
+        Elementlar ro'yxati
+    """
+    cache_key = f"album:{parent.id}"
+    cached = await media_cache.get(cache_key)
+    if cached:
+        return cached
+    
+    async with async_session_maker() as session:
+        try:
+            result = await session.execute(
+                select(MediaLink)
+                .where(MediaLink.parent_id == parent.id)
+                .order_by(MediaLink.position)
+            )
+            items = list(result.scalars().all())
+            if items:
+                await media_cache.set(cache_key, items, ttl_seconds=7200)
+            return items
+        except Exception as e:
+            logger.error(f"Albom elementlarini olishda xatolik: {e}")
+            return []
+
+
+async def invalidate_cached_media(media: MediaLink) -> bool:
+    """
+    Telegram rad etgan file_id'li yozuvni yaroqsiz deb belgilash (memory va database)
+    
+    Database'da faqat file_id hali o'zgarmagan bo'lsa belgilanadi - parallel so'rov allaqachon
+    yangi file_id saqlagan bo'lsa, u yozuv tegilmaydi. Keyingi save_media_cache shu yozuvni yangilaydi.
+    
+    Args:
+        media: Yuborib bo'lmagan MediaLink (albom elementi bo'lsa - albom yozuvi)
+    
+    Returns:
+        True agar database'da belgilangan bo'lsa
+    """
+    await media_cache.delete(canonical_media_key(media.url, media.variant or DEFAULT_VARIANT))
+    if media.file_type == 'album':
+        await media_cache.delete(f"album:{media.id}")
+    
+    async with async_session_maker() as session:
+        try:
+            result = await session.execute(
+                update(MediaLink)
+                .where(
+                    MediaLink.id == media.id,
+                    MediaLink.file_id == media.file_id,
+                    MediaLink.invalidated_at.is_(None),
+                )
+                .values(invalidated_at=func.now())
+            )
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"file_id'ni yaroqsiz deb belgilashda xatolik: {e}")
+            return False
+    
+    if result.rowcount:
+        metrics.increment('cache.file_id_invalidated')
+        logger.warning(f"Eskirgan file_id yaroqsiz deb belgilandi: {media.url} ({media.file_id})")
+        return True
+    return False
+
+
+async def backfill_media_keys(batch_size: int = 500) -> int:
+    """
+    media_key bo'sh bo'lgan eski yozuvlarni to'ldirish (partiyalab, har biri alohida tranzaksiya)
+    
+    Args:
+        batch_size: Bitta partiyadagi yozuvlar soni
+    
+    Returns:
+        Yangilangan yozuvlar soni
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        async with async_session_maker() as session:
+            try:
+                result = await session.execute(
+                    select(MediaLink.id, MediaLink.url)
+                    .where(MediaLink.media_key.is_(None), MediaLink.parent_id.is_(None), MediaLink.id > last_id)
+                    .order_by(MediaLink.id)
+                    .limit(batch_size)
+                )
+                rows = result.all()
+                if not rows:
+                    break
+                
+                await session.execute(
+                    update(MediaLink),
+                    [
+                        {'id': row.id, 'media_key': media_key_hash(canonical_media_key(row.url))}
+                        for row in rows
+                    ],
+                )
+                await session.commit()
+                updated += len(rows)
+                last_id = rows[-1].id
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"media_key backfill xatosi: {e}")
+                break
+    
+    if updated:
+        logger.info(f"media_key backfill: {updated} ta yozuv yangilandi")
+    return updated
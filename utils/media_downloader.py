@@ -5,14 +5,23 @@ Media downloader utility - YouTube, Instagram, TikTok va boshqa platformalardan
 import re
 import logging
 import asyncio
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Tuple, Callable, Awaitable
+from contextlib import asynccontextmanager
 from pathlib import Path
-import tempfile
 import shutil
 import os
-from urllib import request, parse
+from urllib import parse
 import html
 from config import config
+from utils.download_workers import download_workers
+from utils.ydl_pool import ydl_pool, set_ydl_format, set_ydl_output_dir
+from utils.cookie_store import cookie_store
+from utils.http_client import http_client
+from utils.workspace import Workspace, workspace_manager, WorkspaceQuotaError, ydl_quota_hook
+from utils.circuit_breaker import CircuitBreaker, circuit_breakers
+from utils.negative_cache import negative_cache
+from utils.connection_budget import connection_budget
+from utils.url_classifier import classify_url, detect_platform, is_valid_url, preference_variant, strip_tracking_params  # noqa: F401 (handlers shu yerdan import qiladi)
 
 logger = logging.getLogger(__name__)
 
@@ -24,35 +33,6 @@ class MediaDownloadError(Exception):
         self.error_type = error_type
         super().__init__(self.message)
 
-# Platform URL patterns
-PLATFORM_PATTERNS = {
-    'youtube': [
-        r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]{11})',
-        r'(?:https?://)?(?:www\.)?youtube\.com/watch\?.*&v=([a-zA-Z0-9_-]{11})',
-        r'(?:https?://)?(?:www\.)?youtu\.be/([a-zA-Z0-9_-]{11})',
-        r'(?:https?://)?(?:www\.)?youtube\.com/shorts/([a-zA-Z0-9_-]{11})',
-        r'(?:https?://)?(?:m\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]{11})',
-        r'(?:https?://)?(?:m\.)?youtube\.com/watch\?.*&v=([a-zA-Z0-9_-]{11})',
-    ],
-    'instagram': [
-        r'(?:https?://)?(?:www\.)?instagram\.com/(?:p|reel|tv)/([a-zA-Z0-9_-]+)',
-        r'(?:https?://)?(?:www\.)?instagram\.com/([a-zA-Z0-9_.]+)/',
-        r'(?:https?://)?(?:www\.)?instagram\.com/stories/([a-zA-Z0-9_.]+)/(\d+)',  # Instagram stories
-    ],
-    'tiktok': [
-        r'(?:https?://)?(?:www\.)?(?:vm\.|vt\.)?tiktok\.com/([a-zA-Z0-9]+)',
-        r'(?:https?://)?(?:www\.)?tiktok\.com/@[^/]+/video/(\d+)',
-    ],
-    'twitter': [
-        r'(?:https?://)?(?:www\.)?(?:twitter\.com|x\.com)/[^/]+/status/(\d+)',
-    ],
-    'facebook': [
-        r'(?:https?://)?(?:www\.)?facebook\.com/[^/]+/videos/(\d+)',
-        r'(?:https?://)?(?:www\.)?fb\.watch/([a-zA-Z0-9_-]+)',
-    ],
-}
-
-
 def _resolve_instagram_cookies_path() -> Optional[Path]:
     """
     Instagram cookies fayl yo'lini topish.
@@ -125,23 +105,11 @@ def validate_youtube_cookies(cookies_path: Optional[Path]) -> Tuple[bool, str]:
         return False, f"Bu fayl emas (papka?): {cookies_path}"
     
     try:
-        content = cookies_path.read_text(encoding="utf-8", errors="ignore")
+        # Cookie store - fayl o'zgarmagan bo'lsa qayta o'qilmaydi
+        youtube_cookies = cookie_store.load(cookies_path).count("youtube.com")
     except Exception as e:
         return False, f"Cookie faylni o'qib bo'lmadi: {e}"
     
-    lines = content.strip().splitlines()
-    youtube_cookies = 0
-    for line in lines:
-        line = line.strip()
-        if not line or line.startswith("#"):
-            continue
-        parts = line.split("\t")
-        if len(parts) < 7:
-            continue
-        domain = parts[0].strip().lower()
-        if "youtube.com" in domain:
-            youtube_cookies += 1
-    
     if youtube_cookies == 0:
         return False, (
             "Cookie faylda YouTube (youtube.com) uchun hech qanday cookie yo'q. "
@@ -152,41 +120,43 @@ def validate_youtube_cookies(cookies_path: Optional[Path]) -> Tuple[bool, str]:
     return True, f"YouTube cookie'lari: {youtube_cookies} ta"
 
 
-def _prepare_cookiefile_for_ydl(source_cookie_path: Optional[Path], temp_dir: str, tag: str) -> Optional[Path]:
+def _prepare_cookiefile_for_ydl(source_cookie_path: Optional[Path], tag: str) -> Optional[Path]:
     """
-    Read-only cookiefile muammosini oldini olish uchun cookie faylni temp papkaga nusxalash.
-    Binary rejimda nusxalanadi — tab va line-ending o'zgarishining oldini olish uchun.
+    Read-only cookiefile muammosini oldini olish uchun cookie faylning yoziladigan nusxasi.
+    Nusxa cookie store'da fayl versiyasi bo'yicha bir marta yaratiladi va barcha yt-dlp ishlari bo'lishadi.
     """
-    if not source_cookie_path:
-        return None
-    try:
-        dest = Path(temp_dir) / f"{tag}_cookies.txt"
-        dest.write_bytes(source_cookie_path.read_bytes())
-        return dest
-    except Exception as e:
-        logger.warning(f"Cookie faylni temp'ga nusxalashda xatolik ({tag}): {e}")
-        return None
+    return cookie_store.prepared_copy(source_cookie_path, tag)
 
 
 def _classify_instagram_error(error_text: str) -> Optional[str]:
     """
     Instagram xatoliklarini foydalanuvchiga tushunarli turlarga ajratish.
+
+    blocked - platforma bizni bloklagan (circuit breaker'ga), auth_required - faqat shu post
+    yopiq yoki login talab qiladi (negative cache'da URL bo'yicha).
     """
     error_text = error_text.lower()
 
-    auth_markers = (
-        "login required",
-        "rate-limit",
+    # "Requested content is not available, rate-limit reached or login required" - yopiq postda ham
+    # shu matn qaytadi, shuning uchun bitta post muammosi sifatida avval tekshiriladi
+    item_markers = (
         "requested content is not available",
-        "use --cookies",
         "private",
         "forbidden",
         "http error 403",
-        "unauthorized",
     )
-    if any(marker in error_text for marker in auth_markers):
+    if any(marker in error_text for marker in item_markers):
         return "auth_required"
 
+    blocked_markers = (
+        "login required",
+        "rate-limit",
+        "use --cookies",
+        "unauthorized",
+    )
+    if any(marker in error_text for marker in blocked_markers):
+        return "blocked"
+
     if "story" in error_text and ("not available" in error_text or "not found" in error_text):
         return "story_unavailable"
 
@@ -196,20 +166,29 @@ def _classify_instagram_error(error_text: str) -> Optional[str]:
 def _classify_youtube_error(error_text: str) -> Optional[str]:
     """
     YouTube xatoliklarini foydalanuvchiga tushunarli turlarga ajratish.
+
+    blocked - anti-bot tekshiruvi yoki login talabi (circuit breaker'ga), auth_required - faqat
+    shu video yopiq yoki yosh cheklovli (negative cache'da URL bo'yicha).
     """
     error_text = error_text.lower()
 
-    auth_markers = (
+    blocked_markers = (
         "sign in to confirm you’re not a bot",
         "sign in to confirm you're not a bot",
-        "use --cookies-from-browser",
-        "use --cookies",
         "login required",
+    )
+    if any(marker in error_text for marker in blocked_markers):
+        return "blocked"
+
+    item_markers = (
         "this video is private",
+        "private video",
+        "use --cookies-from-browser",
+        "use --cookies",
         "http error 403",
         "forbidden",
     )
-    if any(marker in error_text for marker in auth_markers):
+    if any(marker in error_text for marker in item_markers):
         return "auth_required"
 
     if "requested format is not available" in error_text:
@@ -218,52 +197,46 @@ def _classify_youtube_error(error_text: str) -> Optional[str]:
     return None
 
 
-def _cookies_header_from_file(cookies_path: Optional[Path]) -> str:
+def _classify_common_error(error_text: str) -> Optional[str]:
     """
-    Netscape cookie file'dan Cookie header tayyorlash.
+    Barcha platformalar uchun umumiy xatoliklar: rate limit va mavjud bo'lmagan media.
+    Bunday xatoliklarda boshqa format bilan qayta urinish foydasiz.
     """
-    if not cookies_path or not cookies_path.exists():
-        return ""
+    error_text = error_text.lower()
 
-    pairs = []
-    try:
-        for line in cookies_path.read_text(encoding="utf-8", errors="ignore").splitlines():
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            parts = line.split("\t")
-            if len(parts) < 7:
-                continue
-            domain, _, _, _, _, name, value = parts[:7]
-            if "instagram.com" not in domain:
-                continue
-            if name and value:
-                pairs.append(f"{name}={value}")
-    except Exception as e:
-        logger.warning(f"Cookie header yaratishda xatolik: {e}")
-        return ""
+    if "http error 429" in error_text or "too many requests" in error_text:
+        return "rate_limited"
+
+    unavailable_markers = (
+        "video unavailable",
+        "this video is unavailable",
+        "this video has been removed",
+        "this video is no longer available",
+        "has been removed by the uploader",
+        "account associated with this video has been terminated",
+        "http error 404",
+        "http error 410",
+        "does not exist",
+    )
+    if any(marker in error_text for marker in unavailable_markers):
+        return "unavailable"
 
-    return "; ".join(pairs)
+    return None
 
 
-def _download_url_to_file(file_url: str, output_path: Path, cookie_header: str = "") -> bool:
+def _cookies_header_from_file(cookies_path: Optional[Path]) -> str:
     """
-    URL'dan fayl yuklab olish (urllib).
+    Netscape cookie file'dan Cookie header tayyorlash (cookie store keshi orqali).
     """
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Referer": "https://www.instagram.com/",
-    }
-    if cookie_header:
-        headers["Cookie"] = cookie_header
+    if not cookies_path or not cookies_path.exists():
+        return ""
+    return cookie_store.header(cookies_path, "instagram.com")
 
-    req = request.Request(file_url, headers=headers)
-    with request.urlopen(req, timeout=45) as resp:
-        data = resp.read()
-        if not data:
-            return False
-        output_path.write_bytes(data)
-    return output_path.exists() and output_path.stat().st_size > 0
+
+_INSTAGRAM_HEADERS = {
+    "Referer": "https://www.instagram.com/",
+    "Accept-Language": "en-US,en;q=0.9",
+}
 
 
 def _extract_instagram_meta_media(html_text: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
@@ -292,19 +265,12 @@ async def _instagram_meta_fallback(url: str, temp_dir: str, cookies_path: Option
     try:
         cookie_header = _cookies_header_from_file(cookies_path)
 
-        def _fetch_page() -> str:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Referer": "https://www.instagram.com/",
-                "Accept-Language": "en-US,en;q=0.9",
-            }
-            if cookie_header:
-                headers["Cookie"] = cookie_header
-            req = request.Request(url, headers=headers)
-            with request.urlopen(req, timeout=45) as resp:
-                return resp.read().decode("utf-8", errors="ignore")
+        headers = dict(_INSTAGRAM_HEADERS)
+        if cookie_header:
+            headers["Cookie"] = cookie_header
 
-        page_html = await asyncio.to_thread(_fetch_page)
+        # og: teglar <head> ichida - sahifaning qolgan qismi o'qilmaydi
+        page_html = await http_client.fetch_html_head(url, headers=headers)
         media_url, media_type, title = _extract_instagram_meta_media(page_html)
 
         if not media_url or not media_type:
@@ -322,7 +288,9 @@ async def _instagram_meta_fallback(url: str, temp_dir: str, cookies_path: Option
             filename = f"instagram_fallback{ext}"
 
         media_path = Path(temp_dir) / filename
-        ok = await asyncio.to_thread(_download_url_to_file, media_url, media_path, cookie_header)
+        ok = await http_client.download_to_file(
+            media_url, media_path, headers=headers, max_bytes=_upload_budget_bytes()
+        )
         if not ok:
             return None
 
@@ -339,126 +307,873 @@ async def _instagram_meta_fallback(url: str, temp_dir: str, cookies_path: Option
         return None
 
 
-def detect_platform(url: str) -> Optional[str]:
+async def normalize_tiktok_url(url: str) -> str:
     """
-    URL dan platformani aniqlash
+    TikTok URL'ni normalize qilish - kuzatuv parametrlarini olib tashlash
+    
+    Qisqa linklar (vm.tiktok.com, vt.tiktok.com) handler'da resolve_short_link orqali
+    oldindan aniqlanadi; aniqlanmagan bo'lsa yt-dlp redirect'ni o'zi kuzatadi.
     
     Args:
-        url: Media URL
+        url: TikTok URL
     
     Returns:
-        Platform nomi yoki None
+        Normalize qilingan URL
     """
     url = url.strip()
     
-    for platform, patterns in PLATFORM_PATTERNS.items():
-        for pattern in patterns:
-            if re.search(pattern, url, re.IGNORECASE):
-                return platform
+    # www.tiktok.com/@username/video/1234567890?_r=1&_t=... -> parametrlarsiz
+    info = classify_url(url)
+    if info is not None and info.platform == 'tiktok' and info.kind == 'video':
+        return strip_tracking_params(url)
     
-    return None
+    # Boshqa formatlar (qisqa link va h.k.) - asl URL
+    return url
+
 
+def _upload_budget_bytes() -> int:
+    """Telegram'ga yuboriladigan fayl hajmi limiti (bytes)"""
+    return config.bot.media_upload_limit_mb * 1024 * 1024
 
-def is_valid_url(url: str) -> bool:
+
+def _estimate_format_size(fmt: Dict, duration: Optional[float]) -> Optional[int]:
     """
-    URL to'g'ri ekanligini tekshirish
-    
-    Args:
-        url: URL
-    
+    Format hajmini taxmin qilish: filesize, filesize_approx yoki bitrate * davomiylik.
+
     Returns:
-        True agar to'g'ri bo'lsa
-    """
-    url_pattern = re.compile(
-        r'^https?://'  # http:// or https://
-        r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # domain...
-        r'localhost|'  # localhost...
-        r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
-        r'(?::\d+)?'  # optional port
-        r'(?:/?|[/?]\S+)$', re.IGNORECASE
-    )
-    return bool(url_pattern.match(url))
+        Hajm (bytes) yoki None (noma'lum)
+    """
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return int(size)
+    tbr = fmt.get('tbr')
+    if tbr and duration:
+        return int(tbr * 1000 / 8 * duration)
+    return None
 
 
-async def normalize_tiktok_url(url: str) -> str:
+def _estimate_download_size(info: Dict, format_spec: Optional[str]) -> Optional[int]:
     """
-    TikTok URL'ni normalize qilish - redirect muammosini hal qilish
-    
-    Args:
-        url: TikTok URL
-    
+    Yuklab olinadigan hajmni probe natijasidan taxmin qilish (ishchi papka joyini tanlash uchun).
+    Tanlov format ID'lari bilan berilgan bo'lsa (masalan '137+140') - ular yig'indisi,
+    aks holda barcha formatlarning eng kattasi (yuqori chegara).
+
     Returns:
-        Normalize qilingan URL
+        Hajm (bytes) yoki None (biror format hajmi noma'lum)
     """
-    url = url.strip()
-    
-    # Agar vm.tiktok.com yoki vt.tiktok.com bo'lsa, to'g'ridan-to'g'ri ishlatish
-    # yt-dlp o'zi redirect'ni kuzatadi, lekin ba'zida muammo bo'ladi
-    # Shuning uchun URL'ni to'g'ri formatga o'tkazamiz
-    
-    # vm.tiktok.com/ZSNYW7Dd2 formatini saqlab qolish
-    if re.match(r'https?://(?:vm|vt)\.tiktok\.com/[a-zA-Z0-9]+', url, re.IGNORECASE):
-        # Bu format to'g'ri, yt-dlp buni qo'llab-quvvatlaydi
-        return url
-    
-    # www.tiktok.com/@username/video/1234567890 formatini tekshirish
-    video_match = re.search(r'tiktok\.com/@([^/]+)/video/(\d+)', url, re.IGNORECASE)
-    if video_match:
-        # Bu format ham to'g'ri
-        return url
-    
-    # Agar boshqa format bo'lsa, asl URL'ni qaytarish
-    return url
+    formats = info.get('formats') or []
+    by_id = {f.get('format_id'): f for f in formats}
+    first_choice = (format_spec or '').split('/')[0]
+    ids = first_choice.split('+') if first_choice else []
+    if ids and all(format_id in by_id for format_id in ids):
+        candidates, combine = [by_id[format_id] for format_id in ids], sum
+    else:
+        candidates, combine = formats, max
+    sizes = [_estimate_format_size(f, info.get('duration')) for f in candidates]
+    if not sizes or not all(sizes):
+        return None
+    return combine(sizes)
 
 
-def _youtube_pick_format_from_list(formats: list) -> Optional[str]:
+def _admit_media_info(info: Dict) -> None:
+    """
+    Yuklab olishdan oldin metadata bo'yicha tekshiruv (jonli efir va davomiylik).
+
+    Raises:
+        MediaDownloadError: Media limitlarga mos kelmasa (is_live, too_long)
+    """
+    if info.get('is_live') or info.get('live_status') in ('is_live', 'is_upcoming'):
+        raise MediaDownloadError("Jonli efirni yuklab bo'lmaydi", "is_live")
+
+    duration = info.get('duration')
+    max_duration = config.bot.media_max_duration
+    if max_duration and duration and duration > max_duration:
+        raise MediaDownloadError(f"Media juda uzun: {int(duration)}s (limit: {max_duration}s)", "too_long")
+
+
+def _youtube_pick_format_from_list(
+    formats: list,
+    can_merge: bool = True,
+    duration: Optional[float] = None,
+    max_bytes: Optional[int] = None,
+) -> Optional[str]:
     """
     YouTube info['formats'] ro'yxatidan yuklab olish uchun format selector qurish.
-    Birgalikda (video+audio) formatlar ustun, keyin video+audio id lar birlashtiriladi.
+    FFmpeg bo'lsa eng yaxshi video+audio birlashtiriladi, aks holda birgalikda (video+audio)
+    formatlar ustun. Natija '/' bilan ajratilgan zaxira variantlar zanjiri.
+    max_bytes berilsa, taxminiy hajmi limitdan oshadigan variantlar tashlab yuboriladi
+    (hajmi noma'lum formatlar qoldiriladi).
     """
     if not formats:
         return None
-    # Birgalikda formatlar (bitta faylda video+audio)
-    combined = [
+    # Storyboard (mhtml) va URL'siz formatlarni olib tashlash
+    formats = [
         f for f in formats
-        if f.get('vcodec') and f.get('vcodec') != 'none'
-        and f.get('acodec') and f.get('acodec') != 'none'
+        if f.get('format_id') and f.get('ext') != 'mhtml'
+        and (f.get('url') or f.get('fragments') or f.get('manifest_url'))
     ]
-    if combined:
-        combined.sort(key=lambda x: (x.get('height') or 0, x.get('tbr') or 0), reverse=True)
-        return '/'.join(f['format_id'] for f in combined)
-    # Alohida video va audio — eng yaxshi video + eng yaxshi audio
-    videos = [f for f in formats if f.get('vcodec') and f.get('vcodec') != 'none' and (not f.get('acodec') or f.get('acodec') == 'none')]
-    audios = [f for f in formats if f.get('acodec') and f.get('acodec') != 'none']
-    if videos and audios:
-        videos.sort(key=lambda x: (x.get('height') or 0, x.get('tbr') or 0), reverse=True)
-        audios.sort(key=lambda x: (x.get('tbr') or 0, x.get('abr') or 0), reverse=True)
-        return f"{videos[0]['format_id']}+{audios[0]['format_id']}"
+    if not formats:
+        return None
+
+    def has_video(f: Dict) -> bool:
+        return bool(f.get('vcodec')) and f.get('vcodec') != 'none'
+
+    def has_audio(f: Dict) -> bool:
+        return bool(f.get('acodec')) and f.get('acodec') != 'none'
+
+    def size_of(f: Dict) -> int:
+        return _estimate_format_size(f, duration) or 0
+
+    def fits(size: int) -> bool:
+        return not max_bytes or size <= max_bytes
+
+    # Birgalikda formatlar (bitta faylda video+audio)
+    combined = [f for f in formats if has_video(f) and has_audio(f) and fits(size_of(f))]
+    combined.sort(key=lambda x: (x.get('height') or 0, x.get('ext') == 'mp4', x.get('tbr') or 0), reverse=True)
+    # Alohida video va audio
+    videos = [f for f in formats if has_video(f) and not has_audio(f) and fits(size_of(f))]
+    videos.sort(key=lambda x: (x.get('height') or 0, x.get('ext') == 'mp4', x.get('tbr') or 0), reverse=True)
+    audios = [f for f in formats if has_audio(f) and not has_video(f) and fits(size_of(f))]
+    audios.sort(key=lambda x: (x.get('ext') == 'm4a', x.get('abr') or x.get('tbr') or 0), reverse=True)
+
+    chain = []
+    if can_merge and videos and audios:
+        # Limitga sig'adigan eng yaxshi video+audio juftligi
+        pair = next(
+            (
+                (v, a) for v in videos for a in audios
+                if fits(size_of(v) + size_of(a))
+            ),
+            None,
+        )
+        if pair:
+            chain.append(f"{pair[0]['format_id']}+{pair[1]['format_id']}")
+    chain.extend(f['format_id'] for f in combined)
     # Faqat audio yoki faqat video
-    if formats:
-        return '/'.join(f.get('format_id') for f in formats if f.get('format_id'))
-    return None
+    if not chain:
+        chain.extend(f['format_id'] for f in audios + videos)
+    return '/'.join(chain) if chain else None
+
+
+def _with_size_limit(format_spec: str, max_bytes: int) -> str:
+    """
+    Format selector'ning har bir variantiga hajm filtrini qo'shish
+    (hajmi noma'lum formatlar '?' tufayli o'tkaziladi).
+    """
+    size_filter = f"[filesize<=?{max_bytes}][filesize_approx<=?{max_bytes}]"
+    return '/'.join(f"{alternative}{size_filter}" for alternative in format_spec.split('/'))
+
+
+# audio_only uchun format - Telegram audio sifatida qabul qiladigan konteynerlar (webm/opus video deb aniqlanadi)
+AUDIO_ONLY_FORMAT = 'bestaudio[ext=m4a]/bestaudio[ext=mp3]'
+
+
+# Ko'p elementli postlar (karusel, slayd-shou, story to'plami) albom sifatida yuboriladi
+ALBUM_PLATFORMS = ('instagram', 'tiktok', 'twitter', 'facebook')
+ALBUM_MAX_ITEMS = 20
+ALBUM_PARALLEL_DOWNLOADS = 4
+# Albom elementi kengaytmasi -> Telegram media turi
+ALBUM_ITEM_TYPES = {
+    '.mp4': 'video', '.mov': 'video', '.webm': 'video', '.mkv': 'video',
+    '.jpg': 'photo', '.jpeg': 'photo', '.png': 'photo', '.webp': 'photo',
+}
+
+
+# aria2c - progressive (bitta fayl) yuklab olishni bir nechta HTTP Range ulanishlariga bo'ladi
+ARIA2C_PATH = shutil.which('aria2c')
+
+
+def _parallel_download_options(connections: int) -> Dict:
+    """
+    Parallel yuklab olish uchun yt-dlp sozlamalari
+
+    HLS/DASH fragmentlari yt-dlp'ning o'zida parallel yuklanadi (concurrent_fragment_downloads).
+    Oddiy https fayllar aria2c o'rnatilgan bo'lsa qismlab yuklanadi (-x/-s ulanishlar),
+    aks holda bitta ulanish.
+
+    Args:
+        connections: Ishga ajratilgan ulanishlar soni
+
+    Returns:
+        ydl_opts'ga qo'shiladigan sozlamalar
+    """
+    connections = max(1, connections)
+    options = {
+        'concurrent_fragment_downloads': connections,
+        'external_downloader': None,
+        'external_downloader_args': None,
+    }
+    if connections > 1 and ARIA2C_PATH:
+        # Faqat progressive fayllar ('http' - http va https). Hajm limiti max_filesize orqali
+        # yuklashdan oldin tekshiriladi - aria2c progress hook'larini yuklash davomida chaqirmaydi
+        options['external_downloader'] = {'http': 'aria2c'}
+        options['external_downloader_args'] = {
+            'aria2c': ['-x', str(connections), '-s', str(connections), '-j', str(connections), '-k', '1M'],
+        }
+    return options
+
+
+def _ydl_extract(ydl_opts: Dict, url: str, download: bool = True) -> Optional[Dict]:
+    """
+    Pool'dagi warm YoutubeDL orqali extract_info (sinxron, thread ichida chaqiriladi)
+    """
+    with ydl_pool.acquire(ydl_opts) as ydl:
+        return ydl.extract_info(url, download=download)
+
+
+def _download_album_entry(ydl_opts: Dict, entry: Dict) -> None:
+    """Albomning bitta elementini yuklab olish (sinxron, thread ichida chaqiriladi)"""
+    with ydl_pool.acquire(ydl_opts) as ydl:
+        ydl.process_ie_result(dict(entry), download=True)
+
+
+async def _download_album(info: Dict, ydl_opts: Dict, temp_dir: str, platform: str) -> Optional[Dict]:
+    """
+    Albom elementlarini parallel yuklab olish
+
+    Returns:
+        Media ma'lumotlari dict: 'album' - elementlar ro'yxati [{file_path, type, duration}],
+        'file_path' - birinchi element (ishchi papka egaligi uchun). Bitta element bo'lsa oddiy natija.
+    """
+    entries = [entry for entry in (info.get('entries') or []) if entry][:ALBUM_MAX_ITEMS]
+    if not entries:
+        return None
+    semaphore = asyncio.Semaphore(ALBUM_PARALLEL_DOWNLOADS)
+    entry_connections = max(1, ydl_opts.get('concurrent_fragment_downloads', 1) // ALBUM_PARALLEL_DOWNLOADS)
+
+    async def _fetch(index: int, entry: Dict) -> Optional[Dict]:
+        prefix = f"album_{index:02d}"
+        entry_opts = {
+            **ydl_opts,
+            # Elementlar o'zi parallel - ishga ajratilgan ulanishlar ular orasida bo'linadi
+            **_parallel_download_options(entry_connections),
+            'outtmpl': str(Path(temp_dir) / f'{prefix}.%(ext)s'),
+            'writethumbnail': False,
+        }
+        async with semaphore:
+            try:
+                await asyncio.wait_for(
+                    asyncio.to_thread(_download_album_entry, entry_opts, entry),
+                    timeout=300.0
+                )
+            except WorkspaceQuotaError:
+                raise
+            except Exception as e:
+                logger.warning(f"Albom elementi yuklab olinmadi ({index + 1}/{len(entries)}): {e}")
+                return None
+        files = [
+            f for f in Path(temp_dir).glob(f'{prefix}.*')
+            if f.is_file() and f.stat().st_size > 0 and f.suffix.lower() in ALBUM_ITEM_TYPES
+        ]
+        if not files:
+            return None
+        return {
+            'file_path': str(files[0]),
+            'type': ALBUM_ITEM_TYPES[files[0].suffix.lower()],
+            'duration': entry.get('duration'),
+        }
+
+    items = [item for item in await asyncio.gather(*(_fetch(i, e) for i, e in enumerate(entries))) if item]
+    if not items:
+        return None
+    logger.info(f"Albom yuklab olindi: {len(items)}/{len(entries)} ta element")
+
+    result = {
+        'file_path': items[0]['file_path'],
+        'title': info.get('title') or entries[0].get('title') or 'Media',
+        'duration': items[0]['duration'] if len(items) == 1 else None,
+        'thumbnail_path': None,
+        'platform': platform,
+        'audio_path': None,
+    }
+    if len(items) > 1:
+        result['album'] = items
+    return result
+
+
+def _probe_and_download(
+    url: str,
+    ydl_opts: Dict,
+    platform: str,
+    media_preference: str = 'video_audio',
+    workspace: Optional[Workspace] = None,
+) -> Optional[Dict]:
+    """
+    Probe-first yuklab olish (sinxron, thread ichida chaqiriladi).
+    Bitta metadata so'rovi (download=False, process=False), metadata bo'yicha tekshiruv
+    (jonli efir, davomiylik, hajm), formatni lokal tanlash, keyin aynan bitta yuklab olish.
+    audio_only uchun faqat audio formati yuklanadi (bo'lmasa video - audio keyin lokal ajratiladi).
+    workspace berilsa, fayllar uning joriy papkasiga yoziladi - tanlangan format kichik bo'lsa
+    papka yuklab olishdan oldin tmpfs'ga ko'chiriladi.
+
+    Returns:
+        yt-dlp info dict yoki None
+
+    Raises:
+        MediaDownloadError: Media limitlarga mos kelmasa (is_live, too_long, too_large)
+    """
+    with ydl_pool.acquire(ydl_opts) as ydl:
+        if workspace is not None:
+            # Oldingi urinishda papka ko'chirilgan bo'lishi mumkin - ydl_opts nusxalaridagi yo'l eskirgan
+            set_ydl_output_dir(ydl, workspace.path)
+        info = ydl.extract_info(url, download=False, process=False)
+        if not info:
+            return None
+
+        if info.get('_type') == 'playlist' and platform in ALBUM_PLATFORMS:
+            # Albom (karusel, story to'plami) - elementlar metadata'si olinadi,
+            # yuklab olish _download_album'da parallel bajariladi
+            album = ydl.process_ie_result(info, download=False)
+            if album:
+                album['_album_pending'] = True
+            return album
+
+        if info.get('_type', 'video') != 'video' or not info.get('formats'):
+            # Redirect, playlist yoki formatlarsiz natija - yt-dlp o'zi hal qiladi
+            return ydl.process_ie_result(info, download=True)
+
+        _admit_media_info(info)
+        max_bytes = _upload_budget_bytes()
+        duration = info.get('duration')
+
+        if media_preference == 'audio_only':
+            fallback = 'b' if platform == 'youtube' else ydl.params.get('format') or 'best'
+            fmt = _with_size_limit(f"{AUDIO_ONLY_FORMAT}/{fallback}", max_bytes)
+            logger.info(f"Faqat audio formati so'raldi: {url}")
+            set_ydl_format(ydl, fmt)
+        elif platform == 'youtube':
+            can_merge = bool(shutil.which('ffmpeg'))
+            fmt = _youtube_pick_format_from_list(info['formats'], can_merge, duration, max_bytes)
+            if not fmt and _youtube_pick_format_from_list(info['formats'], can_merge, duration):
+                raise MediaDownloadError("Barcha formatlar yuborish limitidan katta", "too_large")
+            if fmt:
+                logger.info(f"YouTube format lokal tanlandi: {fmt.split('/')[0]}")
+                set_ydl_format(ydl, fmt)
+        else:
+            sizes = [_estimate_format_size(f, duration) for f in info['formats']]
+            if sizes and all(size and size > max_bytes for size in sizes):
+                raise MediaDownloadError("Barcha formatlar yuborish limitidan katta", "too_large")
+            fmt = ydl.params.get('format')
+            if fmt:
+                set_ydl_format(ydl, _with_size_limit(fmt, max_bytes))
+
+        # Hajm endi ma'lum - kichik media tmpfs'da yuklanadi (papka hali bo'sh)
+        if workspace is not None and workspace_manager.relocate(
+            workspace, _estimate_download_size(info, ydl.params.get('format'))
+        ):
+            set_ydl_output_dir(ydl, workspace.path)
+        return ydl.process_ie_result(info, download=True)
+
+
+# Telegram audio sifatida yaxshi qabul qiladigan kodeklar: kodek -> (kengaytma, ffmpeg argumentlari)
+_AUDIO_COPY_CODECS = {
+    'aac': ('.m4a', ['-c:a', 'copy']),
+    'mp3': ('.mp3', ['-c:a', 'copy']),
+}
+_AUDIO_TRANSCODE = ('.m4a', ['-c:a', 'aac', '-b:a', '192k'])
 
 
-async def download_media(url: str, platform: str) -> Optional[Dict]:
+async def _run_ffmpeg_tool(args: list, timeout: float) -> Tuple[int, str]:
+    """
+    ffmpeg/ffprobe'ni subprocess sifatida ishga tushirish
+
+    Returns:
+        (return code, stdout matni)
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise
+    if proc.returncode != 0:
+        logger.debug(f"{Path(args[0]).name} xatosi: {stderr.decode('utf-8', errors='ignore')[-500:]}")
+    return proc.returncode, stdout.decode('utf-8', errors='ignore')
+
+
+async def _extract_audio_from_video(video_path: Path) -> Optional[Path]:
+    """
+    Yuklab olingan video fayldan audio trekni ffmpeg orqali ajratib olish.
+    AAC/MP3 bo'lsa qayta kodlamasdan (remux), aks holda AAC'ga o'giriladi.
+
+    Args:
+        video_path: Video fayl yo'li
+
+    Returns:
+        Audio fayl yo'li yoki None (audio stream yo'q, ffmpeg yo'q yoki xatolik)
+    """
+    ffmpeg_path = shutil.which('ffmpeg')
+    if not ffmpeg_path:
+        logger.debug("ffmpeg topilmadi - audio lokal ajratilmaydi")
+        return None
+
+    try:
+        codec = None
+        ffprobe_path = shutil.which('ffprobe')
+        if ffprobe_path:
+            returncode, output = await _run_ffmpeg_tool([
+                ffprobe_path, '-v', 'error',
+                '-select_streams', 'a:0',
+                '-show_entries', 'stream=codec_name',
+                '-of', 'default=noprint_wrappers=1:nokey=1',
+                str(video_path),
+            ], timeout=30.0)
+            codec = output.strip().lower() if returncode == 0 else None
+            if returncode == 0 and not codec:
+                logger.info(f"Videoda audio stream yo'q: {video_path.name}")
+                return None
+
+        # Avval remux (tez, sifat yo'qotilmaydi), bo'lmasa qayta kodlash
+        attempts = [_AUDIO_TRANSCODE]
+        if codec in _AUDIO_COPY_CODECS:
+            attempts.insert(0, _AUDIO_COPY_CODECS[codec])
+
+        for ext, codec_args in attempts:
+            audio_path = video_path.with_name(f"{video_path.stem}_audio{ext}")
+            returncode, _ = await _run_ffmpeg_tool([
+                ffmpeg_path, '-y', '-v', 'error',
+                '-i', str(video_path),
+                '-map', '0:a:0', '-vn',
+                *codec_args,
+                str(audio_path),
+            ], timeout=120.0)
+            if returncode == 0 and audio_path.exists() and audio_path.stat().st_size > 0:
+                return audio_path
+            if audio_path.exists():
+                audio_path.unlink()
+        return None
+    except asyncio.TimeoutError:
+        logger.warning(f"Audio ajratish timeout: {video_path.name}")
+        return None
+    except Exception as e:
+        logger.warning(f"Audio ajratishda xatolik: {e}")
+        return None
+
+
+class _DownloadJob:
+    """Navbatdagi bitta yuklab olish ishi"""
+    __slots__ = ('platform', 'user_id', 'lane', 'seq', 'granted')
+
+    def __init__(self, platform: str, user_id: Optional[int], lane: str, seq: int):
+        self.platform = platform
+        self.user_id = user_id
+        self.lane = lane
+        self.seq = seq
+        self.granted = asyncio.Event()
+
+
+class DownloadScheduler:
+    """
+    Yuklab olish navbati - bir vaqtda ishlaydigan yt-dlp jarayonlarini cheklash
+
+    - Umumiy va platforma bo'yicha limitlar
+    - Foydalanuvchilar o'rtasida adolatli navbat (kam ishlayotgan foydalanuvchi birinchi)
+    - Tezkor navbat (fast lane) - qisqa kliplar uzun YouTube yuklab olishlar ortida kutmaydi
+    """
+
+    def __init__(self, max_concurrent: int = 4, fast_lane_slots: int = 2, platform_limits: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            max_concurrent: Oddiy navbat uchun umumiy limit
+            fast_lane_slots: Faqat tezkor navbat ishlata oladigan qo'shimcha joylar
+            platform_limits: Platforma bo'yicha limitlar (masalan, {'youtube': 2})
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.fast_lane_slots = max(0, fast_lane_slots)
+        self.platform_limits = platform_limits or {}
+        self._waiting: list[_DownloadJob] = []
+        self._running_total = 0
+        self._running_normal = 0
+        self._running_platform: Dict[str, int] = {}
+        self._running_user: Dict[Optional[int], int] = {}
+        self._seq = 0
+
+    def _ordered(self) -> list:
+        """Navbatdagi ishlarni tartiblash: tezkor navbat, keyin foydalanuvchi yuklamasi, keyin kelish tartibi"""
+        return sorted(
+            self._waiting,
+            key=lambda job: (job.lane != 'fast', self._running_user.get(job.user_id, 0), job.seq),
+        )
+
+    def _can_start(self, job: _DownloadJob) -> bool:
+        """Ishni hozir boshlash mumkinligini tekshirish"""
+        platform_limit = self.platform_limits.get(job.platform)
+        if platform_limit is not None and self._running_platform.get(job.platform, 0) >= platform_limit:
+            return False
+        if job.lane == 'fast':
+            return self._running_total < self.max_concurrent + self.fast_lane_slots
+        return self._running_normal < self.max_concurrent and self._running_total < self.max_concurrent + self.fast_lane_slots
+
+    def _start(self, job: _DownloadJob) -> None:
+        self._waiting.remove(job)
+        self._running_total += 1
+        if job.lane != 'fast':
+            self._running_normal += 1
+        self._running_platform[job.platform] = self._running_platform.get(job.platform, 0) + 1
+        self._running_user[job.user_id] = self._running_user.get(job.user_id, 0) + 1
+        job.granted.set()
+
+    def _release(self, job: _DownloadJob) -> None:
+        self._running_total -= 1
+        if job.lane != 'fast':
+            self._running_normal -= 1
+        self._running_platform[job.platform] -= 1
+        self._running_user[job.user_id] -= 1
+        if not self._running_user[job.user_id]:
+            del self._running_user[job.user_id]
+
+    def _dispatch(self) -> None:
+        """Bo'sh joylarga navbatdagi ishlarni joylashtirish"""
+        started = True
+        while started:
+            started = False
+            for job in self._ordered():
+                if self._can_start(job):
+                    self._start(job)
+                    started = True
+                    break
+
+    def position(self, job: _DownloadJob) -> int:
+        """Ishning navbatdagi o'rni (1 dan boshlanadi, 0 - ishlamoqda)"""
+        if job.granted.is_set():
+            return 0
+        return self._ordered().index(job) + 1
+
+    def queue_size(self) -> int:
+        """Navbatda kutayotgan ishlar soni"""
+        return len(self._waiting)
+
+    def running(self) -> int:
+        """Hozir ishlayotgan yuklab olishlar soni"""
+        return self._running_total
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        platform: str,
+        user_id: Optional[int] = None,
+        lane: str = 'normal',
+        on_position: Optional[Callable[[int], Awaitable[None]]] = None,
+    ):
+        """
+        Yuklab olish uchun joy olish (async context manager)
+
+        Args:
+            platform: Platform nomi
+            user_id: Foydalanuvchi Telegram ID (adolatli navbat uchun)
+            lane: 'fast' yoki 'normal'
+            on_position: Navbatdagi o'rin o'zgarganda chaqiriladigan callback (0 - navbat tugadi)
+        """
+        self._seq += 1
+        job = _DownloadJob(platform, user_id, lane, self._seq)
+        self._waiting.append(job)
+        self._dispatch()
+        try:
+            last_position = 0
+            while not job.granted.is_set():
+                position = self.position(job)
+                if on_position and position != last_position:
+                    last_position = position
+                    try:
+                        await on_position(position)
+                    except Exception as e:
+                        logger.debug(f"Navbat o'rnini ko'rsatishda xatolik: {e}")
+                try:
+                    await asyncio.wait_for(job.granted.wait(), timeout=3.0)
+                except asyncio.TimeoutError:
+                    pass
+            if on_position and last_position:
+                # Navbat tugadi - yuklab olish boshlandi
+                try:
+                    await on_position(0)
+                except Exception as e:
+                    logger.debug(f"Navbat o'rnini ko'rsatishda xatolik: {e}")
+            yield job
+        finally:
+            if job.granted.is_set():
+                self._release(job)
+            elif job in self._waiting:
+                self._waiting.remove(job)
+            self._dispatch()
+
+
+# Global yuklab olish navbati
+download_scheduler = DownloadScheduler(
+    max_concurrent=config.bot.download_max_concurrent,
+    fast_lane_slots=config.bot.download_fast_lane_slots,
+    platform_limits=config.bot.download_platform_limits,
+)
+
+# Qisqa kliplar platformalari - tezkor navbatga tushadi
+FAST_LANE_PLATFORMS = ('instagram', 'tiktok', 'twitter')
+
+
+def _download_lane(url: str, platform: str) -> str:
+    """URL uchun navbat turini aniqlash (fast yoki normal)"""
+    if platform in FAST_LANE_PLATFORMS:
+        return 'fast'
+    info = classify_url(url)
+    if info is not None and info.kind == 'short':
+        return 'fast'
+    return 'normal'
+
+
+# Kichik kliplar to'g'ridan-to'g'ri CDN URL orqali yuboriladi - faylni Telegram o'zi yuklab oladi
+DIRECT_URL_PLATFORMS = ('tiktok', 'instagram')
+# Hajmi noma'lum formatlar faqat shu davomiylikkacha (sekund) sinab ko'riladi
+DIRECT_URL_UNKNOWN_SIZE_MAX_DURATION = 60
+
+# Telegram URL'ni qayta-qayta rad etsa (CDN bloklagan) - platforma uchun direct yo'l vaqtincha o'chiriladi
+_direct_url_breakers = {
+    platform: CircuitBreaker(f"direct_url:{platform}", failure_threshold=3, open_seconds=600.0, max_open_seconds=3600.0)
+    for platform in DIRECT_URL_PLATFORMS
+}
+
+
+def _pick_direct_format(formats: list, duration: Optional[float], max_bytes: int) -> Optional[Tuple[Dict, Optional[int]]]:
+    """
+    Telegram URL orqali qabul qiladigan format: https, mp4, video+audio bitta faylda, hajmi limitgacha.
+    H.264 (inline ijro) va yuqori sifat ustun.
+
+    Returns:
+        (format, taxminiy hajm) yoki None
+    """
+    candidates = []
+    for f in formats or []:
+        vcodec, acodec = f.get('vcodec') or '', f.get('acodec') or ''
+        if f.get('ext') != 'mp4' or not (f.get('url') or '').startswith('https://'):
+            continue
+        if f.get('protocol', 'https') not in ('https', 'http') or vcodec == 'none' or acodec == 'none':
+            continue
+        size = _estimate_format_size(f, duration)
+        if size is None:
+            if not duration or duration > DIRECT_URL_UNKNOWN_SIZE_MAX_DURATION:
+                continue
+        elif size > max_bytes:
+            continue
+        candidates.append((f, size))
+    if not candidates:
+        return None
+    candidates.sort(
+        key=lambda c: (c[0].get('vcodec', '').startswith(('h264', 'avc')), c[0].get('height') or 0, c[1] or 0),
+        reverse=True,
+    )
+    return candidates[0]
+
+
+async def resolve_direct_media(url: str, platform: str) -> Optional[Dict]:
+    """
+    Kichik klip uchun to'g'ridan-to'g'ri media URL (yuklab olmasdan, extract_info(download=False))
+
+    Topilmasa yoki direct yo'l o'chirilgan bo'lsa None - oddiy yuklab olish ishlatiladi.
+    Natija qaytarilsa, yuborish natijasi record_direct_delivery orqali qayd etilishi shart.
+
+    Args:
+        url: Media URL
+        platform: Platform nomi
+
+    Returns:
+        {url, title, duration, file_size} yoki None
+    """
+    breaker = _direct_url_breakers.get(platform)
+    if not config.bot.direct_url_max_mb or breaker is None or not breaker.allow():
+        return None
+    result = None
+    try:
+        result = await _resolve_direct_media(url, platform)
+        return result
+    finally:
+        if result is None:
+            breaker.record_neutral()
+
+
+async def _resolve_direct_media(url: str, platform: str) -> Optional[Dict]:
+    # Platforma bloklagan yoki URL yaqinda muvaffaqiyatsiz bo'lgan - oddiy yo'l darhol javob beradi
+    if any(state != 'closed' for state in circuit_breakers.state(platform).values()) or await negative_cache.get(url):
+        return None
+
+    ydl_opts = {
+        'format': 'best[ext=mp4][vcodec!=none][acodec!=none]/best',
+        'quiet': True,
+        'no_warnings': True,
+        'noplaylist': True,
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    }
+    if platform == 'tiktok':
+        url = await normalize_tiktok_url(url)
+    elif platform == 'instagram':
+        if '/stories/' in url:
+            # Story'lar to'plam bo'lishi va login talab qilishi mumkin - oddiy yo'l
+            return None
+        instagram_cookies_path = _prepare_cookiefile_for_ydl(_resolve_instagram_cookies_path(), "instagram")
+        if instagram_cookies_path:
+            ydl_opts['cookiefile'] = str(instagram_cookies_path)
+
+    try:
+        info = await asyncio.wait_for(
+            asyncio.to_thread(_ydl_extract, ydl_opts, url, False),
+            timeout=30.0
+        )
+        if not info or info.get('_type', 'video') != 'video':
+            return None
+        _admit_media_info(info)
+    except Exception as e:
+        logger.debug(f"Direct URL aniqlanmadi ({url}): {e}")
+        return None
+
+    max_bytes = config.bot.direct_url_max_mb * 1024 * 1024
+    picked = _pick_direct_format(info.get('formats') or [info], info.get('duration'), max_bytes)
+    if not picked:
+        return None
+    fmt, size = picked
+    return {
+        'url': fmt['url'],
+        'title': info.get('title') or 'Media',
+        'duration': info.get('duration'),
+        'file_size': size,
+    }
+
+
+def record_direct_delivery(platform: str, success: Optional[bool]) -> None:
+    """
+    Direct URL orqali yuborish natijasini qayd etish
+
+    Args:
+        platform: Platform nomi
+        success: True - Telegram qabul qildi, False - rad etdi, None - boshqa sababli yuborilmadi
+    """
+    breaker = _direct_url_breakers.get(platform)
+    if breaker is None:
+        return
+    if success:
+        breaker.record_success()
+    elif success is False:
+        breaker.record_failure()
+    else:
+        breaker.record_neutral()
+
+
+async def download_media(
+    url: str,
+    platform: str,
+    user_id: Optional[int] = None,
+    on_queue_position: Optional[Callable[[int], Awaitable[None]]] = None,
+    on_progress: Optional[Callable[[Dict], None]] = None,
+    media_preference: str = 'video_audio',
+) -> Optional[Dict]:
+    """
+    Media yuklab olish - navbat (download_scheduler) orqali
+
+    Args:
+        url: Media URL
+        platform: Platform nomi
+        user_id: Foydalanuvchi Telegram ID (adolatli navbat uchun)
+        on_queue_position: Navbatdagi o'rin o'zgarganda chaqiriladigan callback
+        on_progress: yt-dlp progress callback (yuklab olish thread'idan chaqiriladi)
+        media_preference: Foydalanuvchi sozlamasi (video_audio, video_only, audio_only) -
+            audio_only'da faqat audio yuklanadi, video_only'da audio ajratilmaydi
+
+    Returns:
+        Media ma'lumotlari dict yoki None
+        Dict ichida 'error_type' kaliti bo'lishi mumkin (xatolik bo'lganda)
+    """
+    # Yaqinda muvaffaqiyatsiz bo'lgan URL (o'chirilgan video, rate limit) - yt-dlp'siz darhol javob
+    variant = preference_variant(media_preference)
+    cached_error = await negative_cache.get(url, variant)
+    if cached_error:
+        logger.info(f"Negative cache'dan ({cached_error['error_type']}): {url}")
+        return cached_error
+
+    # Platforma bloklagan bo'lsa (circuit ochiq) - navbat va yuklab olishsiz darhol rad etish
+    open_error = circuit_breakers.check(platform)
+    if open_error:
+        logger.info(f"Circuit ochiq ({platform}:{open_error}), so'rov rad etildi: {url}")
+        return {'error_type': open_error, 'error_message': "Circuit breaker ochiq"}
+
+    result = None
+    try:
+        lane = _download_lane(url, platform)
+        async with download_scheduler.slot(platform, user_id=user_id, lane=lane, on_position=on_queue_position):
+            async with connection_budget.acquire() as connections:
+                if download_workers.enabled:
+                    # Alohida worker jarayonida (GIL va xotira izolyatsiyasi)
+                    result = await download_workers.run(
+                        url, platform, on_progress=on_progress, connections=connections, media_preference=media_preference
+                    )
+                else:
+                    result = await _download_media(
+                        url, platform, on_progress=on_progress, connections=connections, media_preference=media_preference
+                    )
+        await negative_cache.record(url, result, variant)
+        return result
+    finally:
+        circuit_breakers.record(platform, result)
+
+
+async def _download_media(
+    url: str,
+    platform: str,
+    on_progress: Optional[Callable[[Dict], None]] = None,
+    connections: int = 1,
+    media_preference: str = 'video_audio',
+) -> Optional[Dict]:
     """
     Media yuklab olish (yt-dlp yoki boshqa tool orqali)
-    
+
+    Har bir ish alohida ishchi papkada bajariladi. Muvaffaqiyatsiz bo'lsa papka darhol
+    o'chiriladi, aks holda yuborilgandan keyin cleanup_temp_files orqali o'chiriladi.
+
     Args:
         url: Media URL
         platform: Platform nomi
-    
+        on_progress: yt-dlp progress callback
+        connections: Parallel ulanishlar soni (connection_budget'dan ajratilgan)
+        media_preference: Foydalanuvchi sozlamasi (video_audio, video_only, audio_only)
+
     Returns:
         Media ma'lumotlari dict yoki None
         Dict ichida 'error_type' kaliti bo'lishi mumkin (xatolik bo'lganda)
     """
+    # Hajm hali noma'lum - papka disk'da yaratiladi, probe'dan keyin kichik media uchun tmpfs'ga ko'chiriladi
+    workspace = workspace_manager.create("download")
+    result = None
+    try:
+        result = await _download_to_workspace(
+            url, platform, workspace, on_progress, connections, media_preference
+        )
+    except WorkspaceQuotaError as e:
+        logger.warning(f"Yuklab olish to'xtatildi: {e}")
+        result = {'error_type': 'too_large', 'error_message': str(e)}
+    finally:
+        if not (isinstance(result, dict) and result.get('file_path')):
+            workspace.release()
+    return result
+
+
+async def _download_to_workspace(
+    url: str,
+    platform: str,
+    workspace: Workspace,
+    on_progress: Optional[Callable[[Dict], None]] = None,
+    connections: int = 1,
+    media_preference: str = 'video_audio',
+) -> Optional[Dict]:
+    """
+    Media'ni berilgan ishchi papkaga yuklab olish (papka probe'dan keyin tmpfs'ga ko'chishi mumkin -
+    yo'l har safar workspace.path'dan olinadi)
+
+    Raises:
+        WorkspaceQuotaError: Ishchi papka hajm limitidan oshsa
+    """
     try:
         # yt-dlp ishlatish
         import yt_dlp
         
-        # Temporary directory yaratish
-        temp_dir = tempfile.mkdtemp()
-        
         try:
             # yt-dlp sozlamalari - video sifatini saqlab qolish
             # FFmpeg ishlatmasdan, faqat allaqachon birlashtirilgan formatlarni ishlatish
@@ -467,7 +1182,7 @@ async def download_media(url: str, platform: str) -> Optional[Dict]:
                 # Faqat allaqachon birlashtirilgan formatlar (video+audio birga)
                 # FFmpeg ishlatmasdan, to'g'ridan-to'g'ri yuklab olish
                 'format': 'best[ext=mp4][vcodec!=none][acodec!=none]/best[ext=mp4]/best[vcodec!=none][acodec!=none]/best',
-                'outtmpl': str(Path(temp_dir) / '%(title)s.%(ext)s'),
+                'outtmpl': str(workspace.path / '%(title)s.%(ext)s'),
                 'quiet': True,  # Production uchun quiet
                 'no_warnings': True,
                 'extract_flat': False,
@@ -478,7 +1193,7 @@ async def download_media(url: str, platform: str) -> Optional[Dict]:
             youtube_cookies_path = None
             
             # Video uchun thumbnail ham olish
-            if platform in ('youtube', 'tiktok'):
+            if platform in ('youtube', 'tiktok') and media_preference != 'audio_only':
                 ydl_opts['writethumbnail'] = True
                 ydl_opts['writesubtitles'] = False  # Subtitlarni o'chirish
                 ydl_opts['writeautomaticsub'] = False
@@ -489,7 +1204,13 @@ async def download_media(url: str, platform: str) -> Optional[Dict]:
                 'prefer_insecure': False,  # HTTPS'ni afzal ko'rish
                 'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',  # User agent
                 'extractor_args': {},  # Extractor arguments
+                # Hajmi ma'lum bo'lgan va limitdan katta fayllar yuklab olinmaydi (zaxira tekshiruv)
+                'max_filesize': _upload_budget_bytes(),
+                # Ishchi papka hajm limiti yuklab olish paytida tekshiriladi, progress foydalanuvchiga ko'rsatiladi
+                'progress_hooks': [ydl_quota_hook] + ([on_progress] if on_progress else []),
             })
+            # Parallel yuklab olish (fragmentlar va fayl qismlari)
+            ydl_opts.update(_parallel_download_options(connections))
             
             # YouTube uchun maxsus sozlamalar
             if platform == 'youtube':
@@ -499,7 +1220,7 @@ async def download_media(url: str, platform: str) -> Optional[Dict]:
                 ydl_opts['merge_output_format'] = 'mp4'
 
                 source_cookies_path = _resolve_youtube_cookies_path()
-                youtube_cookies_path = _prepare_cookiefile_for_ydl(source_cookies_path, temp_dir, "youtube")
+                youtube_cookies_path = _prepare_cookiefile_for_ydl(source_cookies_path, "youtube")
                 if youtube_cookies_path:
                     ok, msg = validate_youtube_cookies(source_cookies_path)
                     if ok:
@@ -539,7 +1260,7 @@ async def download_media(url: str, platform: str) -> Optional[Dict]:
 
                 # Instagram uchun cookies qo'shish (agar mavjud bo'lsa)
                 source_cookies_path = _resolve_instagram_cookies_path()
-                instagram_cookies_path = _prepare_cookiefile_for_ydl(source_cookies_path, temp_dir, "instagram")
+                instagram_cookies_path = _prepare_cookiefile_for_ydl(source_cookies_path, "instagram")
                 if instagram_cookies_path:
                     ydl_opts['cookiefile'] = str(instagram_cookies_path)
                     logger.info(f"Instagram cookies ishlatilmoqda: {source_cookies_path}")
@@ -568,334 +1289,276 @@ async def download_media(url: str, platform: str) -> Optional[Dict]:
                         }
                     })
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Media ma'lumotlarini olish
-                # download=True - faylni yuklab olish
-                # Timeout sozlamalari
-                info = None
-                try:
-                    # Timeout: 5 daqiqa (300 sekund)
-                    info = await asyncio.wait_for(
-                        asyncio.to_thread(ydl.extract_info, url, True),
-                        timeout=300.0
-                    )
-                except asyncio.TimeoutError:
-                    logger.error(f"Media yuklab olish timeout: {url}")
-                    return None
-                except yt_dlp.utils.DownloadError as e:
-                    error_msg = str(e).lower()
-                    logger.error(f"yt-dlp download xatosi: {e}")
-                    
-                    # TikTok uchun maxsus tekshirish
-                    if platform == 'tiktok':
-                        # IP bloklanish xatoliklarini tekshirish
-                        if 'ip address is blocked' in error_msg or ('ip address' in error_msg and 'blocked' in error_msg):
-                            logger.warning(f"TikTok IP bloklangan: {url}")
-                            logger.warning("TikTok server IP manzilni bloklagan. Bu vaqtinchalik muammo bo'lishi mumkin.")
-                            # IP bloklanish uchun retry foydasiz, darhol qaytarish
-                            # Xatolik ma'lumotlarini dict sifatida qaytarish
-                            return {'error_type': 'ip_blocked', 'error_message': str(e)}
-                        
-                        # Agar "Unsupported URL" yoki "explore" xatosi bo'lsa
-                        if 'unsupported url' in error_msg or 'explore' in error_msg:
-                            logger.warning(f"TikTok link redirect muammosi: {url}")
-                            logger.warning("TikTok link to'g'ri video emas yoki redirect noto'g'ri URL'ga olib keldi")
-                            # TikTok linkini to'g'ri formatga o'tkazishga harakat qilish
-                            # vm.tiktok.com linklarini to'g'ridan-to'g'ri ishlatish
-                            if 'vm.tiktok.com' in url.lower() or 'vt.tiktok.com' in url.lower():
-                                # Bu link to'g'ri, lekin redirect muammosi bo'lishi mumkin
-                                # yt-dlp'ning o'z extractor'ini ishlatish
-                                logger.info("TikTok link to'g'ri formatda, lekin redirect muammosi")
-                            return None
+            # Media ma'lumotlarini olish
+            # download=True - faylni yuklab olish
+            # Timeout sozlamalari
+            info = None
+            try:
+                # Timeout: 5 daqiqa (300 sekund)
+                # Probe-first: bitta metadata so'rovi, limitlar tekshiriladi, format lokal tanlanadi,
+                # keyin bitta yuklab olish
+                info = await asyncio.wait_for(
+                    asyncio.to_thread(_probe_and_download, url, ydl_opts, platform, media_preference, workspace),
+                    timeout=300.0
+                )
+            except asyncio.TimeoutError:
+                logger.error(f"Media yuklab olish timeout: {url}")
+                return None
+            except MediaDownloadError as e:
+                # Metadata tekshiruvi rad etdi - hech narsa yuklab olinmagan
+                logger.warning(f"Media qabul qilinmadi ({e.error_type}): {url} - {e.message}")
+                return {'error_type': e.error_type, 'error_message': e.message}
+            except yt_dlp.utils.DownloadError as e:
+                error_msg = str(e).lower()
+                logger.error(f"yt-dlp download xatosi: {e}")
+                
+                # TikTok uchun maxsus tekshirish
+                if platform == 'tiktok':
+                    # IP bloklanish xatoliklarini tekshirish
+                    if 'ip address is blocked' in error_msg or ('ip address' in error_msg and 'blocked' in error_msg):
+                        logger.warning(f"TikTok IP bloklangan: {url}")
+                        logger.warning("TikTok server IP manzilni bloklagan. Bu vaqtinchalik muammo bo'lishi mumkin.")
+                        # IP bloklanish uchun retry foydasiz, darhol qaytarish
+                        # Xatolik ma'lumotlarini dict sifatida qaytarish
+                        return {'error_type': 'ip_blocked', 'error_message': str(e)}
                     
-                    # Instagram story uchun maxsus tekshirish
-                    if platform == 'instagram' and ('/stories/' in url or '/story/' in url):
-                        if 'connection' in error_msg or 'ssl' in error_msg or 'certificate' in error_msg:
-                            logger.warning("Instagram story yuklab olishda tarmoq xatosi - Instagram tomonidan bloklangan bo'lishi mumkin")
-                            return None
-
-                    if platform == 'instagram':
-                        if 'no video formats found' in error_msg:
-                            logger.info("Instagram meta fallback ishga tushirildi (primary)")
-                            fallback_data = await _instagram_meta_fallback(url, temp_dir, instagram_cookies_path)
-                            if fallback_data:
-                                return fallback_data
+                    # Agar "Unsupported URL" yoki "explore" xatosi bo'lsa
+                    if 'unsupported url' in error_msg or 'explore' in error_msg:
+                        logger.warning(f"TikTok link redirect muammosi: {url}")
+                        logger.warning("TikTok link to'g'ri video emas yoki redirect noto'g'ri URL'ga olib keldi")
+                        # TikTok linkini to'g'ri formatga o'tkazishga harakat qilish
+                        # vm.tiktok.com linklarini to'g'ridan-to'g'ri ishlatish
+                        if 'vm.tiktok.com' in url.lower() or 'vt.tiktok.com' in url.lower():
+                            # Bu link to'g'ri, lekin redirect muammosi bo'lishi mumkin
+                            # yt-dlp'ning o'z extractor'ini ishlatish
+                            logger.info("TikTok link to'g'ri formatda, lekin redirect muammosi")
+                        return None
+                
+                # O'chirilgan media va rate limit - qayta urinish foydasiz
+                common_error = _classify_common_error(error_msg)
+                if common_error:
+                    return {'error_type': common_error, 'error_message': str(e)}
+                
+                # Instagram story uchun maxsus tekshirish
+                if platform == 'instagram' and ('/stories/' in url or '/story/' in url):
+                    if 'connection' in error_msg or 'ssl' in error_msg or 'certificate' in error_msg:
+                        logger.warning("Instagram story yuklab olishda tarmoq xatosi - Instagram tomonidan bloklangan bo'lishi mumkin")
+                        return None
 
-                        classified_error = _classify_instagram_error(error_msg)
+                if platform == 'instagram':
+                    if 'no video formats found' in error_msg:
+                        logger.info("Instagram meta fallback ishga tushirildi (primary)")
+                        fallback_data = await _instagram_meta_fallback(url, str(workspace.path), instagram_cookies_path)
+                        if fallback_data:
+                            return fallback_data
+
+                    classified_error = _classify_instagram_error(error_msg)
+                    if classified_error:
+                        return {'error_type': classified_error, 'error_message': str(e)}
+
+                if platform == 'youtube':
+                    classified_error = _classify_youtube_error(error_msg)
+                    if classified_error in ('blocked', 'auth_required') and youtube_cookies_path:
+                        # Bir marta faqat "web" client bilan qayta urinish (ba'zida android dan farq qiladi)
+                        logger.info("YouTube: auth xatosi — web player_client bilan qayta urinilmoqda...")
+                        auth_retry_opts = ydl_opts.copy()
+                        auth_retry_opts['extractor_args'] = {'youtube': {'player_client': ['web']}}
+                        try:
+                            info = await asyncio.wait_for(
+                                asyncio.to_thread(_probe_and_download, url, auth_retry_opts, platform, media_preference, workspace),
+                                timeout=300.0
+                            )
+                            if info:
+                                logger.info("YouTube web client bilan muvaffaqiyatli.")
+                                classified_error = None
+                        except MediaDownloadError as admission_e:
+                            return {'error_type': admission_e.error_type, 'error_message': admission_e.message}
+                        except (asyncio.TimeoutError, yt_dlp.utils.DownloadError) as auth_retry_e:
+                            logger.debug(f"YouTube web client urinishi muvaffaqiyatsiz: {auth_retry_e}")
+                    if not info:
+                        # Format probe natijasidan tanlangan - boshqa formatlar bilan qayta yuklab olish foydasiz
                         if classified_error:
                             return {'error_type': classified_error, 'error_message': str(e)}
-
-                    if platform == 'youtube':
-                        classified_error = _classify_youtube_error(error_msg)
-                        if classified_error == 'auth_required' and youtube_cookies_path:
-                            # Bir marta faqat "web" client bilan qayta urinish (ba'zida android dan farq qiladi)
-                            logger.info("YouTube: auth xatosi — web player_client bilan qayta urinilmoqda...")
-                            auth_retry_opts = ydl_opts.copy()
-                            auth_retry_opts['extractor_args'] = {'youtube': {'player_client': ['web']}}
-                            try:
-                                with yt_dlp.YoutubeDL(auth_retry_opts) as auth_ydl:
-                                    info = await asyncio.wait_for(
-                                        asyncio.to_thread(auth_ydl.extract_info, url, True),
-                                        timeout=300.0
-                                    )
-                                if info:
-                                    logger.info("YouTube web client bilan muvaffaqiyatli.")
-                                    classified_error = None
-                            except (asyncio.TimeoutError, yt_dlp.utils.DownloadError) as auth_retry_e:
-                                logger.debug(f"YouTube web client urinishi muvaffaqiyatsiz: {auth_retry_e}")
-                        if classified_error == 'auth_required':
-                            return {'error_type': classified_error, 'error_message': str(e)}
-                    
-                    # Qayta urinish - oddiy format bilan (auth_retry allaqachon info bergan bo'lsa o'tkazib yuborish)
-                    if not info:
-                        logger.info("Oddiy format bilan qayta urinilmoqda...")
-                        # Retry uchun yangi ydl_opts yaratish (SSL sozlamalarini saqlab qolish)
-                        retry_ydl_opts = ydl_opts.copy()
-                        retry_ydl_opts['format'] = 'best[ext=mp4]/best'
-                        if platform == 'instagram':
-                            retry_ydl_opts['format'] = 'best'
-                        if platform == 'youtube':
-                            retry_ydl_opts['format'] = 'best/bestaudio'
-                            retry_ydl_opts.pop('extractor_args', None)
-                        
-                        # TikTok uchun retry'da ham normalize qilish
-                        if platform == 'tiktok':
-                            retry_url = await normalize_tiktok_url(url)
-                            if retry_url != url:
-                                logger.info(f"TikTok URL retry'da normalize qilindi: {retry_url}")
-                                url = retry_url
-                        
-                        # Yangi YDL instance yaratish va retry
-                        try:
-                            with yt_dlp.YoutubeDL(retry_ydl_opts) as retry_ydl:
-                                info = await asyncio.wait_for(
-                                    asyncio.to_thread(retry_ydl.extract_info, url, True),
-                                    timeout=300.0
-                                )
-                        except asyncio.TimeoutError:
-                            logger.error(f"Media yuklab olish timeout (retry): {url}")
-                            return None
-                        except yt_dlp.utils.DownloadError as retry_e:
-                            retry_error_msg = str(retry_e).lower()
-                            logger.error(f"Retry ham muvaffaqiyatsiz: {retry_e}")
-                            
-                            # TikTok uchun maxsus xatolik xabari
-                            if platform == 'tiktok':
-                                if 'ip address is blocked' in retry_error_msg or ('ip address' in retry_error_msg and 'blocked' in retry_error_msg):
-                                    logger.warning("TikTok IP bloklangan (retry)")
-                                elif 'unsupported url' in retry_error_msg or 'explore' in retry_error_msg:
-                                    logger.warning("TikTok link to'g'ri video emas yoki TikTok tomonidan bloklangan")
-
-                            if platform == 'instagram':
-                                if 'no video formats found' in retry_error_msg:
-                                    logger.info("Instagram meta fallback ishga tushirildi (retry)")
-                                    fallback_data = await _instagram_meta_fallback(url, temp_dir, instagram_cookies_path)
-                                    if fallback_data:
-                                        return fallback_data
-
-                                classified_error = _classify_instagram_error(retry_error_msg)
-                                if classified_error:
-                                    return {'error_type': classified_error, 'error_message': str(retry_e)}
-
-                            if platform == 'youtube':
-                                if 'requested format is not available' in retry_error_msg:
-                                    logger.info("YouTube universal format fallback bilan qayta urinilmoqda...")
-                                    fallback_ydl_opts = ydl_opts.copy()
-                                    fallback_ydl_opts['format'] = '18/22/b'
-                                    fallback_ydl_opts.pop('extractor_args', None)
-                                    fallback_ydl_opts.pop('merge_output_format', None)
-                                    try:
-                                        with yt_dlp.YoutubeDL(fallback_ydl_opts) as fallback_ydl:
-                                            info = await asyncio.wait_for(
-                                                asyncio.to_thread(fallback_ydl.extract_info, url, True),
-                                                timeout=300.0
-                                            )
-                                        if info:
-                                            logger.info("YouTube universal format fallback muvaffaqiyatli.")
-                                            retry_error_msg = ""
-                                    except asyncio.TimeoutError:
-                                        logger.error(f"YouTube universal format fallback timeout: {url}")
-                                    except yt_dlp.utils.DownloadError as fallback_e:
-                                        retry_error_msg = str(fallback_e).lower()
-                                        logger.error(f"YouTube universal format fallback xatosi: {fallback_e}")
-
-                                    # Agar 18/22/b ham mavjud bo'lmasa — FFmpeg merge (bv+ba) keyin format ro'yxatidan tanlash
-                                    if not info and 'requested format is not available' in retry_error_msg:
-                                        logger.info("YouTube: bestvideo+bestaudio (FFmpeg merge) bilan urinilmoqda...")
-                                        merge_ydl_opts = ydl_opts.copy()
-                                        merge_ydl_opts['format'] = 'bestvideo+bestaudio'
-                                        merge_ydl_opts['merge_output_format'] = 'mp4'
-                                        merge_ydl_opts.pop('extractor_args', None)
-                                        try:
-                                            with yt_dlp.YoutubeDL(merge_ydl_opts) as merge_ydl:
-                                                info = await asyncio.wait_for(
-                                                    asyncio.to_thread(merge_ydl.extract_info, url, True),
-                                                    timeout=300.0
-                                                )
-                                            if info:
-                                                logger.info("YouTube bestvideo+bestaudio fallback muvaffaqiyatli.")
-                                                retry_error_msg = ""
-                                        except asyncio.TimeoutError:
-                                            logger.error(f"YouTube merge fallback timeout: {url}")
-                                        except yt_dlp.utils.DownloadError as merge_e:
-                                            logger.debug(f"YouTube merge fallback xatosi: {merge_e}")
-
-                                    # Oxirgi imkoniyat: mavjud formatlar ro'yxatidan tanlash
-                                    if not info and 'requested format is not available' in retry_error_msg:
-                                        logger.info("YouTube: mavjud formatlar ro'yxatidan tanlash...")
-                                        list_ydl_opts = ydl_opts.copy()
-                                        list_ydl_opts.pop('format', None)
-                                        list_ydl_opts.pop('merge_output_format', None)
-                                        list_ydl_opts.pop('extractor_args', None)
-                                        try:
-                                            with yt_dlp.YoutubeDL(list_ydl_opts) as list_ydl:
-                                                list_info = await asyncio.wait_for(
-                                                    asyncio.to_thread(list_ydl.extract_info, url, False),
-                                                    timeout=60.0
-                                                )
-                                            fmt_str = _youtube_pick_format_from_list(list_info.get('formats') or []) if list_info else None
-                                            if fmt_str:
-                                                last_ydl_opts = ydl_opts.copy()
-                                                last_ydl_opts['format'] = fmt_str
-                                                last_ydl_opts['merge_output_format'] = 'mp4'
-                                                last_ydl_opts.pop('extractor_args', None)
-                                                with yt_dlp.YoutubeDL(last_ydl_opts) as last_ydl:
-                                                    info = await asyncio.wait_for(
-                                                        asyncio.to_thread(last_ydl.extract_info, url, True),
-                                                        timeout=300.0
-                                                    )
-                                                if info:
-                                                    logger.info("YouTube format ro'yxatidan tanlash muvaffaqiyatli.")
-                                                    retry_error_msg = ""
-                                            else:
-                                                logger.warning("YouTube: mavjud format topilmadi (formats bo'sh).")
-                                        except asyncio.TimeoutError:
-                                            logger.error(f"YouTube format list timeout: {url}")
-                                        except yt_dlp.utils.DownloadError as list_e:
-                                            logger.error(f"YouTube format list xatosi: {list_e}")
-
-                                if info:
-                                    pass
-                                else:
-                                    classified_error = _classify_youtube_error(retry_error_msg)
-                                    if classified_error:
-                                        return {'error_type': classified_error, 'error_message': str(retry_e)}
-                        
                         return None
                 
+                # Qayta urinish - oddiy format bilan (auth_retry allaqachon info bergan bo'lsa o'tkazib yuborish)
                 if not info:
-                    return None
-                
-                # Download qilingan fayl topish (thumbnail va subtitlarni olib tashlash)
-                all_files = list(Path(temp_dir).glob('*'))
-                # Thumbnail, subtitl va boshqa yordamchi fayllarni olib tashlash
-                excluded_suffixes = {'.vtt', '.srt', '.ass', '.description'}
-                if platform != 'instagram':
-                    excluded_suffixes.update({'.jpg', '.webp', '.png', '.jpeg'})
-
-                media_files = [
-                    f for f in all_files 
-                    if f.is_file() 
-                    and f.stat().st_size > 0  # Bo'sh fayllarni olib tashlash
-                    and f.suffix.lower() not in excluded_suffixes
-                ]
-                
-                if not media_files:
-                    logger.error(f"Media fayl topilmadi. Temp dir: {temp_dir}, Files: {[f.name for f in all_files]}")
-                    return None
-                
-                media_file = media_files[0]
-                
-                # Fayl hajmini tekshirish
-                file_size = media_file.stat().st_size
-                if file_size == 0:
-                    logger.error(f"Media fayl bo'sh: {media_file}")
-                    return None
-                
-                logger.info(f"Media fayl topildi: {media_file.name}, hajmi: {file_size / 1024 / 1024:.2f} MB")
-                
-                # Video yoki audio ekanligini aniqlash
-                file_ext = media_file.suffix.lower()
-                is_video = file_ext in ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv')
-                
-                result = {
-                    'file_path': str(media_file),
-                    'title': info.get('title', 'Media'),
-                    'duration': info.get('duration'),
-                    'thumbnail_path': None,
-                    'platform': platform,
-                    'audio_path': None,  # Audio fayl yo'li (agar mavjud bo'lsa)
-                }
-                
-                # Thumbnail topish
-                thumbnail_files = list(Path(temp_dir).glob('*.jpg')) + list(Path(temp_dir).glob('*.webp'))
-                if thumbnail_files:
-                    result['thumbnail_path'] = str(thumbnail_files[0])
-                
-                # Agar video bo'lsa, audio formatini ham yuklab olish
-                if is_video and platform in ('youtube', 'instagram', 'tiktok'):
+                    logger.info("Oddiy format bilan qayta urinilmoqda...")
+                    # Retry uchun yangi ydl_opts yaratish (SSL sozlamalarini saqlab qolish)
+                    retry_ydl_opts = ydl_opts.copy()
+                    retry_ydl_opts['format'] = 'best[ext=mp4]/best'
+                    if platform == 'instagram':
+                        retry_ydl_opts['format'] = 'best'
+                    retry_ydl_opts['format'] = _with_size_limit(retry_ydl_opts['format'], _upload_budget_bytes())
+                    retry_ydl_opts['outtmpl'] = str(workspace.path / '%(title)s.%(ext)s')
+                    
+                    # TikTok uchun retry'da ham normalize qilish
+                    if platform == 'tiktok':
+                        retry_url = await normalize_tiktok_url(url)
+                        if retry_url != url:
+                            logger.info(f"TikTok URL retry'da normalize qilindi: {retry_url}")
+                            url = retry_url
+                    
+                    # Yangi YDL instance yaratish va retry
                     try:
-                        # Audio formatini yuklab olish
-                        audio_ydl_opts = {
-                            'format': 'bestaudio[ext=m4a]/bestaudio[ext=mp3]/bestaudio',
-                            'outtmpl': str(Path(temp_dir) / '%(title)s_audio.%(ext)s'),
-                            'quiet': True,
-                            'no_warnings': True,
-                            'extract_flat': False,
-                            'noplaylist': True,
-                        }
+                        info = await asyncio.wait_for(
+                            asyncio.to_thread(_ydl_extract, retry_ydl_opts, url),
+                            timeout=300.0
+                        )
+                    except asyncio.TimeoutError:
+                        logger.error(f"Media yuklab olish timeout (retry): {url}")
+                        return None
+                    except yt_dlp.utils.DownloadError as retry_e:
+                        retry_error_msg = str(retry_e).lower()
+                        logger.error(f"Retry ham muvaffaqiyatsiz: {retry_e}")
                         
-                        # Instagram/YouTube uchun cookies
-                        if platform in ('instagram', 'youtube'):
-                            if platform == 'instagram':
-                                cookies_path = instagram_cookies_path
-                            else:
-                                cookies_path = youtube_cookies_path
-                            if cookies_path:
-                                audio_ydl_opts['cookiefile'] = str(cookies_path)
-
-                        # Instagram uchun SSL sozlamalari
+                        # TikTok uchun maxsus xatolik xabari
+                        if platform == 'tiktok':
+                            if 'ip address is blocked' in retry_error_msg or ('ip address' in retry_error_msg and 'blocked' in retry_error_msg):
+                                logger.warning("TikTok IP bloklangan (retry)")
+                            elif 'unsupported url' in retry_error_msg or 'explore' in retry_error_msg:
+                                logger.warning("TikTok link to'g'ri video emas yoki TikTok tomonidan bloklangan")
+
+                        if platform == 'instagram':
+                            if 'no video formats found' in retry_error_msg:
+                                logger.info("Instagram meta fallback ishga tushirildi (retry)")
+                                fallback_data = await _instagram_meta_fallback(url, str(workspace.path), instagram_cookies_path)
+                                if fallback_data:
+                                    return fallback_data
+
+                            classified_error = _classify_instagram_error(retry_error_msg)
+                            if classified_error:
+                                return {'error_type': classified_error, 'error_message': str(retry_e)}
+
+                        return None
+            
+            if not info:
+                return None
+            
+            if info.get('_album_pending'):
+                return await _download_album(info, ydl_opts, str(workspace.path), platform)
+            
+            # Download qilingan fayl topish (thumbnail va subtitlarni olib tashlash)
+            all_files = list(workspace.path.glob('*'))
+            # Thumbnail, subtitl va boshqa yordamchi fayllarni olib tashlash
+            excluded_suffixes = {'.vtt', '.srt', '.ass', '.description'}
+            if platform != 'instagram':
+                excluded_suffixes.update({'.jpg', '.webp', '.png', '.jpeg'})
+
+            media_files = [
+                f for f in all_files 
+                if f.is_file() 
+                and f.stat().st_size > 0  # Bo'sh fayllarni olib tashlash
+                and f.suffix.lower() not in excluded_suffixes
+            ]
+            
+            if not media_files:
+                logger.error(f"Media fayl topilmadi. Temp dir: {workspace.path}, Files: {[f.name for f in all_files]}")
+                return None
+            
+            media_file = media_files[0]
+            
+            # Fayl hajmini tekshirish
+            file_size = media_file.stat().st_size
+            if file_size == 0:
+                logger.error(f"Media fayl bo'sh: {media_file}")
+                return None
+            
+            logger.info(f"Media fayl topildi: {media_file.name}, hajmi: {file_size / 1024 / 1024:.2f} MB")
+            
+            # Video yoki audio ekanligini aniqlash
+            file_ext = media_file.suffix.lower()
+            is_video = file_ext in ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv')
+            
+            result = {
+                'file_path': str(media_file),
+                'title': info.get('title', 'Media'),
+                'duration': info.get('duration'),
+                'thumbnail_path': None,
+                'platform': platform,
+                'audio_path': None,  # Audio fayl yo'li (agar mavjud bo'lsa)
+            }
+            
+            # Thumbnail topish
+            thumbnail_files = list(workspace.path.glob('*.jpg')) + list(workspace.path.glob('*.webp'))
+            if thumbnail_files:
+                result['thumbnail_path'] = str(thumbnail_files[0])
+            
+            # video_only - audio yuborilmaydi, ajratish va alohida yuklab olish kerak emas
+            wants_audio = media_preference != 'video_only'
+            
+            # Agar video bo'lsa, audio'ni yuklangan fayldan lokal ajratib olish (ffmpeg)
+            if is_video and wants_audio and platform in ('youtube', 'instagram', 'tiktok'):
+                local_audio = await _extract_audio_from_video(media_file)
+                if local_audio:
+                    result['audio_path'] = str(local_audio)
+                    logger.info(f"Audio videodan ajratib olindi: {local_audio.name}")
+            
+            # Video konteynerda audio bo'lmasa (yoki ffmpeg yo'q bo'lsa), audio formatini alohida yuklab olish
+            if is_video and wants_audio and platform in ('youtube', 'instagram', 'tiktok') and not result['audio_path']:
+                try:
+                    # Audio formatini yuklab olish
+                    audio_ydl_opts = {
+                        'format': 'bestaudio[ext=m4a]/bestaudio[ext=mp3]/bestaudio',
+                        'outtmpl': str(workspace.path / '%(title)s_audio.%(ext)s'),
+                        'quiet': True,
+                        'no_warnings': True,
+                        'extract_flat': False,
+                        'noplaylist': True,
+                        'max_filesize': _upload_budget_bytes(),
+                        'progress_hooks': [ydl_quota_hook],
+                    }
+                    
+                    # Instagram/YouTube uchun cookies
+                    if platform in ('instagram', 'youtube'):
                         if platform == 'instagram':
-                            audio_ydl_opts['no_check_certificate'] = True
+                            cookies_path = instagram_cookies_path
+                        else:
+                            cookies_path = youtube_cookies_path
+                        if cookies_path:
+                            audio_ydl_opts['cookiefile'] = str(cookies_path)
+
+                    # Instagram uchun SSL sozlamalari
+                    if platform == 'instagram':
+                        audio_ydl_opts['no_check_certificate'] = True
+                    
+                    # Audio yuklab olish
+                    try:
+                        await asyncio.wait_for(
+                            asyncio.to_thread(_ydl_extract, audio_ydl_opts, url),
+                            timeout=180.0  # 3 daqiqa timeout
+                        )
+                        
+                        # Audio fayl topish
+                        audio_files = [
+                            f for f in workspace.path.glob('*_audio.*')
+                            if f.is_file() and f.stat().st_size > 0
+                            and f.suffix.lower() in ('.m4a', '.mp3', '.ogg', '.opus')
+                        ]
                         
-                        with yt_dlp.YoutubeDL(audio_ydl_opts) as audio_ydl:
-                            # Audio yuklab olish
-                            try:
-                                await asyncio.wait_for(
-                                    asyncio.to_thread(audio_ydl.extract_info, url, True),
-                                    timeout=180.0  # 3 daqiqa timeout
-                                )
-                                
-                                # Audio fayl topish
-                                audio_files = [
-                                    f for f in Path(temp_dir).glob('*_audio.*')
-                                    if f.is_file() and f.stat().st_size > 0
-                                    and f.suffix.lower() in ('.m4a', '.mp3', '.ogg', '.opus')
-                                ]
-                                
-                                if audio_files:
-                                    result['audio_path'] = str(audio_files[0])
-                                    logger.info(f"Audio fayl yuklandi: {audio_files[0].name}")
-                            except asyncio.TimeoutError:
-                                logger.warning(f"Audio yuklab olish timeout: {url}")
-                            except Exception as e:
-                                logger.warning(f"Audio yuklab olishda xatolik: {e}")
+                        if audio_files:
+                            result['audio_path'] = str(audio_files[0])
+                            logger.info(f"Audio fayl yuklandi: {audio_files[0].name}")
+                    except asyncio.TimeoutError:
+                        logger.warning(f"Audio yuklab olish timeout: {url}")
                     except Exception as e:
-                        logger.warning(f"Audio yuklab olishda umumiy xatolik: {e}")
-                
-                return result
-                
+                        logger.warning(f"Audio yuklab olishda xatolik: {e}")
+                except Exception as e:
+                    logger.warning(f"Audio yuklab olishda umumiy xatolik: {e}")
+            
+            return result
+            
+        except WorkspaceQuotaError:
+            raise
         except Exception as e:
             logger.error(f"Media yuklab olishda xatolik ({platform}): {e}")
             return None
-        finally:
-            # Temporary directory o'chirish (agar kerak bo'lsa)
-            # Lekin fayl yuborilguncha saqlab qolamiz
-            pass
     
     except ImportError:
         logger.error("yt-dlp kutubxonasi o'rnatilmagan!")
         return None
+    except WorkspaceQuotaError:
+        raise
     except Exception as e:
         logger.error(f"Media downloader xatosi: {e}")
         return None
@@ -903,28 +1566,15 @@ async def download_media(url: str, platform: str) -> Optional[Dict]:
 
 async def cleanup_temp_files(file_path: str):
     """
-    Temporary fayllarni o'chirish
+    Temporary fayllarni o'chirish - fayl joylashgan ishchi papka butunlay o'chiriladi
+    (audio, thumbnail, .part va boshqa yordamchi fayllar bilan birga)
     
     Args:
         file_path: Fayl yo'li
     """
     try:
-        file = Path(file_path)
-        if file.exists():
-            file.unlink()
-        
-        # Thumbnail ham o'chirish
-        parent = file.parent
-        for thumb_file in parent.glob('*.jpg'):
-            thumb_file.unlink()
-        for thumb_file in parent.glob('*.webp'):
-            thumb_file.unlink()
-        
-        # Directory bo'sh bo'lsa, o'chirish
-        try:
-            if parent.exists() and not any(parent.iterdir()):
-                parent.rmdir()
-        except:
-            pass
+        if not await asyncio.to_thread(workspace_manager.release_path, Path(file_path)):
+            # Ishchi papkadan tashqaridagi fayl - faqat faylning o'zi o'chiriladi
+            Path(file_path).unlink(missing_ok=True)
     except Exception as e:
         logger.error(f"Temporary fayllarni o'chirishda xatolik: {e}")
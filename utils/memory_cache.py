@@ -115,3 +115,6 @@ media_cache = MemoryCache(max_size=500, ttl_seconds=7200)  # 2 soat
 
 # Search results cache uchun - foydalanuvchi bo'yicha
 search_cache = MemoryCache(max_size=200, ttl_seconds=1800)  # 30 daqiqa
+
+# Qisqa link -> to'liq URL (database'dagi short_links jadvalining tez nusxasi)
+short_link_cache = MemoryCache(max_size=2000, ttl_seconds=3600)  # 1 soat
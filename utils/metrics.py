@@ -0,0 +1,42 @@
+"""
+Ichki metrikalar - jarayon ishga tushgandan beri hisoblagichlar (admin statistikasi uchun)
+"""
+
+import threading
+import time
+from collections import Counter
+from typing import Dict
+
+
+class Metrics:
+    """Nomlangan hisoblagichlar (thread-safe, yuklab olish thread'laridan ham chaqirilishi mumkin)"""
+
+    def __init__(self):
+        self._counters: Counter = Counter()
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """
+        Hisoblagichni oshirish
+
+        Args:
+            name: Metrika nomi (masalan cache.file_id_invalidated)
+            value: Qo'shiladigan qiymat
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def get(self, name: str) -> int:
+        """Hisoblagich qiymati"""
+        with self._lock:
+            return self._counters[name]
+
+    def snapshot(self) -> Dict[str, int]:
+        """Barcha hisoblagichlar nusxasi (nom bo'yicha tartiblangan)"""
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+
+# Global metrics instance
+metrics = Metrics()
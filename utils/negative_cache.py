@@ -0,0 +1,95 @@
+"""
+Negative cache - muvaffaqiyatsiz URL'lar natijasini vaqtincha eslab qolish
+O'chirilgan video, yopiq post yoki muddati o'tgan story qayta so'ralganda yt-dlp ishga tushirilmaydi
+"""
+
+import logging
+from typing import Dict, Optional
+from config import config
+from utils.memory_cache import MemoryCache
+from utils.url_classifier import DEFAULT_VARIANT, canonical_media_key
+
+logger = logging.getLogger(__name__)
+
+# Xatolik turi -> saqlash muddati (sekund). Ro'yxatda yo'q turlar saqlanmaydi
+DEFAULT_TTLS: Dict[str, int] = {
+    'rate_limited': 60,  # Platforma limiti - tez tiklanadi
+    'ip_blocked': 120,
+    'blocked': 300,  # Anti-bot yoki login talabi (platforma darajasida, circuit breaker ham ochiladi)
+    'auth_required': 1800,  # Yopiq yoki yosh cheklovli media
+    'is_live': 300,  # Efir tugagach yuklab olish mumkin
+    'format_unavailable': 600,
+    'story_unavailable': 3600,
+    'too_large': 6 * 3600,
+    'too_long': 6 * 3600,
+    'unavailable': 12 * 3600,  # O'chirilgan yoki mavjud bo'lmagan media
+}
+
+# Faqat so'ralgan variantga tegishli xatoliklar (video juda katta bo'lsa ham audio sig'ishi mumkin)
+VARIANT_ERRORS = frozenset({'too_large', 'format_unavailable'})
+
+# Media darajasidagi (barcha variantlarga tegishli) xatoliklar kaliti - variant kalitlari bilan to'qnashmaydi
+_MEDIA_SCOPE = '*'
+
+
+class NegativeCache:
+    """Kanonik URL bo'yicha xatolik natijalari cache'i (xatolik turiga qarab TTL)"""
+
+    def __init__(self, ttls: Dict[str, int], max_size: int = 5000):
+        """
+        Args:
+            ttls: Xatolik turi -> TTL (sekund, 0 - saqlanmaydi)
+            max_size: Maksimal yozuvlar soni
+        """
+        self.ttls = ttls
+        self._cache = MemoryCache(max_size=max_size, ttl_seconds=max(ttls.values(), default=0) or 60)
+
+    async def get(self, url: str, variant: str = DEFAULT_VARIANT) -> Optional[Dict]:
+        """
+        Saqlangan xatolik natijasi (media bo'yicha yoki so'ralgan variant bo'yicha)
+
+        Args:
+            url: Media URL
+            variant: So'ralgan media varianti
+
+        Returns:
+            {'error_type', 'error_message', 'negative_cached': True} yoki None
+        """
+        entry = await self._cache.get(canonical_media_key(url, _MEDIA_SCOPE))
+        if entry is None:
+            entry = await self._cache.get(canonical_media_key(url, variant))
+        if entry is None:
+            return None
+        return {**entry, 'negative_cached': True}
+
+    async def record(self, url: str, result: Optional[Dict], variant: str = DEFAULT_VARIANT) -> None:
+        """
+        Yuklab olish natijasini qayd etish (faqat TTL belgilangan xatolik turlari saqlanadi)
+
+        Args:
+            url: Media URL
+            result: download_media natijasi
+            variant: So'ralgan media varianti (VARIANT_ERRORS uchun kalitga kiradi)
+        """
+        if not isinstance(result, dict) or result.get('file_path'):
+            return
+        error_type = result.get('error_type')
+        ttl = self.ttls.get(error_type, 0)
+        if ttl <= 0:
+            return
+        key = canonical_media_key(url, variant if error_type in VARIANT_ERRORS else _MEDIA_SCOPE)
+        await self._cache.set(
+            key,
+            {'error_type': error_type, 'error_message': result.get('error_message')},
+            ttl_seconds=ttl,
+        )
+        logger.info(f"Negative cache: {key} -> {error_type} ({ttl}s)")
+
+    async def forget(self, url: str, variant: str = DEFAULT_VARIANT) -> None:
+        """URL uchun saqlangan xatolikni o'chirish"""
+        await self._cache.delete(canonical_media_key(url, _MEDIA_SCOPE))
+        await self._cache.delete(canonical_media_key(url, variant))
+
+
+# Global negative cache instance
+negative_cache = NegativeCache({**DEFAULT_TTLS, **config.bot.negative_cache_ttls})
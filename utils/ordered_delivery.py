@@ -0,0 +1,54 @@
+"""
+Tartibli yuborish - parallel yuklab olingan natijalarni xabardagi linklar tartibida yuborish
+Har bir ish o'z navbatini (oldingi ish tugashini) faqat yuborishdan oldin kutadi
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Navbat kutishning yuqori chegarasi (sekund) - oldingi ish osilib qolsa ham keyingilari yuboriladi
+TURN_TIMEOUT = 900.0
+
+# Joriy task'ning navbati (OrderedDelivery, index) - chuqur chaqiruvlarga parametrsiz yetkaziladi
+_current_turn: ContextVar[Optional[tuple["OrderedDelivery", int]]] = ContextVar("delivery_turn", default=None)
+
+
+class OrderedDelivery:
+    """N ta ish uchun yuborish tartibi"""
+
+    def __init__(self, count: int, turn_timeout: float = TURN_TIMEOUT):
+        self._finished = [asyncio.Event() for _ in range(count)]
+        self.turn_timeout = turn_timeout
+
+    @asynccontextmanager
+    async def job(self, index: int) -> AsyncIterator[None]:
+        """
+        index-chi ishni bajarish konteksti - ish tugaganda (xatolik bilan ham) keyingisiga navbat beriladi
+        """
+        token = _current_turn.set((self, index))
+        try:
+            yield
+        finally:
+            _current_turn.reset(token)
+            self._finished[index].set()
+
+    async def wait_turn(self, index: int) -> None:
+        """Oldingi ish tugashini kutish (turn_timeout'dan keyin tartib buzilsa ham davom etiladi)"""
+        if index > 0:
+            try:
+                await asyncio.wait_for(self._finished[index - 1].wait(), self.turn_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Navbat kutish vaqti tugadi ({self.turn_timeout:.0f}s), {index}-link tartibsiz yuboriladi")
+
+
+async def wait_delivery_turn() -> None:
+    """Yuborishdan oldin navbatni kutish (tartibli yuborish konteksti bo'lmasa - darhol qaytadi)"""
+    turn = _current_turn.get()
+    if turn is not None:
+        delivery, index = turn
+        await delivery.wait_turn(index)
@@ -0,0 +1,249 @@
+"""
+Holat xabari (loading message) - throttled va coalesced edit_text
+Yuklab olish (yt-dlp progress_hooks) va yuborish progressini foydalanuvchiga ko'rsatish
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest
+from aiogram.types import Message
+
+logger = logging.getLogger(__name__)
+
+
+def _format_size(num_bytes: Optional[float]) -> str:
+    """Hajmni MB/KB ko'rinishida formatlash"""
+    if not num_bytes:
+        return "0 KB"
+    if num_bytes >= 1024 * 1024:
+        return f"{num_bytes / 1024 / 1024:.1f} MB"
+    return f"{num_bytes / 1024:.0f} KB"
+
+
+def _format_eta(seconds: Optional[float]) -> str:
+    """ETA'ni MM:SS ko'rinishida formatlash"""
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def format_progress_line(done: int, total: Optional[int], speed: Optional[float], eta: Optional[float]) -> str:
+    """
+    Progress qatorini formatlash: foiz, tezlik va ETA
+
+    Args:
+        done: Bajarilgan bytes
+        total: Umumiy bytes (noma'lum bo'lishi mumkin)
+        speed: Tezlik (bytes/sekund)
+        eta: Qolgan vaqt (sekund)
+    """
+    if total:
+        head = f"{min(100.0, done * 100 / total):.0f}% ({_format_size(done)} / {_format_size(total)})"
+    else:
+        head = _format_size(done)
+    return f"{head}\n⚡ {_format_size(speed)}/s • ⏱ {_format_eta(eta)}"
+
+
+def compact_ydl_progress(status: Dict) -> Dict:
+    """yt-dlp progress dict'idan kerakli maydonlar (jarayonlar orasida yuborish uchun)"""
+    return {
+        'status': status.get('status'),
+        'downloaded_bytes': status.get('downloaded_bytes'),
+        'total_bytes': status.get('total_bytes') or status.get('total_bytes_estimate'),
+        'speed': status.get('speed'),
+        'eta': status.get('eta'),
+    }
+
+
+class StatusMessage:
+    """
+    Holat xabari ustidagi o'ram
+
+    - edit_text ko'pi bilan har `interval` sekundda bir marta bajariladi
+    - Oraliqdagi chaqiruvlar birlashtiriladi - faqat oxirgi holat yuboriladi
+    - Progress hisobotlari istalgan thread'dan kelishi mumkin (yt-dlp thread'i)
+    """
+
+    DOWNLOAD_HEADER = "⏳ Media yuklanmoqda...\n\n📥 Platformadan yuklab olinmoqda: "
+    UPLOAD_HEADER = "⏳ Media yuborilmoqda: "
+
+    def __init__(self, message: Message, interval: float = 3.0):
+        """
+        Args:
+            message: Tahrirlanadigan xabar
+            interval: Tahrirlar orasidagi minimal vaqt (sekund)
+        """
+        self.message = message
+        self.interval = interval
+        self._loop = asyncio.get_running_loop()
+        self._latest: Optional[str] = None
+        self._shown: Optional[str] = None
+        self._last_edit = 0.0
+        self._pending: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._closed = False
+
+    async def _edit(self, text: str) -> None:
+        async with self._lock:
+            if self._closed or text == self._shown:
+                return
+            self._last_edit = time.monotonic()
+            try:
+                await self.message.edit_text(text)
+                self._shown = text
+            except TelegramBadRequest as e:
+                # "message is not modified" va o'chirilgan xabar - e'tiborsiz
+                logger.debug(f"Holat xabarini tahrirlab bo'lmadi: {e}")
+
+    async def _flush_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._pending = None
+        if self._latest is not None:
+            await self._edit(self._latest)
+
+    async def edit_text(self, text: str, **kwargs) -> None:
+        """Holatni yangilash (throttled; oraliq holatlar tashlab yuboriladi)"""
+        if self._closed:
+            return
+        self._latest = text
+        wait = self._last_edit + self.interval - time.monotonic()
+        if wait <= 0 and self._pending is None:
+            await self._edit(text)
+        elif self._pending is None:
+            self._pending = asyncio.create_task(self._flush_later(max(wait, 0)))
+
+    async def flush(self) -> None:
+        """Kutilayotgan oxirgi holatni darhol yuborish"""
+        if self._pending:
+            self._pending.cancel()
+            self._pending = None
+        if self._latest is not None:
+            await self._edit(self._latest)
+
+    async def delete(self) -> None:
+        """Xabarni o'chirish (kutilayotgan tahrirlar bekor qilinadi)"""
+        self._closed = True
+        if self._pending:
+            self._pending.cancel()
+            self._pending = None
+        try:
+            await self.message.delete()
+        except TelegramAPIError as e:
+            logger.debug(f"Holat xabarini o'chirib bo'lmadi: {e}")
+
+    def _report(self, text: str) -> None:
+        """Istalgan thread'dan holatni yangilash"""
+        def _schedule():
+            if not self._closed:
+                asyncio.ensure_future(self.edit_text(text))
+        self._loop.call_soon_threadsafe(_schedule)
+
+    def report_download(self, status: Dict) -> None:
+        """yt-dlp progress hook (yoki worker'dan kelgan compact progress)"""
+        if status.get('status') != 'downloading':
+            return
+        total = status.get('total_bytes') or status.get('total_bytes_estimate')
+        line = format_progress_line(
+            status.get('downloaded_bytes') or 0, total, status.get('speed'), status.get('eta')
+        )
+        self._report(self.DOWNLOAD_HEADER + line)
+
+    def report_upload(self, sent: int, total: int, speed: Optional[float], eta: Optional[float]) -> None:
+        """Telegram'ga yuborish progressi"""
+        self._report(self.UPLOAD_HEADER + format_progress_line(sent, total, speed, eta))
+
+
+def _summarize(text: str) -> str:
+    """Holat matnidan bitta qator: birinchi qator va (bo'lsa) sabab qatori"""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines:
+        return ""
+    reason = next((line for line in lines[1:] if line.startswith("⚠️")), None)
+    return f"{lines[0]} {reason}" if reason else lines[0]
+
+
+class LinkStatus:
+    """
+    Ko'p linkli xabardagi bitta link holati - StatusMessage bilan bir xil interfeys,
+    lekin umumiy holat xabaridagi o'z qatorini yangilaydi
+    """
+
+    def __init__(self, parent: "MultiLinkStatus", index: int):
+        self._parent = parent
+        self.index = index
+
+    async def edit_text(self, text: str, **kwargs) -> None:
+        """Link qatorini yangilash"""
+        await self._parent.update(self.index, _summarize(text), failed=text.lstrip().startswith("❌"))
+
+    async def flush(self) -> None:
+        await self._parent.status.flush()
+
+    async def delete(self) -> None:
+        """Link yuborildi"""
+        await self._parent.update(self.index, "✅ Yuborildi", delivered=True)
+
+    def _report(self, line: str) -> None:
+        """Istalgan thread'dan qatorni yangilash"""
+        def _schedule():
+            asyncio.ensure_future(self._parent.update(self.index, line))
+        self._parent.status._loop.call_soon_threadsafe(_schedule)
+
+    def report_download(self, status: Dict) -> None:
+        """yt-dlp progress hook (yoki worker'dan kelgan compact progress)"""
+        if status.get('status') != 'downloading':
+            return
+        total = status.get('total_bytes') or status.get('total_bytes_estimate')
+        line = format_progress_line(
+            status.get('downloaded_bytes') or 0, total, status.get('speed'), status.get('eta')
+        )
+        self._report("📥 " + line.replace("\n", " "))
+
+    def report_upload(self, sent: int, total: int, speed: Optional[float], eta: Optional[float]) -> None:
+        """Telegram'ga yuborish progressi"""
+        self._report("📤 " + format_progress_line(sent, total, speed, eta).replace("\n", " "))
+
+
+class MultiLinkStatus:
+    """Bir xabardagi bir nechta link uchun umumiy holat xabari (har bir link - alohida qator)"""
+
+    def __init__(self, message: Message, count: int, interval: float = 3.0):
+        """
+        Args:
+            message: Tahrirlanadigan xabar
+            count: Linklar soni
+            interval: Tahrirlar orasidagi minimal vaqt (sekund)
+        """
+        self.status = StatusMessage(message, interval)
+        self._lines = ["⏳ Navbatda..."] * count
+        self._delivered = [False] * count
+        self._failed = [False] * count
+
+    def link(self, index: int) -> LinkStatus:
+        """index-chi link uchun holat obyekti"""
+        return LinkStatus(self, index)
+
+    def _render(self) -> str:
+        done = sum(1 for delivered, failed in zip(self._delivered, self._failed) if delivered or failed)
+        header = f"⏳ {len(self._lines)} ta link: {done} tasi tayyor"
+        return header + "\n\n" + "\n".join(f"{i + 1}. {line}" for i, line in enumerate(self._lines))
+
+    async def update(self, index: int, line: str, delivered: bool = False, failed: bool = False) -> None:
+        """Link qatorini yangilash (yakuniy holatdagi qator progress bilan almashtirilmaydi)"""
+        if self._delivered[index] or (self._failed[index] and not delivered):
+            return
+        self._lines[index] = line
+        self._delivered[index] = delivered
+        self._failed[index] = failed
+        await self.status.edit_text(self._render())
+
+    async def finish(self) -> None:
+        """Hammasi yuborilgan bo'lsa xabarni o'chirish, aks holda yakuniy holatni ko'rsatish"""
+        if all(self._delivered):
+            await self.status.delete()
+        else:
+            await self.status.flush()
@@ -7,6 +7,7 @@ import asyncio
 import tempfile
 from pathlib import Path
 from typing import Optional, Dict
+from utils.ydl_pool import ydl_pool
 
 logger = logging.getLogger(__name__)
 
@@ -133,8 +134,6 @@ async def search_youtube_url(search_query: str) -> Optional[str]:
         YouTube video URL yoki None
     """
     try:
-        import yt_dlp
-        
         ydl_opts = {
             'quiet': True,
             'no_warnings': True,
@@ -142,7 +141,7 @@ async def search_youtube_url(search_query: str) -> Optional[str]:
             'default_search': 'ytsearch1',  # Faqat birinchi natijani olish
         }
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with ydl_pool.acquire(ydl_opts) as ydl:
             # YouTube qidiruv - ytsearch1: prefix bilan
             search_url = f"ytsearch1:{search_query}"
             info = ydl.extract_info(search_url, download=False)
@@ -192,8 +191,6 @@ async def search_youtube_videos(search_query: str, max_results: int = 10) -> lis
         ]
     """
     try:
-        import yt_dlp
-        
         ydl_opts = {
             'quiet': True,
             'no_warnings': True,
@@ -201,7 +198,7 @@ async def search_youtube_videos(search_query: str, max_results: int = 10) -> lis
             'default_search': f'ytsearch{max_results}',
         }
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with ydl_pool.acquire(ydl_opts) as ydl:
             # YouTube qidiruv
             search_url = f"ytsearch{max_results}:{search_query}"
             info = ydl.extract_info(search_url, download=False)
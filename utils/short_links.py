@@ -0,0 +1,114 @@
+"""
+Qisqa linklarni aniqlash (resolver) - vm.tiktok.com, vt.tiktok.com, fb.watch
+Redirect kuzatiladi, natija memory cache va database'da (TTL bilan) saqlanadi
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from config import config
+from database import async_session_maker
+from models import ShortLink
+from utils.http_client import http_client
+from utils.memory_cache import short_link_cache
+from utils.single_flight import SingleFlight
+from utils.url_classifier import classify_url, is_short_link, normalize_url, strip_tracking_params
+
+logger = logging.getLogger(__name__)
+
+# Bir xil qisqa link parallel kelsa - bitta redirect so'rovi
+_resolve_flight = SingleFlight()
+
+
+async def _load_mapping(short_url: str) -> Optional[str]:
+    """Database'dan muddati o'tmagan mapping"""
+    async with async_session_maker() as session:
+        try:
+            result = await session.execute(
+                select(ShortLink.resolved_url).where(
+                    ShortLink.short_url == short_url,
+                    ShortLink.expires_at > datetime.now(timezone.utc),
+                )
+            )
+            return result.scalar_one_or_none()
+        except Exception as e:
+            logger.error(f"Qisqa link cache'dan o'qishda xatolik: {e}")
+            return None
+
+
+async def _save_mapping(short_url: str, resolved_url: str) -> None:
+    """Mapping'ni database'ga saqlash (mavjud bo'lsa yangilash)"""
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=config.bot.short_link_ttl)
+    async with async_session_maker() as session:
+        try:
+            result = await session.execute(
+                select(ShortLink).where(ShortLink.short_url == short_url)
+            )
+            existing = result.scalar_one_or_none()
+            if existing:
+                existing.resolved_url = resolved_url
+                existing.expires_at = expires_at
+            else:
+                session.add(ShortLink(short_url=short_url, resolved_url=resolved_url, expires_at=expires_at))
+            await session.commit()
+        except IntegrityError:
+            # Parallel saqlash - boshqa so'rov allaqachon yozgan
+            await session.rollback()
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Qisqa link cache'ga saqlashda xatolik: {e}")
+
+
+async def _resolve(short_url: str, url: str) -> str:
+    # 1. Database (boshqa jarayon yoki oldingi ishga tushirishdan)
+    resolved = await _load_mapping(short_url)
+    if resolved:
+        logger.debug(f"Qisqa link database cache'dan: {url} -> {resolved}")
+    else:
+        # 2. Redirect'ni kuzatish
+        try:
+            final_url = await http_client.resolve_redirects(url)
+        except Exception as e:
+            logger.warning(f"Qisqa linkni aniqlab bo'lmadi ({url}): {e}")
+            return url
+
+        source, target = classify_url(url), classify_url(final_url)
+        if target is None or source is None or target.platform != source.platform or target.kind == 'share':
+            # Login sahifasi yoki boshqa joyga yo'naltirildi - asl link yt-dlp'ga beriladi
+            logger.warning(f"Qisqa link kutilmagan manzilga yo'naltirildi: {url} -> {final_url[:100]}")
+            return url
+
+        resolved = strip_tracking_params(final_url)
+        await _save_mapping(short_url, resolved)
+        logger.info(f"Qisqa link aniqlandi: {url} -> {resolved}")
+
+    await short_link_cache.set(short_url, resolved, ttl_seconds=min(3600, int(config.bot.short_link_ttl)))
+    return resolved
+
+
+async def resolve_short_link(url: str) -> str:
+    """
+    Qisqa linkni to'liq URL'ga aylantirish
+
+    Qisqa bo'lmagan URL'lar o'zgarishsiz qaytariladi. Aniqlab bo'lmasa ham asl URL qaytariladi
+    (yt-dlp redirect'ni o'zi kuzatadi).
+
+    Args:
+        url: Media URL
+
+    Returns:
+        To'liq URL (masalan tiktok.com/@user/video/<id>) yoki asl URL
+    """
+    url = url.strip()
+    if not is_short_link(url):
+        return url
+
+    short_url = normalize_url(url)
+    cached = await short_link_cache.get(short_url)
+    if cached:
+        return cached
+
+    resolved, _ = await _resolve_flight.do(short_url, lambda: _resolve(short_url, url))
+    return resolved or url
@@ -0,0 +1,90 @@
+"""
+Single-flight utility - bir xil kalit uchun parallel ishlarni birlashtirish
+Bitta URL bir vaqtda bir necha foydalanuvchidan kelsa, faqat bittasi yuklab oladi
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Bir xil kalit bo'yicha bir vaqtda faqat bitta ish bajariladi.
+    Qolgan chaqiruvlar birinchi ishning natijasini kutadi.
+    """
+
+    def __init__(self):
+        # Kalit -> birinchi ish natijasi (future)
+        self._calls: Dict[str, asyncio.Future] = {}
+        # Kalit -> natijani kutayotgan chaqiruvlar soni
+        self._waiters: Dict[str, int] = {}
+
+    def in_flight(self, key: str) -> bool:
+        """Kalit bo'yicha ish hozir bajarilayotganini tekshirish"""
+        return key in self._calls
+
+    async def do(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Any]],
+        on_result: Optional[Callable[[Any, int], None]] = None,
+        on_abandon: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ) -> Tuple[Any, bool]:
+        """
+        Ishni bajarish yoki bajarilayotgan ishni kutish
+
+        Args:
+            key: Ish kaliti (masalan, URL)
+            func: Ishni bajaruvchi coroutine funksiya
+            on_result: (natija, kutuvchilar soni) - natija kutuvchilarga berilishidan oldin chaqiriladi
+                (masalan, umumiy fayllardan foydalanuvchilarni hisobga olish uchun). None natijada chaqirilmaydi
+            on_abandon: natija on_result'da hisobga olingandan keyin, lekin kutuvchiga qaytarilishidan oldin
+                bekor qilingan kutuvchi uchun chaqiriladi (on_result'dagi ulushni qaytarish uchun)
+
+        Returns:
+            (natija, shared) - shared=True bo'lsa natija boshqa chaqiruvdan olingan
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            # Boshqa so'rov allaqachon bajarmoqda - natijani kutish
+            # shield - bitta kutuvchi bekor qilinsa, umumiy future bekor bo'lmasligi uchun
+            logger.debug(f"Single-flight: natija kutilmoqda: {key}")
+            self._waiters[key] = self._waiters.get(key, 0) + 1
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.done():
+                    # Natija berilishidan oldin bekor qilingan kutuvchi hisobdan chiqariladi
+                    self._waiters[key] -= 1
+                elif on_abandon is not None and future.result() is not None:
+                    # Natija on_result'da hisobga olingan, lekin kutuvchiga yetib bormadi - ulush qaytariladi.
+                    # shield - qayta bekor qilinsa ham qaytarish oxirigacha bajariladi
+                    await asyncio.shield(on_abandon(future.result()))
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        result = None
+        try:
+            result = await func()
+            return result, False
+        finally:
+            # Xatolik yoki bekor qilinganda kutuvchilar None oladi
+            waiters = self._waiters.pop(key, 0)
+            if on_result is not None and result is not None:
+                on_result(result, waiters)
+            if not future.done():
+                future.set_result(result)
+            self._calls.pop(key, None)
+
+    def size(self) -> int:
+        """Bajarilayotgan ishlar soni"""
+        return len(self._calls)
+
+
+# Global single-flight instance
+# Media yuklab olish uchun - URL bo'yicha (yuborish har bir so'rovning o'zida)
+media_flight = SingleFlight()
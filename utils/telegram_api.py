@@ -0,0 +1,138 @@
+"""
+Telegram Bot API server sozlamalari - rasmiy yoki lokal (self-hosted) telegram-bot-api
+Lokal rejimda fayllar yo'l orqali yuboriladi (2 GB gacha) va diskdan to'g'ridan-to'g'ri o'qiladi
+"""
+
+import logging
+import os
+import time
+from pathlib import Path
+from typing import AsyncGenerator, Callable, Optional, Union
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import (
+    BareFilesPathWrapper,
+    FilesPathWrapper,
+    SimpleFilesPathWrapper,
+    TelegramAPIServer,
+)
+from aiogram.types import FSInputFile
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# (yuborilgan bytes, umumiy bytes, tezlik bytes/s, qolgan vaqt sekund)
+UploadProgressCallback = Callable[[int, int, Optional[float], Optional[float]], None]
+
+
+def _files_wrapper() -> FilesPathWrapper:
+    """Server va bot fayl yo'llari orasidagi moslik (umumiy volume turli joyga ulangan bo'lsa)"""
+    server_dir = config.bot.telegram_api_server_dir
+    local_dir = config.bot.telegram_api_local_dir
+    if server_dir and local_dir:
+        return SimpleFilesPathWrapper(Path(server_dir), Path(local_dir))
+    return BareFilesPathWrapper()
+
+
+def is_local_api() -> bool:
+    """Lokal (--local) Bot API server ishlatilyaptimi"""
+    return bool(config.bot.telegram_api_url) and config.bot.telegram_api_local
+
+
+def create_bot_session() -> Optional[AiohttpSession]:
+    """
+    Bot uchun session yaratish
+
+    Returns:
+        Lokal/self-hosted server uchun AiohttpSession yoki None (rasmiy api.telegram.org)
+    """
+    if not config.bot.telegram_api_url:
+        return None
+    api = TelegramAPIServer.from_base(
+        config.bot.telegram_api_url,
+        is_local=config.bot.telegram_api_local,
+        wrap_local_file=_files_wrapper(),
+    )
+    logger.info(
+        f"Telegram Bot API server: {config.bot.telegram_api_url}"
+        f"{' (lokal rejim)' if api.is_local else ''}"
+    )
+    return AiohttpSession(api=api)
+
+
+def _server_path(path: Path) -> Optional[Path]:
+    """Bot tomonidagi fayl yo'lini server ko'radigan yo'lga aylantirish (mos kelmasa None)"""
+    try:
+        return Path(_files_wrapper().to_server(path.resolve()))
+    except ValueError:
+        # Fayl umumiy papkadan tashqarida - server uni ko'rmaydi
+        return None
+
+
+class ProgressFSInputFile(FSInputFile):
+    """Yuborilgan bytes'ni hisoblab boruvchi FSInputFile (upload progress uchun)"""
+
+    def __init__(self, path: Union[str, Path], on_progress: UploadProgressCallback, **kwargs):
+        super().__init__(path, **kwargs)
+        self.on_progress = on_progress
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        total = os.path.getsize(self.path)
+        sent = 0
+        started = time.monotonic()
+        async for chunk in super().read(bot):
+            yield chunk
+            sent += len(chunk)
+            elapsed = time.monotonic() - started
+            speed = sent / elapsed if elapsed > 0 else None
+            eta = (total - sent) / speed if speed else None
+            try:
+                self.on_progress(sent, total, speed, eta)
+            except Exception as e:
+                logger.debug(f"Upload progress callback xatosi: {e}")
+
+
+def telegram_input_file(
+    file_path: Union[str, Path],
+    on_progress: Optional[UploadProgressCallback] = None,
+) -> Union[FSInputFile, str]:
+    """
+    Yuboriladigan fayl uchun InputFile
+
+    Lokal rejimda fayl yo'li file:// URI sifatida beriladi - server faylni o'zi o'qiydi,
+    multipart orqali nusxalanmaydi. Aks holda oddiy FSInputFile (multipart upload).
+
+    Args:
+        file_path: Fayl yo'li
+        on_progress: Upload progress callback (sent, total, speed, eta) - faqat multipart upload'da
+    """
+    path = Path(file_path)
+    if is_local_api():
+        server_path = _server_path(path)
+        if server_path is not None:
+            return server_path.as_uri()
+    if on_progress:
+        return ProgressFSInputFile(path, on_progress)
+    return FSInputFile(path)
+
+
+async def fetch_telegram_file(bot: Bot, file_path: str, destination: Path) -> Path:
+    """
+    Telegram faylini olish
+
+    Lokal rejimda server diskidagi faylning o'zi qaytariladi (nusxalanmaydi),
+    aks holda fayl destination'ga yuklab olinadi.
+
+    Args:
+        bot: Bot instance
+        file_path: get_file() qaytargan file_path
+        destination: Yuklab olish yo'li (rasmiy API uchun)
+
+    Returns:
+        O'qish uchun fayl yo'li (lokal rejimda destination'dan farq qiladi - uni o'chirmang)
+    """
+    if bot.session.api.is_local:
+        return Path(bot.session.api.wrap_local_file.to_local(file_path))
+    await bot.download_file(file_path, str(destination))
+    return destination
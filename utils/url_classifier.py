@@ -0,0 +1,246 @@
+"""
+URL klassifikatori - platforma, kontent turi va media ID'ni bir o'tishda aniqlash
+Host bir marta ajratiladi, host jadvali orqali platformaga bitta oldindan kompilyatsiya qilingan pattern qo'llaniladi
+"""
+
+import re
+from typing import NamedTuple, Optional
+from urllib import parse
+
+
+class UrlInfo(NamedTuple):
+    """URL klassifikatsiyasi natijasi"""
+    platform: str
+    kind: str  # video, short, post, reel, story, profile, share
+    media_id: Optional[str]
+
+
+# Scheme (ixtiyoriy), host, port va qolgan qism (path + query)
+_URL_PARTS_RE = re.compile(r'^\s*(?:https?://)?(?P<host>[^/?#:\s]+)(?::\d+)?(?P<rest>[/?#]\S*)?', re.IGNORECASE)
+
+# Host'dagi e'tiborga olinmaydigan prefikslar
+_HOST_PREFIXES = ('www.', 'm.', 'mobile.')
+
+_YOUTUBE_RE = re.compile(
+    r'^/(?:watch\?(?:[^#]*&)?v=(?P<video>[a-zA-Z0-9_-]{11})|shorts/(?P<short>[a-zA-Z0-9_-]{11}))',
+    re.IGNORECASE,
+)
+_YOUTU_BE_RE = re.compile(r'^/(?P<video>[a-zA-Z0-9_-]{11})', re.IGNORECASE)
+_INSTAGRAM_RE = re.compile(
+    r'^/(?:p/(?P<post>[a-zA-Z0-9_-]+)'
+    r'|reels?/(?P<reel>[a-zA-Z0-9_-]+)'
+    r'|tv/(?P<tv>[a-zA-Z0-9_-]+)'
+    r'|stories/[a-zA-Z0-9_.]+/(?P<story>\d+)'
+    r'|(?P<profile>[a-zA-Z0-9_.]+)/)',
+    re.IGNORECASE,
+)
+_TIKTOK_RE = re.compile(
+    r'^/(?:@[^/]+/(?:video|photo)/(?P<video>\d+)|t/(?P<share>[a-zA-Z0-9]+)|(?P<other>[a-zA-Z0-9]+))',
+    re.IGNORECASE,
+)
+_TIKTOK_SHORT_RE = re.compile(r'^/(?P<share>[a-zA-Z0-9]+)', re.IGNORECASE)
+_TWITTER_RE = re.compile(r'^/[^/]+/status/(?P<post>\d+)', re.IGNORECASE)
+_FACEBOOK_RE = re.compile(
+    r'^/(?:[^/?]+/videos/(?:[^/?]+/)?(?P<video>\d+)|watch/?\?(?:[^#]*&)?v=(?P<watch>\d+)|reel/(?P<reel>\d+))',
+    re.IGNORECASE,
+)
+_FB_WATCH_RE = re.compile(r'^/(?P<share>[a-zA-Z0-9_-]+)', re.IGNORECASE)
+
+# Host -> (platforma, pattern). Pattern'dagi nomlangan guruh media ID'ni oladi, nomi esa kontent turini bildiradi
+_HOST_TABLE = {
+    'youtube.com': ('youtube', _YOUTUBE_RE),
+    'youtu.be': ('youtube', _YOUTU_BE_RE),
+    'instagram.com': ('instagram', _INSTAGRAM_RE),
+    'tiktok.com': ('tiktok', _TIKTOK_RE),
+    'vm.tiktok.com': ('tiktok', _TIKTOK_SHORT_RE),
+    'vt.tiktok.com': ('tiktok', _TIKTOK_SHORT_RE),
+    'twitter.com': ('twitter', _TWITTER_RE),
+    'x.com': ('twitter', _TWITTER_RE),
+    'facebook.com': ('facebook', _FACEBOOK_RE),
+    'fb.watch': ('facebook', _FB_WATCH_RE),
+}
+
+# Regex guruhi -> kontent turi
+_GROUP_KINDS = {
+    'video': 'video',
+    'short': 'short',
+    'post': 'post',
+    'reel': 'reel',
+    'tv': 'video',
+    'watch': 'video',
+    'story': 'story',
+    'profile': 'profile',
+    'share': 'share',
+    'other': 'share',
+}
+
+# Kanonik kalitda media ID bo'lmagan turlar (qisqa link, profil) - normalize qilingan URL ishlatiladi
+_UNSTABLE_KINDS = frozenset({'share', 'profile'})
+
+# Kontentni o'zgartirmaydigan kuzatuv parametrlari
+_TRACKING_PARAMS = frozenset({
+    'si', 'igshid', 'igsh', 'feature', 'fbclid', 'gclid', 'ref', 'ref_src', 'ref_url',
+    's', '_r', '_t', 'is_from_webapp', 'sender_device', 'share_app_id', 'mibextid',
+})
+
+DEFAULT_VARIANT = 'default'  # Video (yoki rasm, albom) - asosiy media
+AUDIO_VARIANT = 'audio'  # audio_only foydalanuvchilar uchun faqat audio
+
+_VALID_URL_RE = re.compile(
+    r'^https?://'  # http:// or https://
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # domain...
+    r'localhost|'  # localhost...
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
+    r'(?::\d+)?'  # optional port
+    r'(?:/?|[/?]\S+)$', re.IGNORECASE
+)
+
+
+def _normalize_host(host: str) -> str:
+    host = host.lower().rstrip('.')
+    for prefix in _HOST_PREFIXES:
+        if host.startswith(prefix):
+            return host[len(prefix):]
+    return host
+
+
+def classify_url(url: str) -> Optional[UrlInfo]:
+    """
+    URL'ni klassifikatsiya qilish
+
+    Args:
+        url: Media URL
+
+    Returns:
+        UrlInfo (platforma, kontent turi, media ID) yoki None (qo'llab-quvvatlanmaydi)
+    """
+    parts = _URL_PARTS_RE.match(url)
+    if not parts:
+        return None
+    host = _normalize_host(parts.group('host'))
+    entry = _HOST_TABLE.get(host)
+    if entry is None and host.count('.') >= 2:
+        # Qo'shimcha subdomain'lar (music.youtube.com, web.facebook.com) - asosiy domen bo'yicha
+        entry = _HOST_TABLE.get(host.split('.', 1)[1])
+    if entry is None:
+        return None
+
+    platform, pattern = entry
+    match = pattern.match(parts.group('rest') or '/')
+    if not match:
+        return None
+
+    group = match.lastgroup
+    return UrlInfo(platform, _GROUP_KINDS[group], match.group(group))
+
+
+def _filter_query(query: str) -> list:
+    """Kuzatuv parametrlarisiz, tartiblangan query parametrlari"""
+    return sorted(
+        (key, value) for key, value in parse.parse_qsl(query, keep_blank_values=True)
+        if key.lower() not in _TRACKING_PARAMS and not key.lower().startswith('utm_')
+    )
+
+
+def strip_tracking_params(url: str) -> str:
+    """
+    URL'dan kuzatuv parametrlarini olib tashlash (scheme, host va path o'zgarmaydi -
+    yt-dlp extractor'lari aniq host kutadi, masalan www.tiktok.com)
+
+    Args:
+        url: URL
+
+    Returns:
+        Tozalangan URL
+    """
+    parts = parse.urlsplit(url.strip())
+    return parse.urlunsplit(parts._replace(query=parse.urlencode(_filter_query(parts.query)), fragment=''))
+
+
+def normalize_url(url: str) -> str:
+    """
+    URL'ni normalize qilish: scheme va www./m. prefikslari olib tashlanadi,
+    kuzatuv (utm_*, si, igshid ...) parametrlari o'chiriladi, qolganlari tartiblanadi
+
+    Args:
+        url: URL
+
+    Returns:
+        Normalize qilingan URL (host + path + query)
+    """
+    parts = parse.urlsplit(url.strip() if '://' in url else f"https://{url.strip()}")
+    host = _normalize_host(parts.hostname or '')
+    path = parts.path.rstrip('/') or '/'
+    query = _filter_query(parts.query)
+    return f"{host}{path}" + (f"?{parse.urlencode(query)}" if query else '')
+
+
+def canonical_media_key(url: str, variant: str = DEFAULT_VARIANT) -> str:
+    """
+    Media uchun kanonik kalit: platform:media_id:variant
+
+    youtu.be/X, youtube.com/watch?v=X va /shorts/X bir xil kalit beradi.
+    Media ID aniqlanmagan URL'lar uchun normalize qilingan URL ishlatiladi.
+
+    Args:
+        url: Media URL
+        variant: Yuborilgan variant (masalan video, audio)
+
+    Returns:
+        Kanonik kalit
+    """
+    info = classify_url(url)
+    if info is not None and info.media_id and info.kind not in _UNSTABLE_KINDS:
+        return f"{info.platform}:{info.media_id}:{variant}"
+    return f"url:{normalize_url(url)}:{variant}"
+
+
+def preference_variant(media_preference: Optional[str]) -> str:
+    """
+    Foydalanuvchi sozlamasiga mos media varianti
+
+    Args:
+        media_preference: video_audio, video_only yoki audio_only
+
+    Returns:
+        AUDIO_VARIANT (audio_only) yoki DEFAULT_VARIANT
+    """
+    return AUDIO_VARIANT if media_preference == 'audio_only' else DEFAULT_VARIANT
+
+
+def is_short_link(url: str) -> bool:
+    """
+    Qisqa (redirect) link ekanligini tekshirish: vm./vt.tiktok.com, tiktok.com/t/, fb.watch
+
+    Args:
+        url: Media URL
+    """
+    info = classify_url(url)
+    return info is not None and info.kind == 'share'
+
+
+def detect_platform(url: str) -> Optional[str]:
+    """
+    URL dan platformani aniqlash
+
+    Args:
+        url: Media URL
+
+    Returns:
+        Platform nomi yoki None
+    """
+    info = classify_url(url)
+    return info.platform if info else None
+
+
+def is_valid_url(url: str) -> bool:
+    """
+    URL to'g'ri ekanligini tekshirish
+
+    Args:
+        url: URL
+
+    Returns:
+        True agar to'g'ri bo'lsa
+    """
+    return bool(_VALID_URL_RE.match(url))
@@ -0,0 +1,360 @@
+"""
+Ishchi papkalar (workspace) boshqaruvi - har bir ish uchun alohida vaqtinchalik papka
+Hajm limiti, kichik ishlar uchun tmpfs (RAM disk) va tashlab ketilgan papkalarni tozalovchi janitor
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Papka nomi: <prefix>-<pid>-<token> (janitor pid orqali egasi tirikligini tekshiradi)
+_NAME_SEPARATOR = "-"
+
+
+class WorkspaceQuotaError(Exception):
+    """Ishchi papka hajm limitidan oshdi"""
+
+
+def _directory_size(path: Path) -> int:
+    """Papkadagi barcha fayllar hajmi (bytes)"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+def _pid_alive(pid: int) -> bool:
+    """Jarayon hali ishlayaptimi"""
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class Workspace:
+    """Bitta ish uchun vaqtinchalik papka"""
+
+    def __init__(self, path: Path, quota_bytes: int, manager: "WorkspaceManager"):
+        self.path = path
+        self.quota_bytes = quota_bytes
+        self._manager = manager
+        # Fayl -> oxirgi o'lchashdagi downloaded_bytes (merge'da har bir format alohida fayl, hisob 0 dan boshlanadi)
+        self._last_checked: Dict[str, int] = {}
+
+    def usage(self) -> int:
+        """Papka hajmi (bytes)"""
+        return _directory_size(self.path)
+
+    def check_quota(self) -> None:
+        """
+        Raises:
+            WorkspaceQuotaError: Papka hajmi limitdan oshsa
+        """
+        if self.quota_bytes and self.usage() > self.quota_bytes:
+            raise WorkspaceQuotaError(
+                f"Ishchi papka limiti oshdi ({self.quota_bytes // (1024 * 1024)} MB): {self.path.name}"
+            )
+
+    def release(self) -> None:
+        """Papkani butunlay o'chirish"""
+        self._manager.release(self)
+
+    def __enter__(self) -> "Workspace":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class WorkspaceManager:
+    """
+    Ishchi papkalar boshqaruvchisi
+
+    - Har bir ish o'z papkasini oladi (disk yoki tmpfs)
+    - Ish tugagach papka to'liq o'chiriladi (audio, .part, thumbnail - hammasi)
+    - Janitor crash'lardan qolgan papkalarni vaqti-vaqti bilan tozalaydi
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        ram_root: Optional[Path] = None,
+        ram_max_bytes: int = 0,
+        quota_bytes: int = 0,
+        max_age: float = 3600.0,
+        janitor_interval: float = 600.0,
+    ):
+        """
+        Args:
+            root: Disk'dagi asosiy papka
+            ram_root: tmpfs (RAM disk) papkasi (None - ishlatilmaydi)
+            ram_max_bytes: Shu hajmgacha bo'lgan kichik ishlar tmpfs'da bajariladi
+            quota_bytes: Har bir ish papkasi uchun hajm limiti (0 - cheklanmagan)
+            max_age: Joriy jarayonning shu vaqtdan eski faol bo'lmagan papkalari janitor tomonidan o'chiriladi (sekund)
+            janitor_interval: Janitor tekshiruvlari orasidagi vaqt (sekund)
+        """
+        self.root = root.absolute()
+        self.ram_root = ram_root.absolute() if ram_root is not None else None
+        self.ram_max_bytes = ram_max_bytes
+        self.quota_bytes = quota_bytes
+        self.max_age = max_age
+        self.janitor_interval = janitor_interval
+        self._active: Dict[str, Workspace] = {}
+        # Thread'lar orasida xavfsiz (yt-dlp hook'lari thread ichidan chaqiriladi)
+        self._lock = threading.Lock()
+        self._janitor_task: Optional[asyncio.Task] = None
+
+    def _roots(self) -> list[Path]:
+        return [r for r in (self.root, self.ram_root) if r is not None]
+
+    def create(self, prefix: str = "job", expected_bytes: Optional[int] = None) -> Workspace:
+        """
+        Yangi ish papkasini yaratish
+
+        Args:
+            prefix: Papka nomi prefiksi (ish turi)
+            expected_bytes: Kutilayotgan hajm - ma'lum va kichik bo'lsa papka tmpfs'da yaratiladi
+
+        Returns:
+            Workspace
+        """
+        root, quota = self._placement(expected_bytes)
+        workspace = Workspace(self._make_dir(root, prefix), quota, self)
+        with self._lock:
+            self._active[str(workspace.path)] = workspace
+        return workspace
+
+    def _placement(self, expected_bytes: Optional[int]) -> Tuple[Path, int]:
+        """Kutilayotgan hajm bo'yicha (root, hajm limiti) - ma'lum va kichik bo'lsa tmpfs"""
+        if (
+            self.ram_root is not None
+            and expected_bytes is not None
+            and expected_bytes <= self.ram_max_bytes
+        ):
+            # tmpfs xotirani egallaydi - kichik ishlar uchun qat'iyroq limit
+            quota = min(self.quota_bytes, self.ram_max_bytes * 2) if self.quota_bytes else self.ram_max_bytes * 2
+            return self.ram_root, quota
+        return self.root, self.quota_bytes
+
+    def _make_dir(self, root: Path, prefix: str) -> Path:
+        root.mkdir(parents=True, exist_ok=True)
+        name = _NAME_SEPARATOR.join((prefix, str(os.getpid()), uuid.uuid4().hex[:12]))
+        path = root / name
+        path.mkdir(mode=0o700)
+        return path
+
+    def relocate(self, workspace: Workspace, expected_bytes: Optional[int]) -> bool:
+        """
+        Hali bo'sh ish papkasini hajmi aniqlangach tmpfs'ga ko'chirish
+        (create paytida hajm noma'lum - masalan yuklab olishda u faqat probe'dan keyin ma'lum bo'ladi)
+
+        Args:
+            workspace: Disk'dagi, hali hech narsa yozilmagan workspace
+            expected_bytes: Taxminiy hajm (None - noma'lum)
+
+        Returns:
+            True agar papka ko'chirilgan bo'lsa (workspace.path yangilanadi)
+        """
+        root, quota = self._placement(expected_bytes)
+        old_path = workspace.path
+        if root != self.ram_root or old_path.parent == root:
+            return False
+        try:
+            if any(old_path.iterdir()):
+                return False
+            path = self._make_dir(root, old_path.name.split(_NAME_SEPARATOR)[0])
+        except OSError as e:
+            logger.warning(f"Ishchi papkani tmpfs'ga ko'chirib bo'lmadi: {e}")
+            return False
+        with self._lock:
+            self._active.pop(str(old_path), None)
+            self._active[str(path)] = workspace
+        workspace.path, workspace.quota_bytes = path, quota
+        shutil.rmtree(old_path, ignore_errors=True)
+        return True
+
+    def _owner(self, path: Path) -> Optional[Path]:
+        """Fayl joylashgan ish papkasini topish (boshqariladigan root'larning bevosita farzandi)"""
+        path = Path(path).absolute()
+        for root in self._roots():
+            try:
+                relative = path.relative_to(root)
+            except ValueError:
+                continue
+            if relative.parts:
+                return root / relative.parts[0]
+        return None
+
+    def get(self, path: Path) -> Optional[Workspace]:
+        """Fayl yoki papka yo'li bo'yicha faol workspace"""
+        owner = self._owner(path)
+        if owner is None:
+            return None
+        with self._lock:
+            return self._active.get(str(owner))
+
+    def release(self, workspace: Workspace) -> None:
+        """Workspace papkasini o'chirish"""
+        self.release_path(workspace.path)
+
+    def release_path(self, path: Path) -> bool:
+        """
+        Fayl joylashgan ish papkasini butunlay o'chirish
+        (boshqa jarayonda yaratilgan bo'lsa ham - masalan worker jarayoni)
+
+        Returns:
+            True agar papka topilib o'chirilgan bo'lsa
+        """
+        owner = self._owner(path)
+        if owner is None:
+            return False
+        with self._lock:
+            self._active.pop(str(owner), None)
+        shutil.rmtree(owner, ignore_errors=True)
+        return True
+
+    def detach(self, path: Path) -> None:
+        """
+        Papkani joriy jarayon ro'yxatidan chiqarish (o'chirmasdan) - egalik boshqa
+        jarayonga o'tganda (worker natijasi parent'da yuboriladi va o'chiriladi)
+        """
+        owner = self._owner(path)
+        if owner is not None:
+            with self._lock:
+                self._active.pop(str(owner), None)
+
+    def adopt(self, path: Path) -> None:
+        """
+        Boshqa jarayonda yaratilgan papkani joriy jarayon ro'yxatiga olish (detach'ning teskarisi) -
+        papka nomidagi pid egasi (worker) o'lsa ham janitor uni release qilinguncha o'chirmaydi
+        """
+        owner = self._owner(path)
+        if owner is None or not owner.is_dir():
+            return
+        with self._lock:
+            self._active.setdefault(str(owner), Workspace(owner, self.quota_bytes, self))
+
+    def sweep(self) -> int:
+        """
+        Tashlab ketilgan papkalarni o'chirish - egasi jarayoni o'lgan yoki joriy jarayonning
+        faol bo'lmagan eski papkasi. Boshqa tirik jarayon (masalan worker) papkasiga yoshidan
+        qat'i nazar tegilmaydi - uzoq yuklab olish davom etayotgan bo'lishi mumkin
+
+        Returns:
+            O'chirilgan papkalar soni
+        """
+        removed = 0
+        now = time.time()
+        my_pid = os.getpid()
+        for root in self._roots():
+            if not root.exists():
+                continue
+            for entry in root.iterdir():
+                if not entry.is_dir():
+                    continue
+                with self._lock:
+                    if str(entry) in self._active:
+                        continue
+                parts = entry.name.split(_NAME_SEPARATOR)
+                pid = int(parts[-2]) if len(parts) >= 3 and parts[-2].isdigit() else 0
+                if pid != my_pid and _pid_alive(pid):
+                    continue
+                try:
+                    age = now - entry.stat().st_mtime
+                except OSError:
+                    continue
+                orphaned = pid != my_pid
+                if orphaned or age > self.max_age:
+                    shutil.rmtree(entry, ignore_errors=True)
+                    removed += 1
+        if removed:
+            logger.info(f"Janitor: {removed} ta tashlab ketilgan ishchi papka o'chirildi")
+        return removed
+
+    async def _janitor_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"Janitor xatosi: {e}")
+            await asyncio.sleep(self.janitor_interval)
+
+    def start_janitor(self) -> None:
+        """Janitor'ni fonda ishga tushirish"""
+        if self._janitor_task is None or self._janitor_task.done():
+            self._janitor_task = asyncio.create_task(self._janitor_loop())
+
+    async def stop_janitor(self) -> None:
+        """Janitor'ni to'xtatish"""
+        if self._janitor_task and not self._janitor_task.done():
+            self._janitor_task.cancel()
+            try:
+                await self._janitor_task
+            except asyncio.CancelledError:
+                pass
+        self._janitor_task = None
+
+    def ydl_quota_hook(self, status: Dict) -> None:
+        """
+        yt-dlp progress hook - yuklab olish paytida ish papkasi hajmini tekshirish
+
+        Raises:
+            WorkspaceQuotaError: Papka limitdan oshsa (yuklab olish to'xtatiladi)
+        """
+        if status.get('status') != 'downloading':
+            return
+        filename = status.get('tmpfilename') or status.get('filename')
+        if not filename:
+            return
+        workspace = self.get(Path(filename))
+        if workspace is None or not workspace.quota_bytes:
+            return
+        downloaded = status.get('downloaded_bytes') or 0
+        # Papkani har 8 MB da (kichik limitlarda tezroq) bir marta o'lchash
+        step = min(8 * 1024 * 1024, workspace.quota_bytes // 4)
+        if downloaded - workspace._last_checked.get(filename, 0) < step:
+            return
+        workspace._last_checked[filename] = downloaded
+        workspace.check_quota()
+
+
+def ydl_quota_hook(status: Dict) -> None:
+    """yt-dlp progress hook (modul darajasida - sozlamalar deepcopy qilinganda ham bir xil obyekt)"""
+    workspace_manager.ydl_quota_hook(status)
+
+
+def _default_quota_mb() -> int:
+    """Video + ajratilgan audio + thumbnail va vaqtinchalik qismlar uchun joy"""
+    return config.bot.media_upload_limit_mb * 2 + 64
+
+
+# Global workspace manager instance
+workspace_manager = WorkspaceManager(
+    root=Path(config.bot.workspace_dir or Path(tempfile.gettempdir()) / "vkm_bot_jobs"),
+    ram_root=Path(config.bot.workspace_ram_dir) if config.bot.workspace_ram_dir else None,
+    ram_max_bytes=config.bot.workspace_ram_max_mb * 1024 * 1024,
+    quota_bytes=(config.bot.workspace_quota_mb or _default_quota_mb()) * 1024 * 1024,
+    max_age=config.bot.workspace_max_age,
+    janitor_interval=config.bot.workspace_janitor_interval,
+)
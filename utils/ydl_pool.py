@@ -0,0 +1,208 @@
+"""
+YoutubeDL instance pool - uzoq yashaydigan (warm) yt-dlp instance'lari
+Extractor cache, cookie jar va HTTP keep-alive ulanishlar so'rovlar orasida saqlanadi
+"""
+
+import copy
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Tuple
+from utils.cookie_store import cookie_store
+
+logger = logging.getLogger(__name__)
+
+# Har bir ish uchun xavfsiz almashtiriladigan sozlamalar (yt-dlp ularni ishlash paytida o'qiydi).
+# Qolgan sozlamalar (cookiefile, user_agent, no_check_certificate va h.k.) instance yaratilganda
+# qo'llaniladi, shuning uchun ular profil kalitiga kiradi.
+OVERRIDABLE_OPTIONS = frozenset({
+    'outtmpl',
+    'paths',
+    'format',
+    'merge_output_format',
+    'writethumbnail',
+    'writesubtitles',
+    'writeautomaticsub',
+    'noplaylist',
+    'extract_flat',
+    'default_search',
+    'extractor_args',
+    'progress_hooks',
+    'concurrent_fragment_downloads',
+    'external_downloader',
+    'external_downloader_args',
+})
+
+
+def _split_options(ydl_opts: Dict) -> Tuple[Dict, Dict]:
+    """Sozlamalarni profil (instance yaratishda) va ish (override) qismlariga ajratish"""
+    profile = {k: v for k, v in ydl_opts.items() if k not in OVERRIDABLE_OPTIONS}
+    overrides = {k: v for k, v in ydl_opts.items() if k in OVERRIDABLE_OPTIONS}
+    return profile, overrides
+
+
+def _profile_key(profile: Dict) -> str:
+    """Profil sozlamalaridan barqaror kalit yaratish"""
+    return repr(sorted((k, repr(v)) for k, v in profile.items()))
+
+
+def set_ydl_format(ydl, format_spec: str) -> None:
+    """Instance'ning format tanlovini almashtirish (format_selector ham qayta quriladi)"""
+    ydl.params['format'] = format_spec
+    ydl.format_selector = ydl.build_format_selector(format_spec) if format_spec else None
+
+
+def set_ydl_output_dir(ydl, directory: Path) -> None:
+    """Instance fayllarni yozadigan papkani almashtirish (asosiy outtmpl shablonining fayl nomi saqlanadi)"""
+    outtmpl = dict(ydl.params.get('outtmpl') or {})
+    if outtmpl.get('default'):
+        outtmpl['default'] = str(Path(directory) / Path(outtmpl['default']).name)
+        ydl.params['outtmpl'] = outtmpl
+
+
+class _PooledInstance:
+    """Pool'dagi instance va uning asl (profil) sozlamalari"""
+    __slots__ = ('ydl', 'base')
+
+    def __init__(self, ydl, base: Dict[str, Any]):
+        self.ydl = ydl
+        self.base = base
+
+
+class YdlPool:
+    """
+    Profil (platforma + cookie to'plami) bo'yicha YoutubeDL instance'lari pool'i
+
+    - Har bir instance bir vaqtda faqat bitta ishda ishlatiladi
+    - Ish tugagach override qilingan sozlamalar asl holatiga qaytariladi
+    - Eng kam ishlatilgan profillar LRU bo'yicha yopiladi
+    """
+
+    def __init__(self, max_idle_per_profile: int = 2, max_profiles: int = 8):
+        """
+        Args:
+            max_idle_per_profile: Har bir profil uchun saqlanadigan bo'sh instance'lar soni
+            max_profiles: Maksimal profillar soni
+        """
+        self.max_idle_per_profile = max_idle_per_profile
+        self.max_profiles = max_profiles
+        self._idle: OrderedDict[str, list[_PooledInstance]] = OrderedDict()
+        # Thread'lar orasida xavfsiz (asyncio.to_thread ichidan chaqiriladi)
+        self._lock = threading.Lock()
+
+    def _create(self, profile: Dict) -> _PooledInstance:
+        import yt_dlp
+
+        ydl = yt_dlp.YoutubeDL(copy.deepcopy(profile))
+        if profile.get('cookiefile'):
+            # Cookie nusxasi boshqa instance'lar bilan umumiy - o'qish yozish bilan bir vaqtda bo'lmasin
+            with cookie_store.file_lock:
+                ydl.cookiejar  # noqa: B018 - cookie jar'ni hozir yuklash
+        base = {key: copy.deepcopy(ydl.params.get(key)) for key in OVERRIDABLE_OPTIONS}
+        return _PooledInstance(ydl, base)
+
+    @staticmethod
+    def _apply(instance: _PooledInstance, overrides: Dict) -> None:
+        """Ish sozlamalarini instance'ga qo'llash"""
+        ydl = instance.ydl
+        for key in OVERRIDABLE_OPTIONS:
+            value = overrides.get(key, instance.base[key])
+            if key == 'format':
+                set_ydl_format(ydl, value)
+            elif key == 'progress_hooks':
+                # yt-dlp hook'larni instance yaratilganda ro'yxatga oladi - ish hook'lari shu ro'yxatga qo'yiladi
+                hooks = list(value or [])
+                ydl.params[key] = hooks
+                ydl._progress_hooks = list(hooks)
+            elif key == 'outtmpl':
+                outtmpl = copy.deepcopy(instance.base['outtmpl']) or {}
+                if isinstance(value, dict):
+                    outtmpl.update(value)
+                elif value:
+                    outtmpl['default'] = value
+                ydl.params['outtmpl'] = outtmpl
+            elif value is None:
+                ydl.params.pop(key, None)
+            else:
+                ydl.params[key] = copy.deepcopy(value)
+
+    @staticmethod
+    def _close(instance: _PooledInstance) -> None:
+        try:
+            # close() cookie'larni umumiy nusxaga yozadi
+            with cookie_store.file_lock:
+                instance.ydl.close()
+        except Exception as e:
+            logger.debug(f"YoutubeDL instance'ni yopishda xatolik: {e}")
+
+    @contextmanager
+    def acquire(self, ydl_opts: Dict) -> Iterator[Any]:
+        """
+        Sozlamalarga mos YoutubeDL instance olish (context manager)
+
+        Args:
+            ydl_opts: To'liq yt-dlp sozlamalari (profil + ish sozlamalari)
+
+        Yields:
+            yt_dlp.YoutubeDL instance
+        """
+        profile, overrides = _split_options(ydl_opts)
+        key = _profile_key(profile)
+
+        instance = None
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                instance = idle.pop()
+                self._idle.move_to_end(key)
+        if instance is None:
+            instance = self._create(profile)
+
+        self._apply(instance, overrides)
+        reusable = True
+        try:
+            yield instance.ydl
+        except BaseException as e:
+            # yt-dlp xatoliklari (DownloadError) oddiy holat, boshqa holatda instance qayta ishlatilmaydi
+            reusable = isinstance(e, Exception)
+            raise
+        finally:
+            try:
+                self._apply(instance, {})
+            except Exception:
+                reusable = False
+            self._release(key, instance, reusable)
+
+    def _release(self, key: str, instance: _PooledInstance, reusable: bool) -> None:
+        evicted = []
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            self._idle.move_to_end(key)
+            if reusable and len(idle) < self.max_idle_per_profile:
+                idle.append(instance)
+            else:
+                evicted.append(instance)
+            while len(self._idle) > self.max_profiles:
+                _, old = self._idle.popitem(last=False)
+                evicted.extend(old)
+        for old_instance in evicted:
+            self._close(old_instance)
+
+    def clear(self) -> None:
+        """Barcha instance'larni yopish"""
+        with self._lock:
+            instances = [inst for idle in self._idle.values() for inst in idle]
+            self._idle.clear()
+        for instance in instances:
+            self._close(instance)
+
+    def size(self) -> int:
+        """Pool'dagi bo'sh instance'lar soni"""
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+
+# Global YoutubeDL pool instance
+ydl_pool = YdlPool()